@@ -0,0 +1,337 @@
+"""
+Admission control for MalayLanguage MCP Server
+
+Without a bound, a traffic spike queues requests behind the models until
+every client times out. Tool calls that miss the result cache instead take
+one of ADMISSION_MAX_ACTIVE slots before they run. When every slot is busy a
+call waits in its tool's queue, and it is shed with ToolOverloadedError when
+that queue already holds ADMISSION_MAX_QUEUE calls (HTTP 429) or when it has
+waited ADMISSION_MAX_WAIT_MS without a slot (HTTP 503). Both errors carry a
+Retry-After estimate from recent slot hold times and the queue length. Over MCP
+they are tool errors (isError) with the same fields as structured content.
+
+Freed slots go to the waiting call with the lowest priority number first,
+in arrival order within a priority. Cheap tools (detect_language,
+normalize_malay) have priority 0 and expensive ones (rewrite_style)
+priority 2. The last ADMISSION_RESERVED slots only admit priority-0 calls,
+so a flood of slow rewrites cannot hold every slot while language
+detection waits. A tool called from inside another tool (term_lookup calls
+translate and detect_language) runs in its caller's slot.
+
+A /tools/batch or /tools/stream request is admitted as a whole: it is shed
+like a single call when no slot frees up in time, and otherwise runs at most
+as many items at once as there were shared slots free when it arrived. Its
+items then wait for slots as long as it takes, so a batch larger than the
+slots finishes instead of shedding its own items.
+
+Slots and queues are per process; with HTTP_WORKERS > 1 each worker admits
+up to the limits on its own.
+
+Configuration:
+    ADMISSION_MAX_ACTIVE    tool calls running at once (default 64, 0 disables admission control)
+    ADMISSION_MAX_QUEUE     calls allowed to wait per tool (default 256)
+    ADMISSION_MAX_WAIT_MS   longest wait for a slot before the call is shed (default 10000)
+    ADMISSION_RESERVED      slots kept for priority-0 tools (default an eighth of the slots)
+    ADMISSION_PRIORITIES    per-tool priorities, lower first, e.g. "translate=0,term_lookup=2"
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import heapq
+import itertools
+import math
+import os
+import time
+from typing import AsyncIterator, Iterator, Optional
+
+from metrics import ADMISSION_REJECTED, add_phases, current_phases
+
+DEFAULT_MAX_ACTIVE = 64
+DEFAULT_MAX_QUEUE = 256
+DEFAULT_MAX_WAIT_MS = 10000.0
+DEFAULT_PRIORITY = 1
+DEFAULT_PRIORITIES = {
+    "detect_language": 0,
+    "normalize_malay": 0,
+    "apply_glossary": 1,
+    "correct_spelling": 1,
+    "term_lookup": 1,
+    "translate": 1,
+    "rewrite_style": 2,
+}
+
+# Set while a tool call holds a slot, so the tools it calls do not queue again.
+_admitted: contextvars.ContextVar[bool] = contextvars.ContextVar("admitted", default=False)
+# Set for the items of an admitted batch, which wait without the queue and wait limits.
+_in_batch: contextvars.ContextVar[bool] = contextvars.ContextVar("in_batch", default=False)
+
+
+class ToolOverloadedError(RuntimeError):
+    """Raised when a tool call is shed because the server is saturated."""
+
+    def __init__(self, tool: str, reason: str, retry_after: int, message: str):
+        super().__init__(message)
+        self.tool = tool
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def status_code(self) -> int:
+        """429 when the queue was full on arrival, 503 when the wait ran out."""
+        return 429 if self.reason == "queue_full" else 503
+
+    def to_dict(self) -> dict:
+        return {"error": str(self), "reason": self.reason, "retry_after": self.retry_after}
+
+
+def parse_priorities(spec: str) -> dict[str, int]:
+    """Parse a "tool=priority,tool=priority" string."""
+    priorities = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid tool priority '{item}', expected tool=priority")
+        priorities[name.strip()] = int(value)
+    return priorities
+
+
+class AdmissionController:
+    """Bounded, prioritized admission of tool calls into a fixed number of slots."""
+
+    def __init__(
+        self,
+        max_active: int = DEFAULT_MAX_ACTIVE,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+        reserved: Optional[int] = None,
+        priorities: Optional[dict[str, int]] = None,
+    ):
+        if max_active < 1:
+            raise ValueError("max_active must be at least 1")
+        self.max_active = max_active
+        self.max_queue = max(max_queue, 0)
+        self.max_wait = max(max_wait_ms, 0.0) / 1000.0
+        self.reserved = min(max_active // 8 if reserved is None else reserved, max_active - 1)
+        self.priorities = dict(DEFAULT_PRIORITIES, **(priorities or {}))
+        self._active = 0
+        # Heap of (priority, arrival, future); futures of calls that gave up stay until popped.
+        self._waiting: list[tuple[int, int, asyncio.Future]] = []
+        self._queued: dict[str, int] = {}
+        self._arrivals = itertools.count()
+        self._hold_seconds = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stats: dict[str, dict[str, int]] = {}
+
+    @classmethod
+    def from_env(cls) -> Optional["AdmissionController"]:
+        """Build a controller from ADMISSION_* settings, or None when disabled."""
+        max_active = int(os.environ.get("ADMISSION_MAX_ACTIVE", DEFAULT_MAX_ACTIVE))
+        if max_active < 1:
+            return None
+        reserved = os.environ.get("ADMISSION_RESERVED")
+        return cls(
+            max_active=max_active,
+            max_queue=int(os.environ.get("ADMISSION_MAX_QUEUE", DEFAULT_MAX_QUEUE)),
+            max_wait_ms=float(os.environ.get("ADMISSION_MAX_WAIT_MS", DEFAULT_MAX_WAIT_MS)),
+            reserved=int(reserved) if reserved else None,
+            priorities=parse_priorities(os.environ.get("ADMISSION_PRIORITIES", "")),
+        )
+
+    def priority(self, tool: str) -> int:
+        return self.priorities.get(tool, DEFAULT_PRIORITY)
+
+    def _count(self, tool: str, event: str) -> None:
+        stats = self._stats.setdefault(
+            tool, {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0}
+        )
+        stats[event] += 1
+
+    def _limit(self, priority: int) -> int:
+        return self.max_active if priority == 0 else self.max_active - self.reserved
+
+    def _can_start(self, priority: int) -> bool:
+        return self._active < self._limit(priority)
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free for a new call (at least 1)."""
+        waiting = sum(self._queued.values())
+        return max(1, math.ceil(self._hold_seconds * (waiting + 1) / self.max_active))
+
+    def _bind_loop(self) -> None:
+        # Slots and waiters belong to one event loop (tests run one per test).
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._active = 0
+            self._waiting = []
+            self._queued = {}
+
+    def _grant(self) -> None:
+        """Hand free slots to the waiting calls that may take them, best priority first."""
+        while self._waiting:
+            priority, _, future = self._waiting[0]
+            if future.done():
+                heapq.heappop(self._waiting)
+                continue
+            if not self._can_start(priority):
+                return
+            heapq.heappop(self._waiting)
+            self._active += 1
+            future.set_result(None)
+
+    def _release(self, held: float) -> None:
+        self._active -= 1
+        # Smoothed slot hold time, for the Retry-After estimate.
+        self._hold_seconds += 0.1 * (held - self._hold_seconds)
+        self._grant()
+
+    async def _acquire(self, tool: str) -> float:
+        """Take a slot, waiting in the tool's queue if needed; return the seconds waited."""
+        self._bind_loop()
+        priority = self.priority(tool)
+        if self._can_start(priority):
+            self._active += 1
+            return 0.0
+        in_batch = _in_batch.get()
+        if not in_batch and self._queued.get(tool, 0) >= self.max_queue:
+            self._count(tool, "rejected")
+            ADMISSION_REJECTED.inc(tool, "queue_full")
+            raise ToolOverloadedError(
+                tool, "queue_full", self.retry_after(),
+                f"{tool} is overloaded: {self._queued.get(tool, 0)} calls are already waiting",
+            )
+        future = self._loop.create_future()
+        heapq.heappush(self._waiting, (priority, next(self._arrivals), future))
+        self._queued[tool] = self._queued.get(tool, 0) + 1
+        self._count(tool, "queued")
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, None if in_batch else self.max_wait)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # The slot arrived just as the wait ended: pass it on.
+                self._release(0.0)
+            if not isinstance(e, asyncio.TimeoutError):
+                raise
+            self._count(tool, "timed_out")
+            ADMISSION_REJECTED.inc(tool, "wait_timeout")
+            raise ToolOverloadedError(
+                tool, "wait_timeout", self.retry_after(),
+                f"{tool} is overloaded: no capacity within {self.max_wait:g}s",
+            ) from None
+        finally:
+            self._queued[tool] -= 1
+        return time.perf_counter() - start
+
+    @contextlib.asynccontextmanager
+    async def admit(self, tool: str) -> AsyncIterator[float]:
+        """Hold a slot for the block and yield the seconds spent waiting for it.
+
+        Raises ToolOverloadedError when the call is shed. Calls made while
+        already holding a slot pass straight through.
+        """
+        if _admitted.get():
+            yield 0.0
+            return
+        waited = await self._acquire(tool)
+        self._count(tool, "admitted")
+        token = _admitted.set(True)
+        start = time.perf_counter()
+        try:
+            yield waited
+        finally:
+            _admitted.reset(token)
+            self._release(time.perf_counter() - start)
+
+    async def admit_batch(self, tool: str, concurrency: int) -> int:
+        """Admit a batch of calls to tool as a whole; return how many may run at once.
+
+        Raises ToolOverloadedError when a single call to tool would be shed.
+        The batch's calls must then run inside in_admitted_batch().
+        """
+        await self._acquire(tool)
+        free = self._limit(self.priority(tool)) - self._active + 1
+        # Only a probe: hand the slot straight back without counting a hold time.
+        self._active -= 1
+        self._grant()
+        return max(1, min(concurrency, free))
+
+    def stats(self) -> dict:
+        """Slots in use, calls waiting per tool and per-tool admission counters."""
+        return {
+            "max_active": self.max_active,
+            "active": self._active,
+            "reserved": self.reserved,
+            "queued": {tool: n for tool, n in self._queued.items() if n},
+            "tools": {tool: dict(stats) for tool, stats in self._stats.items()},
+        }
+
+
+_controller: Optional[AdmissionController] = None
+_controller_checked = False
+
+
+def get_admission_controller() -> Optional[AdmissionController]:
+    """Get the shared controller, or None when ADMISSION_MAX_ACTIVE is 0."""
+    global _controller, _controller_checked
+    if not _controller_checked:
+        _controller = AdmissionController.from_env()
+        _controller_checked = True
+    return _controller
+
+
+def set_admission_controller(controller: Optional[AdmissionController]) -> None:
+    """Replace the shared controller (None disables admission control)."""
+    global _controller, _controller_checked
+    _controller = controller
+    _controller_checked = True
+
+
+def admission_stats() -> dict:
+    """Return the shared controller's stats, or {} when admission control is off."""
+    controller = get_admission_controller()
+    return controller.stats() if controller is not None else {}
+
+
+async def admit_batch(tool: str, concurrency: int) -> int:
+    """Admit a batch on the shared controller; see AdmissionController.admit_batch."""
+    controller = get_admission_controller()
+    if controller is None:
+        return concurrency
+    return await controller.admit_batch(tool, concurrency)
+
+
+@contextlib.contextmanager
+def in_admitted_batch() -> Iterator[None]:
+    """Let the calls made in this block wait for slots without being shed."""
+    token = _in_batch.set(True)
+    try:
+        yield
+    finally:
+        _in_batch.reset(token)
+
+
+def admitted(tool_name: str):
+    """Run an async tool function inside an admission slot for tool_name.
+
+    The time spent waiting for the slot is added to the call's queue phase.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            controller = get_admission_controller()
+            if controller is None:
+                return await func(*args, **kwargs)
+            async with controller.admit(tool_name) as waited:
+                add_phases(current_phases(), {"queue": waited})
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
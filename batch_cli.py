@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Offline batch processing for MalayLanguage MCP Server
+
+Runs one tool over a text, CSV or JSONL file (or stdin) without the HTTP
+server. Inputs are grouped into batches that go through the same blocking
+model calls the server uses, spread over a pool of worker processes, and the
+results are written as JSONL in input order as soon as each batch is done.
+A throughput report is logged to stderr.
+
+Usage:
+    python batch_cli.py normalize_malay corpus.txt -o normalized.jsonl
+    python batch_cli.py translate data.csv --column text --source-lang en --target-lang ms
+    cat texts.jsonl | python batch_cli.py detect_language - --format jsonl --workers 4
+"""
+
+import argparse
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Iterable, Iterator, Optional, TextIO
+
+import server
+from normalize_rules import get_rule_normalizer
+
+logger = logging.getLogger("malaylanguage-batch")
+
+TOOLS = ("translate", "normalize_malay", "correct_spelling", "detect_language")
+INPUT_FORMATS = ("text", "csv", "jsonl")
+
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_REPORT_INTERVAL = 10.0
+
+
+def model_key_for(tool: str, source_lang: str = "ms", target_lang: str = "en") -> str:
+    """Return the model cache key a tool runs on."""
+    if tool == "translate":
+        return server.translation_model_key(source_lang, target_lang)
+    return {
+        "detect_language": "language_detection",
+        "normalize_malay": "normalizer",
+        "correct_spelling": "spelling",
+    }[tool]
+
+
+def guess_format(path: str) -> str:
+    """Pick an input format from the file extension (stdin is plain text)."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    return "text"
+
+
+def read_inputs(
+    stream: TextIO, input_format: str, field: str = "text"
+) -> Iterator[tuple[int, str]]:
+    """Yield (record number, text) for every non-blank input record.
+
+    Text input has one text per line; CSV input takes the `field` column; JSONL
+    lines are either JSON strings or objects holding the text under `field`.
+    """
+    if input_format == "csv":
+        reader = csv.DictReader(stream)
+        if field not in (reader.fieldnames or []):
+            raise ValueError(f"CSV input has no '{field}' column")
+        for number, row in enumerate(reader, start=1):
+            text = row[field] or ""
+            if text.strip():
+                yield number, text
+        return
+    for number, line in enumerate(stream, start=1):
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            continue
+        if input_format == "jsonl":
+            value = json.loads(line)
+            if isinstance(value, dict):
+                value = value.get(field)
+            if not isinstance(value, str):
+                raise ValueError(f"Line {number}: expected a JSON string or an object with '{field}'")
+            line = value
+        yield number, line
+
+
+def _normalize_texts(texts: list[str]) -> list[str]:
+    # Same rule fast path as the server: only unresolved texts reach the model.
+    rules = get_rule_normalizer()
+    if rules is None:
+        return server._normalize_texts(texts)
+    results = [rules.normalize(text) for text in texts]
+    pending = [i for i, (_, resolved) in enumerate(results) if not resolved]
+    normalized = [expanded for expanded, _ in results]
+    if pending:
+        for i, value in zip(pending, server._normalize_texts([normalized[i] for i in pending])):
+            normalized[i] = value
+    return normalized
+
+
+def _call_model(tool: str, source_lang: str, target_lang: str, texts: list[str]) -> list:
+    if tool == "detect_language":
+        return [
+            {"label": result["label"], "score": float(result["score"])}
+            for result in server._predict_language(texts)
+        ]
+    if tool == "normalize_malay":
+        return _normalize_texts(texts)
+    if tool == "correct_spelling":
+        return server._correct_texts(texts)
+    if tool == "translate":
+        return server._translate_texts(source_lang, target_lang, texts)
+    raise ValueError(f"Unknown tool: {tool}")
+
+
+def run_batch(tool: str, source_lang: str, target_lang: str, texts: list[str]) -> list[dict]:
+    """Run one batch and return a {"result"} or {"error"} dict per text.
+
+    If the batched call fails, each text is retried on its own so a bad input
+    only fails its own record. Runs in the worker processes, so it stays a
+    picklable module-level function.
+    """
+    try:
+        results = _call_model(tool, source_lang, target_lang, texts)
+        if len(results) != len(texts):
+            raise RuntimeError(f"{tool} returned {len(results)} results for {len(texts)} inputs")
+        return [{"result": result} for result in results]
+    except Exception:
+        if len(texts) == 1:
+            raise
+    records = []
+    for text in texts:
+        try:
+            records.append({"result": _call_model(tool, source_lang, target_lang, [text])[0]})
+        except Exception as e:
+            records.append({"error": str(e)})
+    return records
+
+
+def _batches(inputs: Iterable[tuple[int, str]], size: int) -> Iterator[list[tuple[int, str]]]:
+    batch = []
+    for item in inputs:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def make_executor(workers: int) -> Executor:
+    """Return a process pool for workers > 1, otherwise a single background thread.
+
+    Where fork is available the pool forks, so models preloaded in this process
+    are shared copy-on-write with every worker.
+    """
+    if workers <= 1:
+        return ThreadPoolExecutor(max_workers=1, thread_name_prefix="malaya-batch")
+    context = None
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+
+def process(
+    tool: str,
+    inputs: Iterable[tuple[int, str]],
+    output: TextIO,
+    source_lang: str = "ms",
+    target_lang: str = "en",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: int = 1,
+    report_interval: float = DEFAULT_REPORT_INTERVAL,
+    executor: Optional[Executor] = None,
+) -> dict:
+    """Run tool over inputs and write one JSONL record per input, in order.
+
+    At most two batches per worker are in flight, so memory stays bounded
+    however large the input is. Returns throughput statistics.
+    """
+    if tool not in TOOLS:
+        raise ValueError(f"Unknown tool: {tool} (expected one of {TOOLS})")
+    if tool == "translate" and source_lang == target_lang:
+        raise ValueError("Source and target languages must be different")
+    owns_executor = executor is None
+    if owns_executor:
+        executor = make_executor(workers)
+    stats = {"items": 0, "errors": 0, "batches": 0}
+    start = last_report = time.perf_counter()
+    pending = deque()
+
+    def write_oldest():
+        nonlocal last_report
+        batch, future = pending.popleft()
+        try:
+            records = future.result()
+        except Exception as e:
+            records = [{"error": str(e)}] * len(batch)
+        for (number, text), record in zip(batch, records):
+            output.write(json.dumps(dict({"line": number, "text": text}, **record),
+                                    ensure_ascii=False) + "\n")
+            stats["errors"] += "error" in record
+        output.flush()
+        stats["items"] += len(batch)
+        stats["batches"] += 1
+        now = time.perf_counter()
+        if report_interval and now - last_report >= report_interval:
+            last_report = now
+            logger.info(f"{stats['items']} items, {stats['items'] / (now - start):.1f} items/s")
+
+    try:
+        for batch in _batches(inputs, batch_size):
+            texts = [text for _, text in batch]
+            pending.append((batch, executor.submit(run_batch, tool, source_lang, target_lang, texts)))
+            if len(pending) >= 2 * max(workers, 1):
+                write_oldest()
+        while pending:
+            write_oldest()
+    finally:
+        for _, future in pending:
+            future.cancel()
+        if owns_executor:
+            executor.shutdown()
+    stats["seconds"] = time.perf_counter() - start
+    stats["items_per_second"] = stats["items"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Run a Malay language tool over a text, CSV or JSONL file offline."
+    )
+    parser.add_argument("tool", choices=TOOLS)
+    parser.add_argument("input", help="Input file, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output file (default stdout)")
+    parser.add_argument("--format", choices=INPUT_FORMATS,
+                        help="Input format (default from the file extension)")
+    parser.add_argument("--column", "--field", dest="field", default="text",
+                        help="CSV column or JSONL field holding the text (default: text)")
+    parser.add_argument("--source-lang", default="ms", choices=["ms", "en"])
+    parser.add_argument("--target-lang", default="en", choices=["ms", "en"])
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (default CPU count)")
+    parser.add_argument("--no-preload", dest="preload", action="store_false",
+                        help="Let each worker load the model instead of sharing the parent's")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.batch_size < 1:
+        logger.error("--batch-size must be at least 1")
+        return 2
+    input_format = args.format or ("text" if args.input == "-" else guess_format(args.input))
+    if args.preload:
+        # Load once here so forked workers share the weights.
+        server.load_model(model_key_for(args.tool, args.source_lang, args.target_lang))
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8", newline="")
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        stats = process(
+            args.tool,
+            read_inputs(source, input_format, args.field),
+            output,
+            source_lang=args.source_lang,
+            target_lang=args.target_lang,
+            batch_size=args.batch_size,
+            workers=args.workers,
+        )
+    except ValueError as e:
+        logger.error(str(e))
+        return 2
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    logger.info(
+        f"Processed {stats['items']} items ({stats['errors']} errors) in {stats['batches']} "
+        f"batches over {stats['seconds']:.2f}s: {stats['items_per_second']:.1f} items/s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Dynamic micro-batching for MalayLanguage MCP Server
+
+Malaya's predict/translate/paraphrase calls accept lists, so concurrent
+requests for the same model are coalesced into a single forward pass. Each
+model key gets a MicroBatcher that collects items until either
+BATCH_MAX_SIZE items are pending or BATCH_MAX_WAIT_MS has elapsed, runs the
+batch on the inference executor and hands each caller its own result.
+If a batched call fails, the batch is bisected and retried so that only the
+callers whose inputs actually fail see the error. A model that cannot load
+fails the whole batch at once, since every half would retry the same load.
+
+Each queued item remembers its caller's metrics phase collection, so the time
+it waited for its batch and the batch's model timings are credited to every
+request in the batch. Each batch is traced as its own span, linked to the
+span of every request in it.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Optional
+
+from inference import run_inference
+from model_registry import ModelLoadError
+from metrics import BATCH_SIZE, add_phases, collect_phases, current_phases
+from tracing import current_span, span
+
+logger = logging.getLogger("malaylanguage-batching")
+
+DEFAULT_MAX_BATCH_SIZE = 16
+DEFAULT_MAX_WAIT_MS = 5.0
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-item calls into batched model calls."""
+
+    def __init__(
+        self,
+        model_key: str,
+        batch_func: Callable[[list], list],
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+        runner: Callable[..., Any] = run_inference,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.model_key = model_key
+        self.batch_func = batch_func
+        self.max_batch_size = max_batch_size
+        self.max_wait = max(max_wait_ms, 0.0) / 1000.0
+        self.runner = runner
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.splits = 0
+        # (item, future, time queued, caller's phase collection, caller's span)
+        self._pending: list[tuple[Any, asyncio.Future, float, Optional[dict], Any]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result from the next batch."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._pending = []
+            self._timer = None
+            self._loop = loop
+        future = loop.create_future()
+        self._pending.append((item, future, time.perf_counter(), current_phases(), current_span()))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self._loop.create_task(self._run_batch(batch))
+
+    async def _run_batch(self, batch: list[tuple]) -> None:
+        # Callers that went away while queued do not need a forward pass.
+        batch = [entry for entry in batch if not entry[1].done()]
+        if not batch:
+            return
+        self.batches += 1
+        self.items += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        BATCH_SIZE.observe(len(batch), self.model_key)
+        await self._run_items(batch)
+
+    async def _run_items(self, batch: list[tuple]) -> None:
+        started = time.perf_counter()
+        try:
+            # This task was started from some caller's context; collect the
+            # batch's own timings instead of crediting them to that caller.
+            with collect_phases(merge=False) as batch_phases, span(
+                f"batch {self.model_key}", links=[entry[4] for entry in batch], root=True,
+                model=self.model_key, batch_size=len(batch),
+            ):
+                results = await self.runner(
+                    self.model_key, self.batch_func, [entry[0] for entry in batch]
+                )
+            if len(results) != len(batch):
+                raise RuntimeError(
+                    f"{self.model_key} returned {len(results)} results for {len(batch)} inputs"
+                )
+        except ModelLoadError as e:
+            logger.error(f"Batched call for {self.model_key} failed: {e}")
+            for entry in batch:
+                if not entry[1].done():
+                    entry[1].set_exception(e)
+            return
+        except Exception as e:
+            if len(batch) > 1:
+                # One bad input must not fail its neighbours: split the batch
+                # in half and retry until the failing items are isolated.
+                self.splits += 1
+                middle = len(batch) // 2
+                await asyncio.gather(self._run_items(batch[:middle]), self._run_items(batch[middle:]))
+                return
+            logger.error(f"Batched call for {self.model_key} failed: {e}")
+            future = batch[0][1]
+            if not future.done():
+                future.set_exception(e)
+            return
+        for (_, future, queued, phases, _), result in zip(batch, results):
+            add_phases(phases, {"queue": started - queued})
+            add_phases(phases, batch_phases)
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        """Return batch counters for this model."""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "largest_batch": self.largest_batch,
+            "splits": self.splits,
+            "average_batch": self.items / self.batches if self.batches else 0.0,
+        }
+
+
+_batchers: dict[str, MicroBatcher] = {}
+
+
+def get_batcher(model_key: str, batch_func: Callable[[list], list]) -> MicroBatcher:
+    """Get or create the batcher for a model key, configured from the environment."""
+    batcher = _batchers.get(model_key)
+    if batcher is None:
+        batcher = MicroBatcher(
+            model_key,
+            batch_func,
+            max_batch_size=int(os.environ.get("BATCH_MAX_SIZE", DEFAULT_MAX_BATCH_SIZE)),
+            max_wait_ms=float(os.environ.get("BATCH_MAX_WAIT_MS", DEFAULT_MAX_WAIT_MS)),
+        )
+        _batchers[model_key] = batcher
+    return batcher
+
+
+async def run_batched(model_key: str, batch_func: Callable[[list], list], item: Any) -> Any:
+    """Run one item through the micro-batcher for model_key.
+
+    batch_func is only used when the batcher is first created, so it must be
+    the same function for every call with a given model key.
+    """
+    return await get_batcher(model_key, batch_func).submit(item)
+
+
+def batch_stats() -> dict[str, dict]:
+    """Return batch counters for every model that has seen traffic."""
+    return {key: batcher.stats() for key, batcher in _batchers.items()}
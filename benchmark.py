@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for MalayLanguage MCP Server
+
+Drives every tool at several concurrency levels through three transports and
+reports p50/p95/p99 latency, throughput and memory per scenario:
+
+    direct   the tool registry in process (tool code, batching, inference executor)
+    http     POST /tools/execute
+    sse      MCP tools/call over /sse and /messages, one client session per worker
+
+By default the models are replaced by a fake malaya package whose calls sleep
+for a fixed time per call, per item and per character, so runs are
+reproducible and need no model downloads (use this in CI). The fake is
+installed under sys.modules, so model loading, the registry, micro-batching
+and the executor run as in production; only the forward pass is simulated.
+With --backend malaya the real models are used; the first (warm-up) requests
+then download and load them.
+
+For http and sse the server runs in this process on a free local port, unless
+--url points at a running server. Result caches are disabled in process so
+repeated corpus texts still reach the models (--cache keeps them). Memory is
+this process's RSS, or the server's from GET /models with --url; process-pool
+workers are not included.
+
+Results can be saved as JSON and compared with an earlier run; the command
+exits with status 1 when a scenario's throughput or tail latency regressed
+by more than --tolerance.
+
+Usage:
+    python benchmark.py -o results.json
+    python benchmark.py --transport direct --tools translate --concurrency 1 16 64
+    python benchmark.py --compare baseline.json --tolerance 0.2
+    python benchmark.py --backend malaya --transport http --requests 50
+    python benchmark.py --url http://localhost:8000 --transport http sse
+"""
+
+import argparse
+import asyncio
+import contextlib
+import datetime
+import itertools
+import json
+import logging
+import os
+import platform
+import resource
+import socket
+import sys
+import time
+import types
+from typing import AsyncIterator, Awaitable, Callable, Iterator, Optional
+
+import httpx
+
+import server
+from model_registry import current_rss_bytes
+from workload import (
+    DEFAULT_TOLERANCE, compare_results, load_corpus, summarize_latencies, synthetic_corpus,
+    tool_arguments,
+)
+
+logger = logging.getLogger("malaylanguage-benchmark")
+
+TRANSPORTS = ("direct", "http", "sse")
+BACKENDS = ("fake", "malaya")
+DEFAULT_CONCURRENCY = (1, 8, 32)
+DEFAULT_REQUESTS = 100
+DEFAULT_WARMUP = 3
+FAKE_MALAYA_MODULES = (
+    "malaya", "malaya.language_detection", "malaya.normalize", "malaya.spelling_correction",
+    "malaya.translation", "malaya.paraphrase",
+)
+
+# Settings that change results, recorded with every run.
+SETTINGS = (
+    "INFERENCE_EXECUTOR", "INFERENCE_MAX_WORKERS", "MODEL_CONCURRENCY_DEFAULT",
+    "MODEL_CONCURRENCY", "BATCH_MAX_SIZE", "BATCH_MAX_WAIT_MS", "SENTENCE_CHUNK_MIN_CHARS",
+    "NORMALIZE_FAST_PATH", "TOOL_TIMEOUTS", "TRACING", "PROFILE_SLOW_MS",
+)
+
+
+class FakeLatency:
+    """Deterministic cost of a fake model call: per call, per item and per character."""
+
+    def __init__(self, call_ms: float = 20.0, item_ms: float = 2.0, char_ms: float = 0.02,
+                 load_ms: float = 100.0):
+        self.call_ms = call_ms
+        self.item_ms = item_ms
+        self.char_ms = char_ms
+        self.load_ms = load_ms
+
+    def seconds(self, texts: list[str]) -> float:
+        chars = sum(len(text) for text in texts)
+        return (self.call_ms + self.item_ms * len(texts) + self.char_ms * chars) / 1000
+
+    def to_dict(self) -> dict:
+        return {"call_ms": self.call_ms, "item_ms": self.item_ms, "char_ms": self.char_ms,
+                "load_ms": self.load_ms}
+
+
+class FakeModel:
+    """Stands in for every malaya model: sleeps for the simulated cost, then echoes."""
+
+    def __init__(self, latency: FakeLatency, prefix: str = ""):
+        time.sleep(latency.load_ms / 1000)
+        self.latency = latency
+        self.prefix = prefix
+
+    def _run(self, texts: list[str]) -> None:
+        # time.sleep releases the GIL like a real forward pass in native code.
+        time.sleep(self.latency.seconds(texts))
+
+    def predict(self, texts):
+        self._run(texts)
+        return [{"label": "malay", "score": 0.9} for _ in texts]
+
+    def normalize(self, text):
+        self._run([text])
+        return text
+
+    def correct(self, text):
+        self._run([text])
+        return text
+
+    def translate(self, texts):
+        self._run(texts)
+        return [f"{self.prefix}{text}" for text in texts]
+
+    def paraphrase(self, texts):
+        self._run(texts)
+        return list(texts)
+
+
+def fake_malaya_modules(latency: FakeLatency) -> dict[str, types.ModuleType]:
+    """Build a malaya package exposing the loaders server.py calls."""
+    modules = {name: types.ModuleType(name) for name in FAKE_MALAYA_MODULES}
+    modules["malaya.language_detection"].transformer = lambda **kwargs: FakeModel(latency)
+    modules["malaya.normalize"].normalizer = lambda **kwargs: FakeModel(latency)
+    modules["malaya.spelling_correction"].transformer = lambda **kwargs: FakeModel(latency)
+    modules["malaya.paraphrase"].transformer = lambda **kwargs: FakeModel(latency)
+    modules["malaya.translation"].transformer = (
+        lambda source="ms", target="en", **kwargs: FakeModel(latency, f"[{target}] ")
+    )
+    for name in FAKE_MALAYA_MODULES[1:]:
+        setattr(modules["malaya"], name.split(".", 1)[1], modules[name])
+    return modules
+
+
+@contextlib.contextmanager
+def fake_malaya(latency: FakeLatency) -> Iterator[None]:
+    """Replace malaya with the fake backend (and unload models) for the block."""
+    saved = {name: sys.modules.get(name) for name in FAKE_MALAYA_MODULES}
+    sys.modules.update(fake_malaya_modules(latency))
+    server._model_cache.clear()
+    try:
+        yield
+    finally:
+        server._model_cache.clear()
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
+
+# A transport call takes (tool, arguments) and returns whether the call succeeded.
+ToolCall = Callable[[str, dict], Awaitable[bool]]
+
+
+async def call_direct(tool: str, arguments: dict) -> bool:
+    spec = server.tools.get(tool)
+    data = await spec.run(arguments)
+    spec.render(data)
+    return "error" not in data
+
+
+@contextlib.asynccontextmanager
+async def http_transport(url: str, concurrency: int) -> AsyncIterator[ToolCall]:
+    """POST /tools/execute over a keep-alive connection pool sized to concurrency."""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=300) as client:
+
+        async def call(tool: str, arguments: dict) -> bool:
+            response = await client.post(
+                "/tools/execute", json={"name": tool, "arguments": arguments}
+            )
+            return response.status_code == 200
+
+        yield call
+
+
+@contextlib.asynccontextmanager
+async def sse_transport(url: str, concurrency: int) -> AsyncIterator[ToolCall]:
+    """MCP tools/call over /sse and /messages, one initialized session per worker."""
+    from mcp import ClientSession
+    from mcp.client.sse import sse_client
+
+    sessions: asyncio.Queue = asyncio.Queue()
+    async with contextlib.AsyncExitStack() as stack:
+        for _ in range(concurrency):
+            read, write = await stack.enter_async_context(sse_client(f"{url}/sse", timeout=30))
+            session = await stack.enter_async_context(ClientSession(read, write))
+            await session.initialize()
+            sessions.put_nowait(session)
+
+        async def call(tool: str, arguments: dict) -> bool:
+            session = await sessions.get()
+            try:
+                result = await session.call_tool(tool, arguments)
+            finally:
+                sessions.put_nowait(session)
+            return not result.isError
+
+        yield call
+
+
+@contextlib.asynccontextmanager
+async def direct_transport(url: str, concurrency: int) -> AsyncIterator[ToolCall]:
+    yield call_direct
+
+
+_TRANSPORTS = {"direct": direct_transport, "http": http_transport, "sse": sse_transport}
+
+
+@contextlib.asynccontextmanager
+async def local_server() -> AsyncIterator[str]:
+    """Serve http_server.http_app on a free local port and yield its base URL."""
+    import uvicorn
+
+    import http_server
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    config = uvicorn.Config(http_server.http_app, log_level="warning", lifespan="on")
+    uvicorn_server = uvicorn.Server(config)
+    task = asyncio.create_task(uvicorn_server.serve(sockets=[sock]))
+    while not uvicorn_server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{sock.getsockname()[1]}"
+    finally:
+        uvicorn_server.should_exit = True
+        await task
+        sock.close()
+
+
+async def server_memory(url: Optional[str]) -> dict:
+    """RSS of the server: this process, or the remote server's GET /models report."""
+    if url is None:
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {
+            "rss_mb": round(current_rss_bytes() / 2**20, 1),
+            "peak_rss_mb": round(peak_kb / 1024, 1),
+        }
+    async with httpx.AsyncClient(base_url=url, timeout=30) as client:
+        try:
+            process = (await client.get("/models")).json().get("process", {})
+        except (httpx.HTTPError, ValueError):
+            return {}
+    return {"rss_mb": process.get("rss_mb")}
+
+
+async def run_scenario(call: ToolCall, tool: str, texts: list[str], concurrency: int,
+                       requests: int, warmup: int = DEFAULT_WARMUP) -> dict:
+    """Send requests calls of tool from concurrency workers and summarize them.
+
+    The warm-up calls run first, one at a time, and are not measured; they
+    load the model. Worker i sends corpus texts i, i + concurrency, ... so a
+    run always sends the same texts in the same order.
+    """
+    for index in range(warmup):
+        await call(tool, tool_arguments(tool, texts[index % len(texts)]))
+    latencies: list[float] = []
+    errors = []
+    counter = itertools.count()
+
+    async def worker() -> None:
+        while (index := next(counter)) < requests:
+            arguments = tool_arguments(tool, texts[(warmup + index) % len(texts)])
+            start = time.perf_counter()
+            try:
+                ok, error = await call(tool, arguments), "tool returned an error"
+            except Exception as e:
+                ok, error = False, f"{type(e).__name__}: {e}"
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors.append(error)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "tool": tool,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "error_sample": errors[0] if errors else None,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": summarize_latencies(latencies),
+    }
+
+
+async def run_benchmarks(transports: list[str], tool_names: list[str], concurrency: list[int],
+                         requests: int, texts: list[str], warmup: int = DEFAULT_WARMUP,
+                         url: Optional[str] = None) -> list[dict]:
+    """Run every transport x tool x concurrency scenario and return their results."""
+    results = []
+    async with contextlib.AsyncExitStack() as stack:
+        base_url = url
+        if url is None and set(transports) - {"direct"}:
+            base_url = await stack.enter_async_context(local_server())
+        for transport in transports:
+            for level in concurrency:
+                async with _TRANSPORTS[transport](base_url, level) as call:
+                    for tool in tool_names:
+                        result = await run_scenario(call, tool, texts, level, requests, warmup)
+                        result = dict(transport=transport, **result, **await server_memory(url))
+                        logger.info(format_result(result))
+                        results.append(result)
+    return results
+
+
+def format_result(result: dict) -> str:
+    latency = result["latency_ms"]
+    return (
+        f"{result['transport']:<6} {result['tool']:<17} c={result['concurrency']:<4} "
+        f"{result['throughput_rps']:>9.1f} req/s  p50 {latency['p50']:>8.1f}ms  "
+        f"p95 {latency['p95']:>8.1f}ms  p99 {latency['p99']:>8.1f}ms  "
+        f"errors {result['errors']}  rss {result.get('rss_mb')}MB"
+    )
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the Malay language tools through each transport."
+    )
+    parser.add_argument("--backend", choices=BACKENDS, default="fake",
+                        help="fake: simulated model latency (default); malaya: real models")
+    parser.add_argument("--transport", nargs="+", choices=TRANSPORTS, default=list(TRANSPORTS))
+    parser.add_argument("--tools", nargs="+", default=None,
+                        help="Tools to benchmark (default: every tool)")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=list(DEFAULT_CONCURRENCY))
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS,
+                        help="Measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP,
+                        help="Unmeasured requests before each scenario")
+    parser.add_argument("--url", help="Benchmark a running server instead of one in process")
+    parser.add_argument("--corpus", help="Text file with one input per line (default: synthetic)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic corpus")
+    parser.add_argument("--cache", action="store_true", help="Keep result caches enabled")
+    parser.add_argument("--fake-call-ms", type=float, default=20.0)
+    parser.add_argument("--fake-item-ms", type=float, default=2.0)
+    parser.add_argument("--fake-char-ms", type=float, default=0.02)
+    parser.add_argument("--fake-load-ms", type=float, default=100.0)
+    parser.add_argument("-o", "--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Earlier results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed relative regression (default 0.15)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = parse_args(argv)
+    tool_names = args.tools or server.tools.names()
+    unknown = set(tool_names) - set(server.tools.names())
+    if unknown:
+        logger.error(f"Unknown tools: {', '.join(sorted(unknown))}")
+        return 2
+    if args.url and "direct" in args.transport:
+        logger.error("The direct transport runs in process and cannot be used with --url")
+        return 2
+    if min(args.concurrency) < 1 or args.requests < 1:
+        logger.error("--concurrency and --requests must be at least 1")
+        return 2
+    texts = load_corpus(args.corpus) if args.corpus else synthetic_corpus(seed=args.seed)
+    if not args.cache:
+        os.environ["RESULT_CACHE_SIZE"] = "0"
+    latency = FakeLatency(args.fake_call_ms, args.fake_item_ms, args.fake_char_ms,
+                          args.fake_load_ms)
+
+    fake = args.backend == "fake" and not args.url
+    with fake_malaya(latency) if fake else contextlib.nullcontext():
+        results = asyncio.run(run_benchmarks(
+            args.transport, tool_names, args.concurrency, args.requests, texts,
+            warmup=args.warmup, url=args.url,
+        ))
+
+    report = {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "backend": "remote" if args.url else args.backend,
+        "fake_latency": latency.to_dict() if fake else None,
+        "corpus": args.corpus or f"synthetic (seed {args.seed})",
+        "cache": args.cache,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {name: os.environ[name] for name in SETTINGS if name in os.environ},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        logger.info(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare_results(json.load(f), report, args.tolerance)
+        for regression in regressions:
+            logger.error(f"Regression: {regression}")
+        if regressions:
+            return 1
+        logger.info(f"No regressions beyond {args.tolerance:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    # Only the benchmark's own progress; model loading and request logs are noise here.
+    logging.getLogger().setLevel(logging.WARNING)
+    logger.setLevel(logging.INFO)
+    sys.exit(main())
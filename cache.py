@@ -0,0 +1,406 @@
+"""
+Result caching for MalayLanguage MCP Server
+
+Tool outputs are cached in memory, keyed on the tool name and its normalized
+arguments, so repeated phrases skip the model entirely. Each tool has its own
+size-bounded LRU cache with an optional TTL and hit/miss counters.
+
+Cached results are either lists of TextContent or structured payload dicts.
+Tools marked persistent also use a second tier stored in SQLite under
+MALAYA_CACHE. SQLite runs in WAL mode, so several uvicorn workers can read the
+same file concurrently, and warm results survive restarts and scale-outs.
+
+Configuration:
+    RESULT_CACHE_SIZE              entries kept per tool (default 1024, 0 disables caching)
+    RESULT_CACHE_TTL               seconds before an entry expires (default 0, never)
+    RESULT_CACHE_DISABLE           comma-separated tool names that are never cached
+    PERSISTENT_CACHE               set to 1 to enable the on-disk tier
+    PERSISTENT_CACHE_PATH          database file (default $MALAYA_CACHE/results.sqlite3)
+    PERSISTENT_CACHE_MAX_ENTRIES   rows kept before compaction (default 100000)
+"""
+
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from mcp.types import TextContent
+
+logger = logging.getLogger("malaylanguage-cache")
+
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_PERSISTENT_MAX_ENTRIES = 100_000
+
+_MISSING = object()
+
+
+class ResultCache:
+    """A thread-safe LRU cache with optional per-entry TTL."""
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_CACHE_SIZE,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.ttl = ttl or None
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[Hashable, tuple[Any, Optional[float]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default on a miss."""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entries when full."""
+        expires_at = self.clock() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """Return size and hit/miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class PersistentCache:
+    """A size-capped key/value store in SQLite, shared between processes.
+
+    Each thread (and each forked process) opens its own connection. Access
+    times are refreshed at most once per touch_interval so that reads rarely
+    need a write lock; when the table grows past max_entries the least
+    recently accessed rows are deleted and the file is vacuumed.
+    """
+
+    SCHEMA_VERSION = 2
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = DEFAULT_PERSISTENT_MAX_ENTRIES,
+        touch_interval: float = 3600.0,
+        compact_every: int = 1000,
+    ):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.path = path
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self.compact_every = compact_every
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.compactions = 0
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, accessed REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _encode_key(self, key: Hashable) -> str:
+        return json.dumps([self.SCHEMA_VERSION, key], ensure_ascii=False, separators=(",", ":"))
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the stored value for key, or default on a miss."""
+        conn = self._connect()
+        encoded = self._encode_key(key)
+        row = conn.execute(
+            "SELECT value, accessed FROM results WHERE key = ?", (encoded,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        now = time.time()
+        if now - row[1] > self.touch_interval:
+            conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, encoded))
+        return json.loads(row[0])
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a JSON-serializable value, compacting every compact_every writes."""
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO results (key, value, accessed) VALUES (?, ?, ?)",
+            (self._encode_key(key), json.dumps(value, ensure_ascii=False), time.time()),
+        )
+        self.writes += 1
+        if self.writes % self.compact_every == 0:
+            self.compact()
+
+    def compact(self) -> int:
+        """Trim the table to 90% of max_entries and return the number of rows deleted."""
+        conn = self._connect()
+        count = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        excess = count - int(self.max_entries * 0.9)
+        if count <= self.max_entries or excess <= 0:
+            return 0
+        conn.execute(
+            "DELETE FROM results WHERE key IN "
+            "(SELECT key FROM results ORDER BY accessed, rowid LIMIT ?)",
+            (excess,),
+        )
+        conn.execute("PRAGMA incremental_vacuum")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.compactions += 1
+        logger.info(f"Compacted persistent cache {self.path}: removed {excess} entries")
+        return excess
+
+    def clear(self) -> None:
+        """Delete every stored entry."""
+        self._connect().execute("DELETE FROM results")
+        self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def stats(self) -> dict:
+        """Return counters for this process and the shared row count."""
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "compactions": self.compactions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def normalize_value(value: Any) -> Any:
+    """Normalize an argument so equivalent inputs share a cache key."""
+    if isinstance(value, str):
+        return unicodedata.normalize("NFC", value)
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize_value(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, normalize_value(v)) for k, v in value.items()))
+    return value
+
+
+def is_error_result(result: Any) -> bool:
+    """Return True for the error responses tool functions produce instead of raising.
+
+    Results are either lists of TextContent or structured payload dicts, which
+    carry an "error" key when the tool failed.
+    """
+    if isinstance(result, dict):
+        return "error" in result
+    return any(getattr(content, "text", "").startswith("Error") for content in result)
+
+
+def _freeze(result: Any) -> Any:
+    # Cache a copy so callers cannot mutate the stored result.
+    return dict(result) if isinstance(result, dict) else tuple(result)
+
+
+def _thaw(value: Any) -> Any:
+    return dict(value) if isinstance(value, dict) else list(value)
+
+
+_tool_caches: dict[str, ResultCache] = {}
+_disabled_tools: set[str] = {
+    name.strip() for name in os.environ.get("RESULT_CACHE_DISABLE", "").split(",") if name.strip()
+}
+
+
+_persistent_cache: Optional[PersistentCache] = None
+_persistent_cache_failed = False
+
+
+def default_persistent_cache_path() -> str:
+    """Return the on-disk cache location under MALAYA_CACHE."""
+    cache_dir = os.environ.get("MALAYA_CACHE") or os.path.join(os.path.expanduser("~"), ".malaya")
+    return os.path.join(cache_dir, "results.sqlite3")
+
+
+def get_persistent_cache() -> Optional[PersistentCache]:
+    """Get the shared on-disk cache, or None if it is disabled or unusable."""
+    global _persistent_cache, _persistent_cache_failed
+    if _persistent_cache is None and not _persistent_cache_failed:
+        if os.environ.get("PERSISTENT_CACHE", "").lower() not in ("1", "true", "yes"):
+            return None
+        path = os.environ.get("PERSISTENT_CACHE_PATH") or default_persistent_cache_path()
+        try:
+            _persistent_cache = PersistentCache(
+                path,
+                max_entries=int(
+                    os.environ.get("PERSISTENT_CACHE_MAX_ENTRIES", DEFAULT_PERSISTENT_MAX_ENTRIES)
+                ),
+            )
+            logger.info(f"Persistent result cache enabled at {path}")
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Persistent result cache disabled, cannot open {path}: {e}")
+            _persistent_cache_failed = True
+    return _persistent_cache
+
+
+def set_persistent_cache(cache: Optional[PersistentCache]) -> None:
+    """Replace the shared on-disk cache (None disables it)."""
+    global _persistent_cache, _persistent_cache_failed
+    _persistent_cache = cache
+    _persistent_cache_failed = cache is None
+
+
+def get_tool_cache(tool_name: str) -> Optional[ResultCache]:
+    """Get or create the cache for a tool, or None if caching is disabled for it."""
+    if tool_name in _disabled_tools:
+        return None
+    cache = _tool_caches.get(tool_name)
+    if cache is None:
+        max_size = int(os.environ.get("RESULT_CACHE_SIZE", DEFAULT_CACHE_SIZE))
+        if max_size < 1:
+            return None
+        ttl = float(os.environ.get("RESULT_CACHE_TTL", "0"))
+        cache = ResultCache(max_size=max_size, ttl=ttl)
+        _tool_caches[tool_name] = cache
+    return cache
+
+
+def set_cache_enabled(tool_name: str, enabled: bool) -> None:
+    """Enable or disable result caching for a tool at runtime."""
+    if enabled:
+        _disabled_tools.discard(tool_name)
+    else:
+        _disabled_tools.add(tool_name)
+        _tool_caches.pop(tool_name, None)
+
+
+def clear_caches() -> None:
+    """Drop all cached tool results."""
+    for cache in _tool_caches.values():
+        cache.clear()
+
+
+def cache_stats() -> dict[str, dict]:
+    """Return counters for every tool cache."""
+    return {name: cache.stats() for name, cache in _tool_caches.items()}
+
+
+def _read_persistent(key: tuple) -> Any:
+    persistent = get_persistent_cache()
+    if persistent is None:
+        return None
+    try:
+        stored = persistent.get(key)
+    except sqlite3.Error as e:
+        logger.warning(f"Persistent cache read failed: {e}")
+        return None
+    if stored is None or isinstance(stored, dict):
+        return stored
+    return [TextContent(type="text", text=text) for text in stored]
+
+
+def _write_persistent(key: tuple, result: Any) -> None:
+    persistent = get_persistent_cache()
+    if persistent is None:
+        return
+    if not isinstance(result, dict):
+        result = [content.text for content in result]
+    try:
+        persistent.set(key, result)
+    except sqlite3.Error as e:
+        logger.warning(f"Persistent cache write failed: {e}")
+
+
+def cached_tool(tool_name: str, persistent: bool = False):
+    """Cache an async tool function's results keyed on its normalized arguments.
+
+    Defaults are applied before building the key, so translate("x") and
+    translate("x", "ms", "en") share an entry. Error responses are not cached.
+    With persistent=True, misses in memory fall back to the on-disk cache; both
+    reads and writes of that tier run off the event loop.
+    """
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            cache = get_tool_cache(tool_name)
+            if cache is None:
+                return await func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (tool_name,) + tuple(normalize_value(v) for v in bound.arguments.values())
+            cached = cache.get(key, _MISSING)
+            if cached is not _MISSING:
+                return _thaw(cached)
+            if persistent:
+                stored = await asyncio.to_thread(_read_persistent, key)
+                if stored is not None:
+                    cache.set(key, _freeze(stored))
+                    return stored
+            result = await func(*args, **kwargs)
+            if not is_error_result(result):
+                cache.set(key, _freeze(result))
+                if persistent:
+                    await asyncio.to_thread(_write_persistent, key, result)
+            return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,173 @@
+"""
+Sentence chunking for long inputs
+
+The translation, spelling and paraphrase models work on one sequence, so a
+long document is either truncated by the model or pays attention cost that
+grows with the square of its length. Texts longer than SENTENCE_CHUNK_MIN_CHARS
+are split into sentences instead; every sentence goes through the tool's
+micro-batcher on its own, so a document becomes one or a few batched forward
+passes over short sequences. Results are cached per sentence, which makes
+boilerplate repeated across documents free, and the output is reassembled with
+the original whitespace and paragraph breaks between sentences.
+
+Inside stream_sentences(listener), each sentence is handed to the listener as
+soon as it and every sentence before it are done, so callers can forward
+partial output (MCP progress notifications, the streaming HTTP response).
+Sentences are then submitted in windows of 1, 2, 4, ... so the first one comes
+back on its own while later ones are still batched.
+
+Configuration:
+    SENTENCE_CHUNK_MIN_CHARS   texts longer than this are processed per sentence
+                               (default 400, 0 disables chunking)
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+import os
+import re
+from typing import Awaitable, Callable, Hashable, Iterator, Optional
+
+from cache import get_tool_cache, normalize_value
+
+logger = logging.getLogger("malaylanguage-chunking")
+
+DEFAULT_MIN_CHARS = 400
+
+# A full stop after these does not end a sentence ("Dr. Ali", "No. 5").
+ABBREVIATIONS = {
+    "bhd", "cik", "dato", "datuk", "dll", "dr", "dsb", "e.g", "en", "etc", "hj", "i.e", "jln",
+    "mr", "mrs", "ms", "no", "pn", "prof", "sdn", "st", "tn", "tuan", "vs",
+}
+
+# Called with (index, total, text) for each finished sentence; the texts
+# concatenate to the full result, separators included.
+SentenceListener = Callable[[int, int, str], Awaitable[None]]
+
+_sentence_listener: contextvars.ContextVar[Optional[SentenceListener]] = contextvars.ContextVar(
+    "sentence_listener", default=None
+)
+
+_WHITESPACE = re.compile(r"\s+")
+_SENTENCE_END = re.compile(r"([.!?…]+)[\"'”’)\]]*$")
+
+
+def _ends_sentence(before: str, following: str) -> bool:
+    match = _SENTENCE_END.search(before)
+    if match is None or following.islower():
+        return False
+    if match.group(1) == ".":
+        words = before[: match.start()].split()
+        word = words[-1] if words else ""
+        if word.lower() in ABBREVIATIONS or (len(word) == 1 and word.isalpha()):
+            return False
+    return True
+
+
+def split_sentences(text: str) -> tuple[list[str], list[str]]:
+    """Split text into sentences and the whitespace around them.
+
+    Returns (sentences, separators) with one more separator than sentences:
+    separators[0] is the leading whitespace, separators[i + 1] follows
+    sentences[i], so interleaving them gives back the original text. Line
+    breaks always end a sentence, which keeps paragraph structure intact.
+    """
+    leading = len(text) - len(text.lstrip())
+    sentences, separators = [], [text[:leading]]
+    start = leading
+    for space in _WHITESPACE.finditer(text, leading):
+        if space.end() == len(text):
+            break
+        before = text[start:space.start()]
+        if "\n" in space.group() or _ends_sentence(before, text[space.end()]):
+            sentences.append(before)
+            separators.append(space.group())
+            start = space.end()
+    tail = text[start:]
+    sentences.append(tail.rstrip())
+    separators.append(tail[len(tail.rstrip()):])
+    return sentences, separators
+
+
+def join_sentences(sentences: list[str], separators: list[str]) -> str:
+    """Interleave sentences with their separators (the inverse of split_sentences)."""
+    parts = [separators[0]]
+    for sentence, separator in zip(sentences, separators[1:]):
+        parts.append(sentence)
+        parts.append(separator)
+    return "".join(parts)
+
+
+def chunk_min_chars() -> int:
+    """Return SENTENCE_CHUNK_MIN_CHARS (0 means never chunk)."""
+    return int(os.environ.get("SENTENCE_CHUNK_MIN_CHARS", DEFAULT_MIN_CHARS))
+
+
+@contextlib.contextmanager
+def stream_sentences(listener: Optional[SentenceListener]) -> Iterator[None]:
+    """Send the sentences of chunked tool calls made in this context to listener."""
+    token = _sentence_listener.set(listener)
+    try:
+        yield
+    finally:
+        _sentence_listener.reset(token)
+
+
+async def run_chunked(
+    tool_name: str,
+    text: str,
+    run_one: Callable[[str], Awaitable[str]],
+    key: tuple[Hashable, ...] = (),
+) -> str:
+    """Run run_one on text, or on each of its sentences if the text is long.
+
+    Sentences are submitted concurrently so the micro-batcher merges them,
+    repeated sentences run once, and results are cached per tool under key
+    (the tool's other arguments). Short texts are passed through unchanged.
+    Under stream_sentences the finished sentences are also reported in order.
+    """
+    limit = chunk_min_chars()
+    if limit <= 0 or len(text) <= limit:
+        return await run_one(text)
+    sentences, separators = split_sentences(text)
+    if len(sentences) == 1:
+        return await run_one(text)
+
+    # Sentence results share the tool's cache settings: no tool cache, no sentence cache.
+    cache = None
+    if get_tool_cache(tool_name) is not None:
+        cache = get_tool_cache(f"{tool_name}/sentences")
+    results: dict[str, str] = {}
+    pending = []
+    for sentence in dict.fromkeys(sentences):
+        cached = cache.get((key, normalize_value(sentence))) if cache is not None else None
+        if cached is not None:
+            results[sentence] = cached
+        else:
+            pending.append(sentence)
+    logger.debug(f"{tool_name}: {len(sentences)} sentences, {len(pending)} sent to the model")
+
+    async def run_pending(batch: list[str]) -> None:
+        outputs = await asyncio.gather(*(run_one(sentence) for sentence in batch))
+        for sentence, output in zip(batch, outputs):
+            results[sentence] = output.strip()
+            if cache is not None:
+                cache.set((key, normalize_value(sentence)), results[sentence])
+
+    listener = _sentence_listener.get()
+    if listener is None:
+        await run_pending(pending)
+    else:
+        emitted = position = 0
+        window = 1
+        while emitted < len(sentences):
+            await run_pending(pending[position:position + window])
+            position += window
+            window *= 2
+            while emitted < len(sentences) and sentences[emitted] in results:
+                prefix = separators[0] if emitted == 0 else ""
+                piece = prefix + results[sentences[emitted]] + separators[emitted + 1]
+                await listener(emitted, len(sentences), piece)
+                emitted += 1
+    return join_sentences([results[sentence] for sentence in sentences], separators)
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Fuzzy term index for MalayLanguage MCP Server
+
+term_lookup checks the term against a Malay vocabulary before translating it,
+so a misspelled term one edit away from a headword is looked up as that
+headword; a farther match is only reported as a suggestion. Short words are
+a few edits away from many unrelated words ("ini" -> "itu"), so the distance
+accepted grows with the term's length: none up to 3 characters, one up to 5
+and FUZZY_MAX_DISTANCE beyond. The index is a SymSpell-style deletion
+index: every vocabulary word is stored under each string obtained by deleting
+up to max_distance characters from its first prefix_length characters, so a
+query only generates its own deletions and verifies the few words they lead
+to. Lookups take well under a millisecond.
+
+Building the index for a large vocabulary takes a while, so it is saved as
+JSON next to the model cache and reloaded on startup; it is rebuilt only when the
+vocabulary file or the index settings change.
+
+The vocabulary is a text file with one word per line, optionally followed by
+a tab and a frequency used to rank equally close matches. Without one the
+glossary headwords (see glossary.py) are used.
+
+Configuration:
+    FUZZY_VOCABULARY_PATH   vocabulary file (default: the glossary headwords)
+    FUZZY_INDEX_PATH        saved index (default $MALAYA_CACHE/fuzzy_index.json)
+    FUZZY_MAX_DISTANCE      largest edit distance considered a match (default 2)
+"""
+
+import argparse
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+from typing import Callable, Optional
+
+from glossary import get_glossary, normalize_term
+
+logger = logging.getLogger("malaylanguage-fuzzy")
+
+DEFAULT_MAX_DISTANCE = 2
+DEFAULT_PREFIX_LENGTH = 7
+# Matches this close replace the term; farther ones are only suggested.
+CORRECTION_MAX_DISTANCE = 1
+FORMAT_VERSION = 2
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance between a and b, or limit + 1 if it exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous2 is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1] if previous[-1] <= limit else limit + 1
+
+
+def allowed_distance(term: str, max_distance: int) -> int:
+    """Edits accepted between term and a vocabulary word, scaled by term length."""
+    length = len(normalize_term(term))
+    if length <= 3:
+        return 0
+    if length <= 5:
+        return min(1, max_distance)
+    return max_distance
+
+
+def _deletes(word: str, max_distance: int) -> set[str]:
+    """Every string made by deleting up to max_distance characters from word."""
+    results = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - results
+        results |= frontier
+    return results
+
+
+class FuzzyIndex:
+    """In-memory deletion index over a vocabulary of words with frequencies."""
+
+    def __init__(
+        self,
+        words: dict[str, int],
+        max_distance: int = DEFAULT_MAX_DISTANCE,
+        prefix_length: int = DEFAULT_PREFIX_LENGTH,
+    ):
+        if max_distance < 0:
+            raise ValueError("max_distance must not be negative")
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.words = {normalize_term(word): count for word, count in words.items() if word.strip()}
+        self._deletions: dict[str, list[str]] = {}
+        for word in self.words:
+            for deletion in _deletes(word[:prefix_length], max_distance):
+                self._deletions.setdefault(deletion, []).append(word)
+
+    def __contains__(self, word: str) -> bool:
+        return normalize_term(word) in self.words
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def lookup(self, term: str, max_distance: Optional[int] = None, limit: int = 5) -> list[dict]:
+        """Return up to limit {"word", "distance", "count"} matches, closest first."""
+        limit_distance = self.max_distance if max_distance is None else min(
+            max_distance, self.max_distance
+        )
+        query = normalize_term(term)
+        if query in self.words:
+            return [{"word": query, "distance": 0, "count": self.words[query]}][:limit]
+        candidates = set()
+        for deletion in _deletes(query[: self.prefix_length], limit_distance):
+            candidates.update(self._deletions.get(deletion, ()))
+        matches = []
+        bound = limit_distance
+        for word in candidates:
+            distance = edit_distance(query, word, bound)
+            if distance <= bound:
+                matches.append({"word": word, "distance": distance, "count": self.words[word]})
+                if limit == 1:
+                    # Only ties with the closest match so far can still win.
+                    bound = distance
+        matches.sort(key=lambda m: (m["distance"], -m["count"], m["word"]))
+        return matches[:limit]
+
+    def best(self, term: str) -> Optional[dict]:
+        """Return the closest match within the distance allowed for term's length, or None."""
+        matches = self.lookup(term, allowed_distance(term, self.max_distance), limit=1)
+        return matches[0] if matches else None
+
+    def save(self, path: str, source: tuple = ()) -> None:
+        """Write the index to path, recording the vocabulary it was built from."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # JSON rather than pickle: the file sits in the shared model cache, and
+        # loading it must not be able to run code.
+        state = {
+            "version": FORMAT_VERSION,
+            "source": list(source),
+            "max_distance": self.max_distance,
+            "prefix_length": self.prefix_length,
+            "words": self.words,
+            "deletions": self._deletions,
+        }
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str, source: tuple = ()) -> Optional["FuzzyIndex"]:
+        """Load a saved index, or None if it is missing or was built from another source."""
+        try:
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (not isinstance(state, dict) or state.get("version") != FORMAT_VERSION
+                or state.get("source") != list(source)
+                or not isinstance(state.get("words"), dict)
+                or not isinstance(state.get("deletions"), dict)):
+            return None
+        index = cls.__new__(cls)
+        index.max_distance = state["max_distance"]
+        index.prefix_length = state["prefix_length"]
+        index.words = state["words"]
+        index._deletions = state["deletions"]
+        return index
+
+
+def read_vocabulary(path: str) -> dict[str, int]:
+    """Read one word per line, with an optional tab-separated frequency."""
+    words = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            word, _, count = line.rstrip("\r\n").partition("\t")
+            if word.strip():
+                words[word] = int(count) if count.strip() else 1
+    return words
+
+
+def default_index_path() -> str:
+    """Return the saved index location under MALAYA_CACHE."""
+    cache_dir = os.environ.get("MALAYA_CACHE") or os.path.join(os.path.expanduser("~"), ".malaya")
+    return os.path.join(cache_dir, "fuzzy_index.json")
+
+
+def _vocabulary_source() -> tuple[tuple, Optional[Callable[[], dict[str, int]]]]:
+    """Return a fingerprint of the configured vocabulary and a function that reads it."""
+    max_distance = int(os.environ.get("FUZZY_MAX_DISTANCE", DEFAULT_MAX_DISTANCE))
+    path = os.environ.get("FUZZY_VOCABULARY_PATH")
+    if path is None:
+        glossary = get_glossary()
+        if glossary is None:
+            return (), None
+        path = glossary.path
+
+        def read() -> dict[str, int]:
+            return {entry["term"]: 1 for entry in glossary.entries()}
+    else:
+        read = functools.partial(read_vocabulary, path)
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, max_distance), read
+
+
+_fuzzy_index: Optional[FuzzyIndex] = None
+_fuzzy_index_checked = False
+_fuzzy_index_lock = threading.Lock()
+
+
+def get_fuzzy_index() -> Optional[FuzzyIndex]:
+    """Load (or build and save) the fuzzy index on first use; None without a vocabulary."""
+    global _fuzzy_index, _fuzzy_index_checked
+    if _fuzzy_index_checked:
+        return _fuzzy_index
+    with _fuzzy_index_lock:
+        if _fuzzy_index_checked:
+            return _fuzzy_index
+        try:
+            source, read = _vocabulary_source()
+            if read is not None:
+                path = os.environ.get("FUZZY_INDEX_PATH") or default_index_path()
+                index = FuzzyIndex.load(path, source)
+                if index is None:
+                    index = FuzzyIndex(read(), max_distance=source[-1])
+                    try:
+                        index.save(path, source)
+                    except OSError as e:
+                        logger.warning(f"Could not save fuzzy index to {path}: {e}")
+                    logger.info(f"Built fuzzy index over {len(index)} words")
+                _fuzzy_index = index
+        except (OSError, ValueError) as e:
+            logger.warning(f"Fuzzy term index disabled: {e}")
+        _fuzzy_index_checked = True
+    return _fuzzy_index
+
+
+def set_fuzzy_index(index: Optional[FuzzyIndex]) -> None:
+    """Replace the shared fuzzy index (None disables it)."""
+    global _fuzzy_index, _fuzzy_index_checked
+    _fuzzy_index = index
+    _fuzzy_index_checked = True
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build or query the fuzzy term index.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("build", help="Build and save the index from the configured vocabulary")
+    lookup = commands.add_parser("lookup", help="List the closest vocabulary words for a term")
+    lookup.add_argument("term")
+    args = parser.parse_args(argv)
+
+    index = get_fuzzy_index()
+    if index is None:
+        logger.error("No vocabulary: set FUZZY_VOCABULARY_PATH or build a glossary first")
+        return 1
+    if args.command == "build":
+        logger.info(f"Fuzzy index ready with {len(index)} words")
+    else:
+        for match in index.lookup(args.term):
+            print(f"{match['word']}\t{match['distance']}")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Glossary index for MalayLanguage MCP Server
+
+apply_glossary answers from a local dictionary before falling back to the
+translation model. The dictionary is compiled from a user-provided term list
+into one compact file: a header, a table of record offsets and the records
+themselves sorted by normalized term. The file is memory-mapped on first use
+and searched in place, so lookups take microseconds and the pages are shared
+by every worker process.
+
+Lookups try the exact term, then its root word with common Malay affixes
+removed (e.g. "makanan" -> "makan"); prefix search lists related headwords.
+
+Build an index from a CSV/TSV file with `term` and `translation` columns and
+an optional `definition` column:
+
+    python glossary.py build terms.csv -o glossary.idx
+
+Configuration:
+    GLOSSARY_PATH   compiled index file (default $MALAYA_CACHE/glossary.idx)
+"""
+
+import argparse
+import csv
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import unicodedata
+from typing import Iterable, Iterator, Optional
+
+logger = logging.getLogger("malaylanguage-glossary")
+
+MAGIC = b"MLGLOS01"
+_HEADER = struct.Struct("<8sI")
+_OFFSET = struct.Struct("<I")
+_FIELD_SEPARATOR = b"\x1f"
+
+# Longest first, so "memper" is tried before "mem" and "kannya" before "nya".
+PREFIXES = (
+    "memper", "menge", "penge", "meng", "meny", "mem", "men", "me", "peng", "peny", "pem", "pen",
+    "per", "pe", "ber", "be", "ter", "te", "di", "ke", "se",
+)
+SUFFIXES = ("kannya", "annya", "kan", "nya", "lah", "kah", "pun", "an", "i")
+VOWELS = "aeiou"
+# The meN-/peN- prefix takes its form from the root's first sound: (initials the
+# root keeps after this form, letter the form replaces before a vowel). So mem-
+# goes before b/f/v and replaces p (memukul -> pukul), and plain me- only goes
+# before m/n/ny/ng/l/r/w/y (memakan -> makan, not akan). None allows any root,
+# as menge-/penge- only goes before one-syllable roots (mengecat -> cat).
+NASAL_FORMS = {
+    "me": (("l", "m", "n", "r", "w", "y"), None),
+    "mem": (("b", "f", "v"), "p"),
+    "men": (("c", "d", "j", "z", "sy"), "t"),
+    "meny": ((), "s"),
+    "meng": (tuple(VOWELS) + ("g", "h", "kh"), "k"),
+    "menge": (None, None),
+}
+NASAL_FORMS.update({"p" + prefix[1:]: form for prefix, form in list(NASAL_FORMS.items())})
+MIN_ROOT_LENGTH = 3
+
+
+def normalize_term(term: str) -> str:
+    """Normalize a term for lookup: NFC, trimmed, lower case."""
+    return unicodedata.normalize("NFC", term).strip().lower()
+
+
+def _prefix_roots(prefix: str, rest: str) -> list[tuple[int, str]]:
+    """Return (rank, root) pairs for a word of prefix + rest.
+
+    Rank 1 is a root the prefix's form allows as is, 2 one with its first
+    letter restored and 3 one the spelling rules rule out.
+    """
+    if prefix not in NASAL_FORMS:
+        return [(1, rest)]
+    initials, restored = NASAL_FORMS[prefix]
+    roots = [(1 if initials is None or rest.startswith(initials) else 3, rest)]
+    if restored:
+        roots.append((2 if rest[0] in VOWELS else 3, restored + rest))
+    return roots
+
+
+def root_candidates(term: str) -> list[str]:
+    """Return possible root words of a Malay word, most likely first.
+
+    The word itself comes first, then suffix-stripped stems and prefix-stripped
+    roots that follow the meN-/peN- spelling rules (least stripped first), then
+    roots needing a restored first letter, then the ones the rules rule out.
+    """
+    word = normalize_term(term)
+    stems = [word]
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_ROOT_LENGTH:
+            stems.append(word[: -len(suffix)])
+    ranked = []
+    for stem in stems:
+        ranked.append((0 if stem == word else 1, stem))
+        for prefix in PREFIXES:
+            if stem.startswith(prefix) and len(stem) - len(prefix) >= MIN_ROOT_LENGTH:
+                ranked.extend(_prefix_roots(prefix, stem[len(prefix):]))
+    ranked.sort(key=lambda pair: pair[0])
+    return list(dict.fromkeys(root for _, root in ranked))
+
+
+def _encode(entry: dict) -> bytes:
+    fields = (normalize_term(entry["term"]), entry["term"].strip(),
+              entry.get("translation") or "", entry.get("definition") or "")
+    for field in fields:
+        if "\x1f" in field:
+            raise ValueError(f"Glossary field contains a control character: {field!r}")
+    return _FIELD_SEPARATOR.join(field.encode("utf-8") for field in fields)
+
+
+def build_index(entries: Iterable[dict], path: str) -> int:
+    """Write entries ({"term", "translation", "definition"}) to an index file.
+
+    Later entries for the same normalized term replace earlier ones. Returns
+    the number of records written.
+    """
+    records = {}
+    for entry in entries:
+        if entry.get("term", "").strip():
+            record = _encode(entry)
+            records[record.split(_FIELD_SEPARATOR, 1)[0]] = record
+    ordered = [records[key] for key in sorted(records)]
+    offsets = []
+    position = 0
+    for record in ordered:
+        offsets.append(position)
+        position += len(record)
+    offsets.append(position)
+
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(ordered)))
+        for offset in offsets:
+            f.write(_OFFSET.pack(offset))
+        for record in ordered:
+            f.write(record)
+    os.replace(temporary, path)
+    return len(ordered)
+
+
+def read_term_list(path: str) -> list[dict]:
+    """Read a CSV or TSV term list with term, translation and optional definition columns."""
+    delimiter = "\t" if path.lower().endswith((".tsv", ".tab")) else ","
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f, delimiter=delimiter)
+        missing = {"term", "translation"} - set(reader.fieldnames or [])
+        if missing:
+            raise ValueError(f"Term list {path} is missing columns: {', '.join(sorted(missing))}")
+        return list(reader)
+
+
+class GlossaryIndex:
+    """Read-only, memory-mapped view of a compiled glossary file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < _HEADER.size:
+            raise ValueError(f"{path} is not a glossary index")
+        magic, self._count = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a glossary index")
+        self._data_start = _HEADER.size + _OFFSET.size * (self._count + 1)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self) -> None:
+        self._map.close()
+
+    def _offset(self, index: int) -> int:
+        position = _HEADER.size + _OFFSET.size * index
+        return self._data_start + _OFFSET.unpack_from(self._map, position)[0]
+
+    def _record(self, index: int) -> bytes:
+        return self._map[self._offset(index):self._offset(index + 1)]
+
+    def _key(self, index: int) -> bytes:
+        start = self._offset(index)
+        end = self._map.find(_FIELD_SEPARATOR, start, self._offset(index + 1))
+        return self._map[start:end]
+
+    def _lower_bound(self, key: bytes) -> int:
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _entry(self, index: int) -> dict:
+        _, term, translation, definition = self._record(index).decode("utf-8").split("\x1f")
+        entry = {"term": term, "translation": translation}
+        if definition:
+            entry["definition"] = definition
+        return entry
+
+    def exact(self, term: str) -> Optional[dict]:
+        """Return the entry for exactly this term (case-insensitive), or None."""
+        key = normalize_term(term).encode("utf-8")
+        index = self._lower_bound(key)
+        if index < self._count and self._key(index) == key:
+            return self._entry(index)
+        return None
+
+    def lemma(self, term: str) -> Optional[dict]:
+        """Return the entry for the term's root word, or None."""
+        for candidate in root_candidates(term)[1:]:
+            entry = self.exact(candidate)
+            if entry is not None:
+                return entry
+        return None
+
+    def prefix(self, prefix: str, limit: int = 10) -> list[dict]:
+        """Return up to limit entries whose term starts with prefix, in order."""
+        key = normalize_term(prefix).encode("utf-8")
+        entries = []
+        index = self._lower_bound(key)
+        while index < self._count and len(entries) < limit and self._key(index).startswith(key):
+            entries.append(self._entry(index))
+            index += 1
+        return entries
+
+    def entries(self) -> Iterator[dict]:
+        """Yield every entry in term order."""
+        for index in range(self._count):
+            yield self._entry(index)
+
+    def lookup(self, term: str) -> Optional[dict]:
+        """Return the exact entry, else the root-word entry, tagged with how it matched."""
+        entry = self.exact(term)
+        if entry is not None:
+            return dict(entry, match="exact")
+        entry = self.lemma(term)
+        if entry is not None:
+            return dict(entry, match="lemma")
+        return None
+
+
+_glossary: Optional[GlossaryIndex] = None
+_glossary_checked = False
+_glossary_lock = threading.Lock()
+
+
+def default_glossary_path() -> str:
+    """Return the glossary location under MALAYA_CACHE."""
+    cache_dir = os.environ.get("MALAYA_CACHE") or os.path.join(os.path.expanduser("~"), ".malaya")
+    return os.path.join(cache_dir, "glossary.idx")
+
+
+def get_glossary() -> Optional[GlossaryIndex]:
+    """Open the configured glossary on first use; None when there is none."""
+    global _glossary, _glossary_checked
+    if not _glossary_checked:
+        with _glossary_lock:
+            if not _glossary_checked:
+                path = os.environ.get("GLOSSARY_PATH") or default_glossary_path()
+                if os.path.exists(path):
+                    try:
+                        _glossary = GlossaryIndex(path)
+                        logger.info(f"Loaded glossary with {len(_glossary)} terms from {path}")
+                    except (OSError, ValueError) as e:
+                        logger.warning(f"Glossary disabled, cannot open {path}: {e}")
+                _glossary_checked = True
+    return _glossary
+
+
+def set_glossary(glossary: Optional[GlossaryIndex]) -> None:
+    """Replace the shared glossary (None disables it)."""
+    global _glossary, _glossary_checked
+    _glossary = glossary
+    _glossary_checked = True
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build or query a glossary index.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Compile a CSV/TSV term list into an index")
+    build.add_argument("terms", help="CSV or TSV file with term and translation columns")
+    build.add_argument("-o", "--output", default=None,
+                       help="Index file (default GLOSSARY_PATH or $MALAYA_CACHE/glossary.idx)")
+    lookup = commands.add_parser("lookup", help="Look a term up in an index")
+    lookup.add_argument("term")
+    lookup.add_argument("-i", "--index", default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        output = args.output or os.environ.get("GLOSSARY_PATH") or default_glossary_path()
+        try:
+            count = build_index(read_term_list(args.terms), output)
+        except (OSError, ValueError) as e:
+            logger.error(str(e))
+            return 1
+        logger.info(f"Wrote {count} terms to {output}")
+        return 0
+
+    index = GlossaryIndex(args.index or os.environ.get("GLOSSARY_PATH") or default_glossary_path())
+    print(index.lookup(args.term) or f"{args.term}: not found")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
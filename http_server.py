@@ -6,25 +6,113 @@ Provides HTTP/SSE streaming support at /sse endpoint.
 """
 
 import asyncio
+import contextlib
+import json
 import logging
 import os
-from typing import Any
+import signal
+import socket
+import time
+from typing import Any, Optional
 
 import uvicorn
 from mcp.server.sse import SseServerTransport
+from mcp.types import TextContent
 from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.requests import ClientDisconnect
 from starlette.routing import Route
-from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 
+from admission import ToolOverloadedError, admission_stats, admit_batch, in_admitted_batch
+from cache import cache_stats, get_persistent_cache, is_error_result
+from chunking import stream_sentences
 from server import app as mcp_app
+from server import tools
+from inference import get_inference_executor
 from server import (
-    detect_language, normalize_malay, correct_spelling, 
-    apply_glossary, rewrite_style, translate, term_lookup
+    evict_idle_models, import_timings, inference_model_status, load_model, model_idle_timeout,
+    model_status, warm_up, warmup_model_keys,
 )
+from metrics import HTTP_REQUESTS, Sampled, monitor_event_loop_lag, render_metrics
+from normalize_rules import normalize_stats
+from tool_registry import ToolTimeoutError, UnknownToolError
+from tracing import get_tracer
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("malaylanguage-http")
 
+# Readiness is separate from liveness: /health answers as soon as the process
+# is up, /ready only once the WARMUP_MODELS are loaded and have served a request.
+_readiness = {
+    "ready": False,
+    "models": [],
+    "warmed": {},
+    "error": None,
+    "attempts": 0,
+}
+
+
+async def run_warmup(model_keys: Optional[list[str]] = None, retry_delay: float = 30.0):
+    """Warm up models in the background, retrying until every one succeeds."""
+    keys = warmup_model_keys() if model_keys is None else model_keys
+    _readiness.update(ready=False, models=keys, warmed={}, error=None, attempts=0)
+    while True:
+        _readiness["attempts"] += 1
+        try:
+            pending = [key for key in keys if key not in _readiness["warmed"]]
+            for key, seconds in (await warm_up(pending)).items():
+                _readiness["warmed"][key] = round(seconds, 3)
+        except Exception as e:
+            logger.error(f"Warm-up failed (attempt {_readiness['attempts']}): {e}")
+            _readiness["error"] = str(e)
+            await asyncio.sleep(retry_delay)
+            continue
+        _readiness.update(ready=True, error=None)
+        logger.info(f"Warm-up complete: {', '.join(keys) or 'no models configured'}")
+        log_import_timings()
+        return
+
+
+def log_import_timings():
+    """Log how long each module import took, slowest first."""
+    timings = sorted(import_timings().items(), key=lambda item: item[1], reverse=True)
+    breakdown = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings)
+    logger.info(f"Import time breakdown: {breakdown}")
+
+
+async def run_idle_eviction(interval: float):
+    """Periodically drop models idle past MODEL_IDLE_TIMEOUT, even with no traffic."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(evict_idle_models)
+        except Exception as e:
+            logger.error(f"Idle model eviction failed: {e}")
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    """Start warm-up and idle eviction with the server and cancel them on shutdown."""
+    log_import_timings()
+    tasks = [
+        asyncio.create_task(
+            run_warmup(retry_delay=float(os.environ.get("WARMUP_RETRY_SECONDS", "30")))
+        ),
+        asyncio.create_task(monitor_event_loop_lag()),
+    ]
+    idle_timeout = model_idle_timeout()
+    if idle_timeout:
+        tasks.append(asyncio.create_task(run_idle_eviction(min(idle_timeout / 2, 60.0))))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
 
 async def health_check(request):
     """Health check endpoint for deployment platforms."""
@@ -49,6 +137,142 @@ async def healthz(request):
     return PlainTextResponse("ok")
 
 
+async def ready_check(request):
+    """Readiness endpoint: 200 once warm-up has loaded and exercised its models."""
+    body = {
+        "status": "ready" if _readiness["ready"] else "warming_up",
+        "models": _readiness["models"],
+        "warmed": _readiness["warmed"],
+    }
+    if _readiness["error"]:
+        body["error"] = _readiness["error"]
+    return JSONResponse(body, status_code=200 if _readiness["ready"] else 503)
+
+
+def parse_smaps_rollup(lines) -> dict:
+    """Turn /proc/<pid>/smaps_rollup lines into RSS, PSS, shared and private MB."""
+    fields = {"Rss": 0, "Pss": 0, "Shared_Clean": 0, "Shared_Dirty": 0,
+              "Private_Clean": 0, "Private_Dirty": 0}
+    for line in lines:
+        name, _, rest = line.partition(":")
+        if name in fields:
+            fields[name] = int(rest.split()[0])
+
+    def to_mb(kb: int) -> float:
+        return round(kb / 1024, 1)
+
+    return {
+        "rss_mb": to_mb(fields["Rss"]),
+        "pss_mb": to_mb(fields["Pss"]),
+        "shared_mb": to_mb(fields["Shared_Clean"] + fields["Shared_Dirty"]),
+        "private_mb": to_mb(fields["Private_Clean"] + fields["Private_Dirty"]),
+    }
+
+
+def process_memory(pid: Any = "self") -> dict:
+    """Return RSS, PSS, shared and private memory in MB for a process.
+
+    Uses /proc/<pid>/smaps_rollup, so after fork-after-load the shared figure
+    shows how much of the model weights a worker still shares with its parent.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            return parse_smaps_rollup(f)
+    except (OSError, ValueError, IndexError):
+        return {}
+
+
+async def models_handler(request):
+    """Report loaded models, their approximate memory use and last-use times.
+
+    With INFERENCE_EXECUTOR=process the models live in the pool workers, so
+    each worker's registry is listed under "inference_workers". The
+    normalize_malay rule fast-path counters are under "normalize_fast_path".
+    """
+    body = dict(model_status(), process=process_memory(), normalize_fast_path=normalize_stats())
+    if get_inference_executor().kind == "process":
+        body["inference_workers"] = await inference_model_status()
+    return JSONResponse(body)
+
+
+_MB = 1024 * 1024
+
+
+def snapshot_metrics(worker_statuses: list[dict]) -> list[Sampled]:
+    """Metrics read from the caches, model registries and /proc at scrape time."""
+    caches = dict(cache_stats())
+    persistent = get_persistent_cache()
+    if persistent is not None:
+        caches["persistent"] = persistent.stats()
+    models = [
+        ((key, str(status["pid"])), stats)
+        for status in worker_statuses
+        for key, stats in status["load_stats"].items()
+    ]
+    normalize = normalize_stats()
+    memory = process_memory()
+    admission = admission_stats()
+
+    def per_cache(field):
+        return lambda: [((name,), stats[field]) for name, stats in caches.items()]
+
+    def per_model(field):
+        return lambda: [(labels, stats[field] or 0) for labels, stats in models]
+
+    return [
+        Sampled("malaya_cache_hits_total", "Result cache hits.", ("cache",),
+                per_cache("hits"), kind="counter"),
+        Sampled("malaya_cache_misses_total", "Result cache misses.", ("cache",),
+                per_cache("misses"), kind="counter"),
+        Sampled("malaya_cache_hit_ratio", "Result cache hits over lookups.", ("cache",),
+                per_cache("hit_ratio")),
+        Sampled("malaya_model_loaded", "1 if the model is loaded in the process.",
+                ("model", "pid"), lambda: [(labels, int(stats["loaded"])) for labels, stats in models]),
+        Sampled("malaya_model_size_bytes", "Approximate memory used by the model.",
+                ("model", "pid"), per_model("size_bytes")),
+        Sampled("malaya_model_loads_total", "Completed model loads.", ("model", "pid"),
+                per_model("loads"), kind="counter"),
+        Sampled("malaya_model_load_seconds_total", "Time spent loading the model.",
+                ("model", "pid"), per_model("total_load_seconds"), kind="counter"),
+        Sampled("malaya_process_memory_bytes", "Memory of this server process from smaps_rollup.",
+                ("kind",), lambda: [((name[:-3],), value * _MB) for name, value in memory.items()]),
+        Sampled("malaya_normalize_requests_total", "normalize_malay calls by path (rules or model).",
+                ("path",), lambda: [(("rules",), normalize["fast_path"]),
+                                    (("model",), normalize["model_path"])] if normalize else [],
+                kind="counter"),
+        Sampled("malaya_admission_active", "Tool calls holding an admission slot.", (),
+                lambda: [((), admission["active"])] if admission else []),
+        Sampled("malaya_admission_queued", "Tool calls waiting for an admission slot.", ("tool",),
+                lambda: [((tool,), n) for tool, n in admission.get("queued", {}).items()]),
+    ]
+
+
+async def metrics_handler(request):
+    """Prometheus metrics: tool calls, phase latencies, batches, admission, caches and models."""
+    if get_inference_executor().kind == "process":
+        statuses = await inference_model_status()
+    else:
+        statuses = [model_status()]
+    return PlainTextResponse(
+        render_metrics(snapshot_metrics(statuses)), media_type="text/plain; version=0.0.4"
+    )
+
+
+async def traces_handler(request):
+    """Recent spans from the in-process trace exporter (TRACING=memory), newest first."""
+    exporter = get_tracer().memory_exporter()
+    if exporter is None:
+        return JSONResponse({"enabled": False, "spans": []})
+    try:
+        limit = int(request.query_params.get("limit", "100"))
+    except ValueError:
+        return JSONResponse({"error": "'limit' must be an integer"}, status_code=400)
+    return JSONResponse({
+        "enabled": True,
+        "spans": exporter.spans(limit=limit, name=request.query_params.get("name")),
+    })
+
+
 async def root_handler(request):
     """Root endpoint with service information."""
     return JSONResponse({
@@ -57,95 +281,537 @@ async def root_handler(request):
         "mcp_endpoint": "/sse",
         "post_endpoint": "/messages",
         "health_endpoint": "/health",
+        "ready_endpoint": "/ready",
+        "models_endpoint": "/models",
+        "metrics_endpoint": "/metrics",
+        "traces_endpoint": "/traces",
         "documentation": "https://github.com/zairulanuar/MalayLanguage"
     })
 
 
+# One transport for every connection: a POST to /messages is routed to the
+# SSE session named by its session_id.
+sse_transport = SseServerTransport("/messages")
+
+
+class AlreadySent(Response):
+    """Returned by endpoints whose response the MCP transport has already sent."""
+
+    async def __call__(self, scope, receive, send) -> None:
+        pass
+
+
 async def handle_sse(request):
     """Handle SSE connections for MCP protocol."""
-    sse = SseServerTransport("/messages")
-    async with sse.connect_sse(
+    async with sse_transport.connect_sse(
         request.scope, request.receive, request._send
     ) as (read_stream, write_stream):
         await mcp_app.run(read_stream, write_stream, mcp_app.create_initialization_options())
-    return PlainTextResponse("SSE connection closed")
+    return AlreadySent()
 
 
 async def handle_post_messages(request):
     """Handle POST messages for MCP protocol."""
-    # This is a simpler approach - create transport per request
-    sse = SseServerTransport("/messages")
-    return await sse.handle_post_message(request)
+    await sse_transport.handle_post_message(request.scope, request.receive, request._send)
+    return AlreadySent()
+
+
+async def run_tool(name: str, arguments: dict) -> list[TextContent]:
+    """Dispatch a tool call by name through the shared tool registry."""
+    return await tools.call(name, arguments)
+
+
+def serialize_result(result: list[TextContent]) -> list[dict]:
+    """Convert tool output (list[TextContent]) to JSON-ready dicts."""
+    return [{"type": c.type, "text": c.text} for c in result]
+
+
+RESULT_FORMATS = ("text", "json")
+
+
+def result_format(value: Any) -> str:
+    """Validate a requested result format; "text" when none is given."""
+    value = value or "text"
+    if value not in RESULT_FORMATS:
+        raise ValueError(f"Unknown format '{value}', expected one of {RESULT_FORMATS}")
+    return value
+
+
+async def run_tool_as(name: str, arguments: dict, fmt: str) -> tuple[Any, Optional[str]]:
+    """Run a tool and return (result, error message or None) in the given format.
+
+    "text" gives the serialized TextContent list; "json" gives the tool's
+    structured payload, skipping the text formatting altogether.
+    """
+    if fmt == "json":
+        data = await tools.run(name, arguments)
+        return data, data.get("error")
+    result = await run_tool(name, arguments)
+    return serialize_result(result), result[0].text if is_error_result(result) else None
+
+
+async def stream_tool_execute(name: str, arguments: dict, fmt: str):
+    """Run a tool and yield NDJSON: one record per finished sentence, then the result.
+
+    Sentence records are {"index", "total", "text"}; their texts concatenate to
+    the full output. Short inputs, which are not split, only get the final
+    {"tool", "result"} (or {"error"}) record.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def on_sentence(index: int, total: int, text: str) -> None:
+        await queue.put({"index": index, "total": total, "text": text})
+
+    async def run() -> None:
+        with stream_sentences(on_sentence):
+            try:
+                result, _ = await run_tool_as(name, arguments, fmt)
+                record = {"tool": name, "result": result}
+            except ToolOverloadedError as e:
+                record = e.to_dict()
+            except Exception as e:
+                logger.error(f"Tool execution error: {e}")
+                record = {"error": str(e)}
+        await queue.put(record)
+        await queue.put(None)
+
+    task = asyncio.create_task(run())
+    try:
+        while (record := await queue.get()) is not None:
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+    finally:
+        # The client went away: stop generating for it.
+        task.cancel()
 
 
 async def handle_tool_execute(request):
-    """Execute a tool directly via HTTP POST."""
+    """Execute a tool directly via HTTP POST.
+
+    With `"format": "json"` in the body (or `?format=json`) the result is the
+    tool's structured payload instead of the formatted text. With
+    `"stream": true` (or `?stream=1`) the response is NDJSON that delivers each
+    sentence of a long input as soon as it is done (see stream_tool_execute).
+    """
     try:
         data = await request.json()
+    except ValueError:
+        return JSONResponse({"error": "Request body must be valid JSON"}, status_code=400)
+    if not isinstance(data, dict):
+        return JSONResponse({"error": "Request body must be a JSON object"}, status_code=400)
+    try:
+        fmt = result_format(data.get("format") or request.query_params.get("format"))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    stream = data.get("stream", request.query_params.get("stream", "") in ("1", "true"))
+    try:
         name = data.get("name")
         arguments = data.get("arguments", {})
         
         if not name:
             return JSONResponse({"error": "Tool name is required"}, status_code=400)
-            
-        result = []
-        if name == "detect_language":
-            result = await detect_language(arguments.get("text", ""))
-        elif name == "normalize_malay":
-            result = await normalize_malay(arguments.get("text", ""))
-        elif name == "correct_spelling":
-            result = await correct_spelling(arguments.get("text", ""))
-        elif name == "apply_glossary":
-            result = await apply_glossary(arguments.get("term", ""))
-        elif name == "rewrite_style":
-            result = await rewrite_style(
-                arguments.get("text", ""),
-                arguments.get("style", "formal")
-            )
-        elif name == "translate":
-            result = await translate(
-                arguments.get("text", ""),
-                arguments.get("source_lang", "ms"),
-                arguments.get("target_lang", "en")
+        if not isinstance(arguments, dict):
+            return JSONResponse({"error": "'arguments' must be an object"}, status_code=400)
+
+        if stream:
+            tools.get(name)
+            return StreamingResponse(
+                stream_tool_execute(name, arguments, fmt), media_type="application/x-ndjson"
             )
-        elif name == "term_lookup":
-            result = await term_lookup(arguments.get("term", ""))
-        else:
-            return JSONResponse({"error": f"Unknown tool: {name}"}, status_code=400)
-            
-        # Result is list[TextContent]. Convert to JSON.
+        result, _ = await run_tool_as(name, arguments, fmt)
         return JSONResponse({
             "tool": name,
-            "result": [
-                {"type": c.type, "text": c.text} for c in result
-            ]
+            "result": result
         })
         
+    except UnknownToolError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except ToolTimeoutError as e:
+        return JSONResponse({"error": str(e)}, status_code=504)
+    except ToolOverloadedError as e:
+        return JSONResponse(
+            e.to_dict(), status_code=e.status_code, headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         logger.error(f"Tool execution error: {e}")
         return JSONResponse({"error": str(e)}, status_code=500)
 
 
+DEFAULT_BATCH_MAX_ITEMS = 5000
+DEFAULT_BATCH_CONCURRENCY = 256
+
+
+def _batch_items(data: dict) -> list:
+    """Expand a batch body into a list of {name, arguments} items."""
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    if "items" in data:
+        items = data["items"]
+        if not isinstance(items, list):
+            raise ValueError("'items' must be an array")
+        return items
+    if "texts" in data:
+        name = data.get("name")
+        texts = data["texts"]
+        if not name:
+            raise ValueError("Tool name is required with 'texts'")
+        if not isinstance(texts, list):
+            raise ValueError("'texts' must be an array")
+        arguments = data.get("arguments", {})
+        if not isinstance(arguments, dict):
+            raise ValueError("'arguments' must be an object")
+        field = tools.get(name).text_argument
+        return [{"name": name, "arguments": dict(arguments, **{field: text})} for text in texts]
+    raise ValueError("Request body must contain 'items' or 'name' and 'texts'")
+
+
+async def handle_tool_batch(request):
+    """Execute many tool calls in one request, returning results in input order.
+
+    All items run concurrently, so calls for the same model are merged into
+    batched forward passes by the micro-batcher. A failing item reports its own
+    error without failing the rest of the batch.
+
+    The batch is admitted as a whole (see admission.py): it is shed with 429 or
+    503 only on arrival, and runs at most as many items at once as there were
+    free admission slots.
+    """
+    try:
+        data = await request.json()
+        items = _batch_items(data)
+        fmt = result_format(data.get("format"))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    max_items = int(os.environ.get("BATCH_MAX_ITEMS", DEFAULT_BATCH_MAX_ITEMS))
+    if len(items) > max_items:
+        return JSONResponse(
+            {"error": f"Batch of {len(items)} items exceeds the limit of {max_items}"},
+            status_code=413,
+        )
+
+    names = {item.get("name") for item in items if isinstance(item, dict)}
+    try:
+        concurrency = await admit_batch(
+            names.pop() if len(names) == 1 else "batch",
+            int(os.environ.get("BATCH_CONCURRENCY", DEFAULT_BATCH_CONCURRENCY)),
+        )
+    except ToolOverloadedError as e:
+        return JSONResponse(
+            e.to_dict(), status_code=e.status_code, headers={"Retry-After": str(e.retry_after)}
+        )
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_item(index: int, item: Any) -> dict:
+        if not isinstance(item, dict) or not item.get("name"):
+            return {"index": index, "error": "Tool name is required"}
+        name = item["name"]
+        async with semaphore:
+            try:
+                result, error = await run_tool_as(name, item.get("arguments") or {}, fmt)
+            except Exception as e:
+                return {"index": index, "tool": name, "error": str(e)}
+        entry = {"index": index, "tool": name, "result": result}
+        if error:
+            entry["error"] = error
+        return entry
+
+    with in_admitted_batch():
+        results = await asyncio.gather(*(run_item(i, item) for i, item in enumerate(items)))
+    return JSONResponse({
+        "count": len(results),
+        "errors": sum(1 for r in results if "error" in r),
+        "results": results,
+    })
+
+
+DEFAULT_STREAM_MAX_IN_FLIGHT = 64
+DEFAULT_STREAM_MAX_LINE_BYTES = 1024 * 1024
+
+
+async def _iter_lines(chunks, max_line_bytes: int):
+    """Split an async byte stream into lines without buffering the whole body."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+        if len(buffer) > max_line_bytes:
+            raise ValueError(f"Line longer than {max_line_bytes} bytes")
+    if buffer:
+        yield buffer
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """A StreamingResponse whose body generator reads the request body itself.
+
+    Under ASGI spec < 2.4 (uvicorn, the test client) StreamingResponse also
+    listens for disconnects on receive(), which swallows request body chunks
+    still being uploaded. Here the generator owns receive(); a disconnect
+    surfaces through request.stream() instead.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+
+async def handle_tool_stream(request):
+    """Stream a large corpus through one tool, line by line, as NDJSON.
+
+    The tool is named by the `tool` query parameter and any other query
+    parameters are passed as fixed arguments (e.g. `source_lang=ms`). With a
+    text/plain body every line is one input text; otherwise each line is a JSON
+    string or an object of tool arguments. Results are written back as
+    {"line", "result"} or {"line", "error"} NDJSON records in input order;
+    `format=json` makes each result the tool's structured payload.
+
+    At most STREAM_MAX_IN_FLIGHT lines are processed at once, and the request
+    body is only read further as results are written out, so memory stays
+    bounded and a slow client slows down the upload instead of piling up work.
+    Like a batch, the stream is admitted as a whole and keeps no more lines in
+    flight than there were free admission slots.
+    """
+    params = dict(request.query_params)
+    name = params.pop("tool", None)
+    if not name:
+        return JSONResponse({"error": "Query parameter 'tool' is required"}, status_code=400)
+    if name not in tools:
+        return JSONResponse({"error": f"Unknown tool: {name}"}, status_code=400)
+    try:
+        fmt = result_format(params.pop("format", None))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    text_mode = request.headers.get("content-type", "").startswith("text/plain")
+    field = tools.get(name).text_argument
+    max_in_flight = int(os.environ.get("STREAM_MAX_IN_FLIGHT", DEFAULT_STREAM_MAX_IN_FLIGHT))
+    max_line_bytes = int(os.environ.get("STREAM_MAX_LINE_BYTES", DEFAULT_STREAM_MAX_LINE_BYTES))
+    try:
+        max_in_flight = await admit_batch(name, max_in_flight)
+    except ToolOverloadedError as e:
+        return JSONResponse(
+            e.to_dict(), status_code=e.status_code, headers={"Retry-After": str(e.retry_after)}
+        )
+
+    async def process(line_number: int, raw: bytes) -> dict:
+        try:
+            if text_mode:
+                arguments = dict(params, **{field: raw.decode("utf-8").rstrip("\r")})
+            else:
+                value = json.loads(raw)
+                if isinstance(value, str):
+                    arguments = dict(params, **{field: value})
+                elif isinstance(value, dict):
+                    arguments = dict(params, **value)
+                else:
+                    raise ValueError("Each line must be a JSON string or object")
+            result, error = await run_tool_as(name, arguments, fmt)
+        except Exception as e:
+            return {"line": line_number, "error": str(e)}
+        if error:
+            return {"line": line_number, "error": error}
+        return {"line": line_number, "result": result}
+
+    async def results():
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max_in_flight)
+
+        async def read():
+            line_number = 0
+            try:
+                # The tasks created here inherit the reader's context.
+                with in_admitted_batch():
+                    async for raw in _iter_lines(request.stream(), max_line_bytes):
+                        line_number += 1
+                        if raw.strip():
+                            await queue.put(asyncio.create_task(process(line_number, raw)))
+            except Exception as e:
+                await queue.put({"line": line_number + 1, "error": f"Input stream error: {e}"})
+            finally:
+                await queue.put(None)
+
+        reader = asyncio.create_task(read())
+        try:
+            while (item := await queue.get()) is not None:
+                record = item if isinstance(item, dict) else await item
+                yield json.dumps(record, ensure_ascii=False) + "\n"
+        finally:
+            reader.cancel()
+            while not queue.empty():
+                item = queue.get_nowait()
+                if isinstance(item, asyncio.Task):
+                    item.cancel()
+
+    return DuplexStreamingResponse(results(), media_type="application/x-ndjson")
+
+
+class RequestMetricsMiddleware:
+    """Count HTTP requests by method, route and status; unknown paths count as "other"."""
+
+    def __init__(self, app, paths: set[str]):
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope["path"] if scope["path"] in self.paths else "other"
+            HTTP_REQUESTS.inc(scope["method"], route, str(status))
+
+
 # Create Starlette app
 routes = [
     Route("/", endpoint=root_handler, methods=["GET"]),
     Route("/health", endpoint=health_check, methods=["GET"]),
     Route("/healthz", endpoint=healthz, methods=["GET"]),
+    Route("/ready", endpoint=ready_check, methods=["GET"]),
+    Route("/models", endpoint=models_handler, methods=["GET"]),
+    Route("/metrics", endpoint=metrics_handler, methods=["GET"]),
+    Route("/traces", endpoint=traces_handler, methods=["GET"]),
     Route("/sse", endpoint=handle_sse, methods=["GET"]),
     Route("/messages", endpoint=handle_post_messages, methods=["POST"]),
     Route("/tools/execute", endpoint=handle_tool_execute, methods=["POST"]),
+    Route("/tools/batch", endpoint=handle_tool_batch, methods=["POST"]),
+    Route("/tools/stream", endpoint=handle_tool_stream, methods=["POST"]),
 ]
 
-http_app = Starlette(routes=routes)
+http_app = Starlette(
+    routes=routes,
+    middleware=[Middleware(RequestMetricsMiddleware, paths={route.path for route in routes})],
+    lifespan=lifespan,
+)
+
+
+def http_worker_count() -> int:
+    """Return the worker count from HTTP_WORKERS (or WEB_CONCURRENCY), default 1."""
+    return max(int(os.environ.get("HTTP_WORKERS") or os.environ.get("WEB_CONCURRENCY") or 1), 1)
+
+
+def _run_worker(sock: socket.socket) -> None:
+    """Serve requests on an inherited listening socket (runs in a forked child)."""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    server = uvicorn.Server(uvicorn.Config(http_app))
+    server.run(sockets=[sock])
+
+
+# A worker that exits sooner than this after starting counts as a crash loop.
+WORKER_MIN_UPTIME = 10.0
+
+
+def restart_delay(crash_streak: int, max_delay: float = 60.0) -> float:
+    """Seconds to wait before re-forking after crash_streak quick worker crashes."""
+    if crash_streak <= 0:
+        return 0.0
+    return min(2.0 ** (crash_streak - 1), max_delay)
+
+
+def serve_workers(host: str, port: int, workers: int, report_interval: float = 300.0):
+    """Preload models, then fork workers that share their weights copy-on-write.
+
+    The parent binds the listening socket and loads WARMUP_MODELS without
+    running inference (so no model thread pools exist yet), then forks
+    `workers` children that all accept on the same socket. Crashed workers are
+    replaced (with exponential backoff when they keep dying at startup), and
+    per-worker memory is logged every report_interval seconds.
+    """
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    for key in warmup_model_keys():
+        start = time.perf_counter()
+        load_model(key)
+        logger.info(f"Preloaded {key} in {time.perf_counter() - start:.2f}s before forking")
+    logger.info(f"Parent memory after preload: {process_memory()}")
+
+    children: dict[int, float] = {}
+    restarts: list[float] = []
+    crash_streak = 0
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(sock)
+            finally:
+                os._exit(0)
+        children[pid] = time.monotonic()
+        logger.info(f"Started worker {pid}")
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        restarts.clear()
+        for pid in list(children):
+            with contextlib.suppress(ProcessLookupError):
+                os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        spawn()
+
+    next_report = time.monotonic() + min(report_interval, 30.0)
+    while children or restarts:
+        now = time.monotonic()
+        pid, status = os.waitpid(-1, os.WNOHANG) if children else (0, 0)
+        if pid:
+            uptime = now - children.pop(pid)
+            if not stopping:
+                # Workers that die right after starting are restarted with a
+                # growing delay instead of being re-forked in a tight loop.
+                crash_streak = crash_streak + 1 if uptime < WORKER_MIN_UPTIME else 0
+                delay = restart_delay(crash_streak)
+                logger.warning(
+                    f"Worker {pid} exited with status {status} after {uptime:.1f}s, "
+                    f"restarting in {delay:.0f}s"
+                )
+                restarts.append(now + delay)
+            continue
+        for due in [due for due in restarts if due <= now]:
+            restarts.remove(due)
+            spawn()
+        if now >= next_report:
+            for child in sorted(children):
+                logger.info(f"Worker {child} memory: {process_memory(child)}")
+            next_report = now + report_interval
+        time.sleep(0.5)
+    sock.close()
+    logger.info("All workers stopped")
 
 
-def start_server(host: str = "0.0.0.0", port: int = 8000):
-    """Start the HTTP server."""
+def start_server(host: str = "0.0.0.0", port: int = 8000, workers: Optional[int] = None):
+    """Start the HTTP server, forking several workers when workers > 1."""
+    workers = workers or http_worker_count()
     logger.info(f"Starting MalayLanguage MCP HTTP server on {host}:{port}")
     logger.info(f"MCP SSE endpoint available at http://{host}:{port}/sse")
     logger.info(f"Health check available at http://{host}:{port}/health")
+    logger.info(f"Readiness check available at http://{host}:{port}/ready")
     logger.info("Server initialization complete - ready to accept connections")
-    uvicorn.run(http_app, host=host, port=port)
+    if workers > 1 and hasattr(os, "fork"):
+        logger.info(f"Running {workers} workers with fork-after-load")
+        serve_workers(host, port, workers)
+    else:
+        uvicorn.run(http_app, host=host, port=port)
 
 
 if __name__ == "__main__":
@@ -153,4 +819,4 @@ if __name__ == "__main__":
     
     port = int(os.environ.get("PORT", "8080"))
     logger.info("Starting server on 0.0.0.0:%s", port)
-    uvicorn.run(http_app, host="0.0.0.0", port=port)
+    start_server("0.0.0.0", port)
@@ -0,0 +1,212 @@
+"""
+Inference executor for MalayLanguage MCP Server
+
+Malaya model calls are blocking (and CPU-bound), so the async tool handlers
+submit them to a dedicated executor instead of running them on the event loop.
+The executor is either a thread pool or a process pool, selected with the
+INFERENCE_EXECUTOR environment variable, and each model key gets its own
+concurrency limit so one slow model cannot occupy every worker.
+
+In process mode every worker process holds its own copy of the models, so
+warm-up and model status go to each worker (see run_on_all_workers).
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from metrics import MODEL_INFERENCE, add_phases, current_phases
+from model_registry import thread_load_seconds
+from tracing import span
+
+logger = logging.getLogger("malaylanguage-inference")
+
+EXECUTOR_KINDS = ("thread", "process")
+
+
+def _timed_call(func: Callable[..., Any], *args: Any) -> tuple[Any, float, float]:
+    """Run func(*args) in a worker and return (result, seconds loading models, total seconds)."""
+    loaded_before = thread_load_seconds()
+    start = time.perf_counter()
+    result = func(*args)
+    return result, thread_load_seconds() - loaded_before, time.perf_counter() - start
+
+
+def parse_model_limits(spec: str) -> dict[str, int]:
+    """Parse a "key=limit,key=limit" string into a dict of per-model limits."""
+    limits = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid model limit '{item}', expected key=limit")
+        limit = int(value)
+        if limit < 1:
+            raise ValueError(f"Model limit for '{key.strip()}' must be at least 1")
+        limits[key.strip()] = limit
+    return limits
+
+
+class ProcessPoolGroup(Executor):
+    """A process pool made of single-process pools, so work can target every worker.
+
+    submit() goes to the worker with the fewest calls in flight; submit_all()
+    runs a call once in every worker, e.g. to warm up each copy of a model.
+    """
+
+    def __init__(self, max_workers: int):
+        self._pools = [ProcessPoolExecutor(max_workers=1) for _ in range(max_workers)]
+        self._in_flight = [0] * max_workers
+        self._lock = threading.Lock()
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        with self._lock:
+            index = min(range(len(self._pools)), key=self._in_flight.__getitem__)
+            self._in_flight[index] += 1
+        future = self._pools[index].submit(fn, *args, **kwargs)
+        future.add_done_callback(lambda _: self._done(index))
+        return future
+
+    def _done(self, index: int) -> None:
+        with self._lock:
+            self._in_flight[index] -= 1
+
+    def submit_all(self, fn, /, *args, **kwargs) -> list[Future]:
+        """Run fn(*args) once in every worker process."""
+        return [pool.submit(fn, *args, **kwargs) for pool in self._pools]
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        for pool in self._pools:
+            pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+class InferenceExecutor:
+    """Runs blocking model calls in a worker pool with per-model concurrency limits."""
+
+    def __init__(
+        self,
+        kind: str = "thread",
+        max_workers: Optional[int] = None,
+        default_concurrency: Optional[int] = None,
+        model_concurrency: Optional[dict[str, int]] = None,
+    ):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown executor kind: {kind} (expected one of {EXECUTOR_KINDS})")
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        # Leave room in the pool for other models by default.
+        self.default_concurrency = default_concurrency or max(1, self.max_workers // 2)
+        self.model_concurrency = dict(model_concurrency or {})
+        self._executor: Optional[Executor] = None
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def from_env(cls) -> "InferenceExecutor":
+        """Build an executor from INFERENCE_* / MODEL_CONCURRENCY* environment variables."""
+        max_workers = os.environ.get("INFERENCE_MAX_WORKERS")
+        default_concurrency = os.environ.get("MODEL_CONCURRENCY_DEFAULT")
+        return cls(
+            kind=os.environ.get("INFERENCE_EXECUTOR", "thread").strip().lower(),
+            max_workers=int(max_workers) if max_workers else None,
+            default_concurrency=int(default_concurrency) if default_concurrency else None,
+            model_concurrency=parse_model_limits(os.environ.get("MODEL_CONCURRENCY", "")),
+        )
+
+    def limit_for(self, model_key: str) -> int:
+        """Return the concurrency limit for a model key."""
+        return self.model_concurrency.get(model_key, self.default_concurrency)
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolGroup(self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="malaya-inference"
+                )
+            logger.info(f"Started {self.kind} inference executor with {self.max_workers} workers")
+        return self._executor
+
+    def _get_semaphore(self, model_key: str) -> asyncio.Semaphore:
+        # Semaphores belong to the loop they were first used on, so start over
+        # whenever we find ourselves running on a different loop.
+        loop = asyncio.get_running_loop()
+        if loop is not self._semaphore_loop:
+            self._semaphores = {}
+            self._semaphore_loop = loop
+        semaphore = self._semaphores.get(model_key)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.limit_for(model_key))
+            self._semaphores[model_key] = semaphore
+        return semaphore
+
+    async def run(self, model_key: str, func: Callable[..., Any], *args: Any) -> Any:
+        """Run func(*args) in the pool, holding the concurrency slot for model_key.
+
+        With the process executor, func and its arguments must be picklable, so
+        pass module-level functions rather than lambdas or bound model methods.
+        """
+        queued = time.perf_counter()
+        with span(f"inference {model_key}", model=model_key, executor=self.kind) as call_span:
+            async with self._get_semaphore(model_key):
+                loop = asyncio.get_running_loop()
+                call = functools.partial(_timed_call, func, *args)
+                if self.kind == "thread":
+                    # Spans opened in the worker (model loads) join this trace.
+                    call = functools.partial(contextvars.copy_context().run, call)
+                result, load, busy = await loop.run_in_executor(self._get_executor(), call)
+            # Worker-side durations come back with the result, so the metrics are
+            # updated here on the event loop (see metrics.py).
+            phases = {
+                "queue": time.perf_counter() - queued - busy,
+                "load": load,
+                "inference": busy - load,
+            }
+            add_phases(current_phases(), phases)
+            MODEL_INFERENCE.observe(phases["inference"], model_key)
+            for phase, seconds in phases.items():
+                call_span.set_attribute(f"{phase}_seconds", seconds)
+        return result
+
+    async def run_on_all_workers(self, func: Callable[..., Any], *args: Any) -> list[Any]:
+        """Run func(*args) once in every worker process and return each result.
+
+        Thread workers share one process, so there func runs once.
+        """
+        executor = self._get_executor()
+        if isinstance(executor, ProcessPoolGroup):
+            futures = executor.submit_all(functools.partial(func, *args))
+            return list(await asyncio.gather(*(asyncio.wrap_future(f) for f in futures)))
+        loop = asyncio.get_running_loop()
+        return [await loop.run_in_executor(executor, functools.partial(func, *args))]
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Shut down the worker pool; it is recreated on next use."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+_executor: Optional[InferenceExecutor] = None
+
+
+def get_inference_executor() -> InferenceExecutor:
+    """Get or create the process-wide inference executor."""
+    global _executor
+    if _executor is None:
+        _executor = InferenceExecutor.from_env()
+    return _executor
+
+
+async def run_inference(model_key: str, func: Callable[..., Any], *args: Any) -> Any:
+    """Run a blocking model call on the shared inference executor."""
+    return await get_inference_executor().run(model_key, func, *args)
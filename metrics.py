@@ -0,0 +1,265 @@
+"""
+Prometheus metrics for MalayLanguage MCP Server
+
+Counters and histograms are plain dicts updated only from the event loop
+thread (tool dispatch, the micro-batcher, the inference executor's await and
+the HTTP middleware all run there), so recording a request takes no lock.
+Figures that other modules already keep (cache counters, loaded models,
+process memory) are read when /metrics is scraped rather than mirrored on
+every request.
+
+Each tool call records its total latency and, where they apply, the time spent
+in each phase:
+
+    queue       waiting for an admission slot, a micro-batch, a model concurrency slot
+                or a pool worker
+    load        loading the model (or waiting for another request's load)
+    inference   the model call itself
+    format      rendering the payload as text
+
+Phases are collected per request through a context variable: the tool
+dispatcher opens a collection, the micro-batcher remembers it for each queued
+item and hands back the batch's timings when the batch finishes. With
+HTTP_WORKERS > 1 every worker process keeps its own metrics.
+"""
+
+import asyncio
+import bisect
+import contextlib
+import contextvars
+from typing import Callable, Iterable, Iterator, Optional
+
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+PHASES = ("queue", "load", "inference", "format")
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base class: a named family of samples keyed by label values."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def lines(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        return "\n".join(self.header() + self.lines())
+
+
+class Counter(Metric):
+    """A monotonically increasing count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def clear(self) -> None:
+        self._values.clear()
+
+    def lines(self) -> list[str]:
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+                for labels, value in self._values.items()]
+
+
+class Histogram(Metric):
+    """Bucketed observations per label set, rendered with cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def clear(self) -> None:
+        self._series.clear()
+
+    def lines(self) -> list[str]:
+        lines = []
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Sampled(Metric):
+    """A gauge or counter whose samples are computed when the metrics are rendered."""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str],
+        collect: Callable[[], Iterable[tuple[tuple, float]]],
+        kind: str = "gauge",
+    ):
+        super().__init__(name, help, labelnames)
+        self.kind = kind
+        self.collect = collect
+
+    def lines(self) -> list[str]:
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+                for labels, value in self.collect()]
+
+
+TOOL_CALLS = Counter(
+    "malaya_tool_calls_total", "Tool calls by outcome (ok, error, timeout, rejected).",
+    ("tool", "status"),
+)
+TOOL_LATENCY = Histogram(
+    "malaya_tool_latency_seconds", "Total time to answer a tool call.", ("tool",)
+)
+TOOL_PHASES = Histogram(
+    "malaya_tool_phase_seconds",
+    "Time a tool call spent per phase (queue, load, inference, format).",
+    ("tool", "phase"),
+)
+MODEL_INFERENCE = Histogram(
+    "malaya_model_inference_seconds",
+    "Time per model call in the inference executor, excluding model loading.", ("model",),
+)
+BATCH_SIZE = Histogram(
+    "malaya_batch_size", "Items per micro-batched model call.", ("model",),
+    buckets=BATCH_SIZE_BUCKETS,
+)
+HTTP_REQUESTS = Counter(
+    "malaya_http_requests_total", "HTTP requests by route and status.",
+    ("method", "route", "status"),
+)
+EVENT_LOOP_LAG = Histogram(
+    "malaya_event_loop_lag_seconds", "How late the event loop woke up a periodic timer.",
+)
+ADMISSION_REJECTED = Counter(
+    "malaya_admission_rejected_total",
+    "Tool calls shed by admission control (queue_full, wait_timeout).", ("tool", "reason"),
+)
+
+_metrics: list[Metric] = [
+    TOOL_CALLS, TOOL_LATENCY, TOOL_PHASES, MODEL_INFERENCE, BATCH_SIZE, HTTP_REQUESTS,
+    EVENT_LOOP_LAG, ADMISSION_REJECTED,
+]
+
+
+def render_metrics(extra: Iterable[Metric] = ()) -> str:
+    """Render every registered metric (plus extra ones) in the Prometheus text format."""
+    return "\n".join(metric.render() for metric in list(_metrics) + list(extra)) + "\n"
+
+
+_request_phases: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar(
+    "request_phases", default=None
+)
+
+
+def current_phases() -> Optional[dict]:
+    """Return the phase timings being collected for the current request, if any."""
+    return _request_phases.get()
+
+
+def add_phases(phases: Optional[dict], timings: dict) -> None:
+    """Add seconds per phase to a phase collection (ignored when phases is None)."""
+    if phases is not None:
+        for phase, seconds in timings.items():
+            phases[phase] = phases.get(phase, 0.0) + seconds
+
+
+@contextlib.contextmanager
+def collect_phases(merge: bool = True) -> Iterator[dict]:
+    """Collect phase timings for the code in this block.
+
+    With merge=True the timings are also added to the enclosing collection, so
+    a tool that calls other tools accounts for their model time as well.
+    """
+    parent = _request_phases.get()
+    phases: dict = {}
+    token = _request_phases.set(phases)
+    try:
+        yield phases
+    finally:
+        _request_phases.reset(token)
+        if merge:
+            add_phases(parent, phases)
+
+
+def record_tool_call(tool: str, status: str, seconds: float, phases: dict) -> None:
+    """Count a finished tool call and observe its latency and phases."""
+    TOOL_CALLS.inc(tool, status)
+    TOOL_LATENCY.observe(seconds, tool)
+    for phase, value in phases.items():
+        TOOL_PHASES.observe(value, tool, phase)
+
+
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    """Observe how late a timer of `interval` seconds fires, forever."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(loop.time() - start - interval, 0.0))
+
+
+def reset_metrics() -> None:
+    """Clear every counter and histogram (for tests)."""
+    for metric in _metrics:
+        if isinstance(metric, (Counter, Histogram)):
+            metric.clear()
+
@@ -0,0 +1,273 @@
+"""
+Model registry for MalayLanguage MCP Server
+
+Holds the loaded Malaya models and makes loading single-flight: when several
+threads ask for a model that is not loaded yet, one of them runs the loader
+and the rest wait for its result. A failed load is reported to every waiter
+as ModelLoadError but nothing is cached, so the next request retries.
+
+The registry also records an approximate resident size and the last-use time
+of every model. With a memory budget set, the least recently used models are
+evicted whenever the loaded total goes over it, and models idle for longer
+than the idle timeout are dropped as well.
+
+Configuration:
+    MODEL_MEMORY_BUDGET_MB   total size of loaded models (default 0, unlimited)
+    MODEL_IDLE_TIMEOUT       seconds before an unused model is evicted (default 0, never)
+"""
+
+import gc
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable
+
+logger = logging.getLogger("malaylanguage-models")
+
+_MB = 1024 * 1024
+
+
+class ModelLoadError(RuntimeError):
+    """Raised when a model's loader fails, as opposed to a call on a loaded model."""
+
+# Seconds each thread has spent loading models or waiting for another thread's load.
+_load_time = threading.local()
+
+
+def thread_load_seconds() -> float:
+    """Return the seconds this thread has spent in model loads so far."""
+    return getattr(_load_time, "seconds", 0.0)
+
+
+def _add_load_time(seconds: float) -> None:
+    _load_time.seconds = thread_load_seconds() + seconds
+
+
+def current_rss_bytes() -> int:
+    """Return this process's resident set size in bytes (0 where unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def estimate_model_bytes(model: Any) -> int:
+    """Sum parameter sizes of any torch modules on the model or its attributes."""
+    candidates = [model] + list(getattr(model, "__dict__", {}).values())
+    seen = set()
+    total = 0
+    for candidate in candidates:
+        parameters = getattr(candidate, "parameters", None)
+        if not callable(parameters):
+            continue
+        try:
+            for parameter in parameters():
+                if id(parameter) not in seen:
+                    seen.add(id(parameter))
+                    total += parameter.numel() * parameter.element_size()
+        except Exception:
+            continue
+    return total
+
+
+class ModelRegistry:
+    """Thread-safe cache of loaded models with single-flight loading and a memory budget."""
+
+    def __init__(
+        self,
+        memory_budget_mb: float = 0,
+        idle_timeout: float = 0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.memory_budget = int(memory_budget_mb * _MB) if memory_budget_mb else 0
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self._models: dict[str, Any] = {}
+        self._info: dict[str, dict] = {}
+        self._loading: dict[str, Future] = {}
+        self._stats: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ModelRegistry":
+        """Build a registry from MODEL_MEMORY_BUDGET_MB / MODEL_IDLE_TIMEOUT."""
+        return cls(
+            memory_budget_mb=float(os.environ.get("MODEL_MEMORY_BUDGET_MB", "0")),
+            idle_timeout=float(os.environ.get("MODEL_IDLE_TIMEOUT", "0")),
+        )
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._models
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    def keys(self) -> list[str]:
+        """Return the keys of the loaded models."""
+        return list(self._models)
+
+    def _record(self, key: str) -> dict:
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = {"loads": 0, "failures": 0, "waits": 0, "evictions": 0,
+                     "last_load_seconds": None, "total_load_seconds": 0.0,
+                     "size_bytes": None}
+            self._stats[key] = stats
+        return stats
+
+    def get_or_load(self, key: str, loader: Callable[[], Any]) -> Any:
+        """Return the model for key, running loader at most once at a time."""
+        evicted = []
+        with self._lock:
+            if self.idle_timeout:
+                evicted += self._evict_idle_locked(exclude=key)
+            hit = key in self._models
+            if hit:
+                self._info[key]["last_used"] = self.clock()
+                model = self._models[key]
+            else:
+                future = self._loading.get(key)
+                owner = future is None
+                if owner:
+                    future = Future()
+                    self._loading[key] = future
+                    # Make room up front when we already know how big this model is.
+                    known_size = self._record(key)["size_bytes"]
+                    if known_size:
+                        evicted += self._evict_for_locked(known_size, exclude=key)
+                else:
+                    self._record(key)["waits"] += 1
+        self._collect(evicted)
+        if hit:
+            return model
+        start = time.perf_counter()
+        if not owner:
+            try:
+                return future.result()
+            finally:
+                _add_load_time(time.perf_counter() - start)
+
+        rss_before = current_rss_bytes()
+        try:
+            model = loader()
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+                self._record(key)["failures"] += 1
+            _add_load_time(time.perf_counter() - start)
+            if not isinstance(e, Exception):
+                future.set_exception(e)
+                raise
+            error = ModelLoadError(f"Could not load {key}: {e}")
+            future.set_exception(error)
+            raise error from e
+        elapsed = time.perf_counter() - start
+        _add_load_time(elapsed)
+        size = estimate_model_bytes(model) or max(current_rss_bytes() - rss_before, 0)
+        with self._lock:
+            now = self.clock()
+            self._models[key] = model
+            self._info[key] = {"size_bytes": size, "loaded_at": now, "last_used": now}
+            del self._loading[key]
+            stats = self._record(key)
+            stats["loads"] += 1
+            stats["last_load_seconds"] = elapsed
+            stats["total_load_seconds"] += elapsed
+            stats["size_bytes"] = size
+            evicted = self._evict_for_locked(0, exclude=key)
+        future.set_result(model)
+        self._collect(evicted)
+        return model
+
+    def _evict_locked(self, key: str) -> str:
+        self._models.pop(key, None)
+        self._info.pop(key, None)
+        self._record(key)["evictions"] += 1
+        return key
+
+    def _evict_for_locked(self, needed: int, exclude: str) -> list[str]:
+        """Evict least recently used models until needed more bytes fit in the budget."""
+        if not self.memory_budget:
+            return []
+        evicted = []
+        candidates = sorted(
+            (info["last_used"], key) for key, info in self._info.items() if key != exclude
+        )
+        for _, key in candidates:
+            if self._total_bytes_locked() + needed <= self.memory_budget:
+                break
+            evicted.append(self._evict_locked(key))
+        return evicted
+
+    def _evict_idle_locked(self, exclude: str) -> list[str]:
+        cutoff = self.clock() - self.idle_timeout
+        idle = [key for key, info in self._info.items()
+                if key != exclude and info["last_used"] < cutoff]
+        return [self._evict_locked(key) for key in idle]
+
+    def _collect(self, evicted: list[str]) -> None:
+        if evicted:
+            logger.info(f"Evicted models: {', '.join(evicted)}")
+            gc.collect()
+
+    def evict_idle(self) -> list[str]:
+        """Evict models unused for longer than idle_timeout and return their keys."""
+        if not self.idle_timeout:
+            return []
+        with self._lock:
+            evicted = self._evict_idle_locked(exclude="")
+        self._collect(evicted)
+        return evicted
+
+    def _total_bytes_locked(self) -> int:
+        return sum(info["size_bytes"] for info in self._info.values())
+
+    def total_bytes(self) -> int:
+        """Return the approximate combined size of the loaded models."""
+        with self._lock:
+            return self._total_bytes_locked()
+
+    def pop(self, key: str) -> Any:
+        """Remove a loaded model and return it (None if it was not loaded)."""
+        with self._lock:
+            self._info.pop(key, None)
+            return self._models.pop(key, None)
+
+    def clear(self) -> None:
+        """Forget every loaded model."""
+        with self._lock:
+            self._models.clear()
+            self._info.clear()
+
+    def loaded(self) -> list[dict]:
+        """Describe the loaded models, most recently used first."""
+        now = self.clock()
+        with self._lock:
+            items = [
+                {
+                    "key": key,
+                    "size_mb": round(info["size_bytes"] / _MB, 1),
+                    "loaded_at": info["loaded_at"],
+                    "last_used": info["last_used"],
+                    "idle_seconds": round(now - info["last_used"], 3),
+                }
+                for key, info in self._info.items()
+            ]
+        return sorted(items, key=lambda item: item["last_used"], reverse=True)
+
+    def stats(self) -> dict[str, dict]:
+        """Return load counters and timings per model key."""
+        with self._lock:
+            return {key: dict(stats, loaded=key in self._models)
+                    for key, stats in self._stats.items()}
+
+    def summary(self) -> dict:
+        """Return budget usage together with the loaded models."""
+        return {
+            "memory_budget_mb": round(self.memory_budget / _MB, 1) if self.memory_budget else None,
+            "loaded_mb": round(self.total_bytes() / _MB, 1),
+            "models": self.loaded(),
+        }
@@ -6,422 +6,688 @@ A Model Context Protocol server providing Malay language processing tools using
 Supports both stdio and HTTP streaming at /mcp endpoint.
 """
 
+import asyncio
+import functools
+import importlib
 import logging
+import os
 import sys
+import time
 from typing import Any, Optional
 
-import malaya
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
-from mcp.types import Tool, TextContent
+from mcp.types import CallToolResult, Tool, TextContent
 from pydantic import BaseModel, Field
 
+from admission import ToolOverloadedError
+from batching import run_batched
+from chunking import run_chunked, stream_sentences
+from fuzzy_index import CORRECTION_MAX_DISTANCE, get_fuzzy_index
+from glossary import get_glossary
+from inference import get_inference_executor
+from model_registry import ModelRegistry
+from normalize_rules import get_rule_normalizer
+from tool_registry import ToolRegistry
+from tracing import span
+
 # Configure logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper(), format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger("malaylanguage-mcp")
 
 # Initialize MCP server
 app = Server("malaylanguage-mcp-server")
 
+# Every tool, shared by the MCP and HTTP transports (see tool_registry.py)
+tools = ToolRegistry.from_env()
+
 # Cache for loaded models to avoid reloading
-_model_cache = {}
+_model_cache = ModelRegistry.from_env()
 
+# Seconds spent importing each module, for the startup breakdown in the logs
+_import_timings: dict[str, float] = {}
 
-def get_language_detection_model():
-    """Get or initialize the language detection model."""
-    if "language_detection" not in _model_cache:
+
+def _import_malaya(submodule: str):
+    """Import malaya.<submodule> on first use so startup does not pay for it.
+
+    malaya pulls in TensorFlow/PyTorch and many submodules, so it is only
+    imported by the model loaders. The time spent on each import is logged and
+    kept for import_timings().
+    """
+    for name in ("malaya", f"malaya.{submodule}"):
+        if name not in sys.modules:
+            start = time.perf_counter()
+            importlib.import_module(name)
+            _import_timings[name] = time.perf_counter() - start
+            logger.info(f"Imported {name} in {_import_timings[name]:.2f}s")
+    return sys.modules[f"malaya.{submodule}"]
+
+
+def _seconds_since_process_start() -> Optional[float]:
+    """Seconds since this process started, from /proc (None where unavailable)."""
+    try:
+        with open("/proc/self/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        started = int(fields[19]) / os.sysconf("SC_CLK_TCK")
+        return time.clock_gettime(time.CLOCK_BOOTTIME) - started
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def import_timings() -> dict[str, float]:
+    """Return seconds from process start until this server was imported ("server") and
+    seconds spent importing each lazily imported malaya module."""
+    return dict(_import_timings)
+
+
+def _load_model(key: str, description: str, factory):
+    """Load a model through the registry so concurrent callers share one load."""
+
+    def load():
+        logger.info(f"Loading {description} model...")
         try:
-            logger.info("Loading language detection model...")
-            _model_cache["language_detection"] = malaya.language_detection.transformer()
-            logger.info("Language detection model loaded successfully")
+            model = factory()
         except Exception as e:
-            logger.error(f"Error loading language detection model: {e}")
+            logger.error(f"Error loading {description} model: {e}")
             raise
-    return _model_cache["language_detection"]
+        logger.info(f"{description[0].upper()}{description[1:]} model loaded successfully")
+        return model
+
+    with span(f"get_model {key}", model=key):
+        return _model_cache.get_or_load(key, load)
+
+
+def get_language_detection_model():
+    """Get or initialize the language detection model."""
+    return _load_model(
+        "language_detection",
+        "language detection",
+        lambda: _import_malaya("language_detection").transformer(),
+    )
 
 
 def get_normalizer_model():
     """Get or initialize the text normalizer model."""
-    if "normalizer" not in _model_cache:
-        try:
-            logger.info("Loading text normalizer model...")
-            _model_cache["normalizer"] = malaya.normalize.normalizer()
-            logger.info("Text normalizer model loaded successfully")
-        except Exception as e:
-            logger.error(f"Error loading normalizer model: {e}")
-            raise
-    return _model_cache["normalizer"]
+    return _load_model(
+        "normalizer", "text normalizer", lambda: _import_malaya("normalize").normalizer()
+    )
 
 
 def get_spelling_corrector():
     """Get or initialize the spelling correction model."""
-    if "spelling" not in _model_cache:
-        try:
-            logger.info("Loading spelling correction model...")
-            _model_cache["spelling"] = malaya.spelling_correction.transformer()
-            logger.info("Spelling correction model loaded successfully")
-        except Exception as e:
-            logger.error(f"Error loading spelling correction model: {e}")
-            raise
-    return _model_cache["spelling"]
+    return _load_model(
+        "spelling",
+        "spelling correction",
+        lambda: _import_malaya("spelling_correction").transformer(),
+    )
+
+
+def translation_model_key(source: str, target: str) -> str:
+    """Return the model cache key for a translation direction."""
+    return f"translation_{source}_{target}"
 
 
 def get_translation_model(source: str = "ms", target: str = "en"):
     """Get or initialize the translation model."""
-    key = f"translation_{source}_{target}"
-    if key not in _model_cache:
-        try:
-            logger.info(f"Loading translation model {source}->{target}...")
-            _model_cache[key] = malaya.translation.transformer(source=source, target=target)
-            logger.info(f"Translation model {source}->{target} loaded successfully")
-        except Exception as e:
-            logger.error(f"Error loading translation model: {e}")
-            raise
-    return _model_cache[key]
+    return _load_model(
+        translation_model_key(source, target),
+        f"translation {source}->{target}",
+        lambda: _import_malaya("translation").transformer(source=source, target=target),
+    )
 
 
 def get_paraphrase_model():
     """Get or initialize the paraphrase/rewrite model."""
-    if "paraphrase" not in _model_cache:
-        try:
-            logger.info("Loading paraphrase model...")
-            _model_cache["paraphrase"] = malaya.paraphrase.transformer()
-            logger.info("Paraphrase model loaded successfully")
-        except Exception as e:
-            logger.error(f"Error loading paraphrase model: {e}")
-            raise
-    return _model_cache["paraphrase"]
+    return _load_model(
+        "paraphrase", "paraphrase", lambda: _import_malaya("paraphrase").transformer()
+    )
+
+
+def model_idle_timeout() -> float:
+    """Return MODEL_IDLE_TIMEOUT as configured on the model registry (0 means never)."""
+    return _model_cache.idle_timeout
+
+
+def evict_idle_models() -> list[str]:
+    """Evict models that have been idle past MODEL_IDLE_TIMEOUT."""
+    return _model_cache.evict_idle()
+
+
+def model_status() -> dict:
+    """Describe loaded models, their memory use and load statistics."""
+    return dict(_model_cache.summary(), load_stats=_model_cache.stats(), pid=os.getpid())
+
+
+async def inference_model_status() -> list[dict]:
+    """Return model_status() from every process that runs inference.
+
+    With the thread executor that is this process; with the process executor
+    it is each pool worker, which is where the models are actually loaded.
+    """
+    return await get_inference_executor().run_on_all_workers(model_status)
+
+
+# Blocking model calls. These run on the inference executor (see inference.py),
+# so they are module-level functions that stay picklable for the process pool.
+
+def _predict_language(texts: list[str]) -> list[dict]:
+    return get_language_detection_model().predict(texts)
+
+
+def _normalize_text(text: str) -> str:
+    return get_normalizer_model().normalize(text)
+
+
+def _normalize_texts(texts: list[str]) -> list[str]:
+    # The normalizer takes one string, so a batch shares one executor hop and
+    # model lookup rather than one forward pass.
+    normalizer = get_normalizer_model()
+    return [normalizer.normalize(text) for text in texts]
+
+
+def _correct_text(text: str) -> str:
+    return get_spelling_corrector().correct(text)
+
+
+def _correct_texts(texts: list[str]) -> list[str]:
+    corrector = get_spelling_corrector()
+    return [corrector.correct(text) for text in texts]
+
+
+def _translate_texts(source: str, target: str, texts: list[str]) -> list[str]:
+    return get_translation_model(source, target).translate(texts)
+
+
+def _paraphrase_texts(texts: list[str]) -> list[str]:
+    return get_paraphrase_model().paraphrase(texts)
+
+
+async def _translate_one(text: str, source: str, target: str) -> str:
+    """Translate one text through the micro-batcher for its direction."""
+    return await run_batched(
+        translation_model_key(source, target),
+        functools.partial(_translate_texts, source, target),
+        text,
+    )
+
+
+# Warm-up: load models ahead of traffic and prove each one answers a request.
+
+_WARMUP_SAMPLE = "Selamat pagi, apa khabar?"
+
+
+def warmup_model_keys() -> list[str]:
+    """Return the model keys listed in WARMUP_MODELS."""
+    return [key.strip() for key in os.environ.get("WARMUP_MODELS", "").split(",") if key.strip()]
+
+
+def load_model(key: str) -> Any:
+    """Load a model by cache key without running it."""
+    if key == "language_detection":
+        return get_language_detection_model()
+    if key == "normalizer":
+        return get_normalizer_model()
+    if key == "spelling":
+        return get_spelling_corrector()
+    if key == "paraphrase":
+        return get_paraphrase_model()
+    if key.startswith("translation_") and key.count("_") == 2:
+        _, source, target = key.split("_")
+        return get_translation_model(source, target)
+    raise ValueError(f"Unknown model key: {key}")
+
+
+def warm_up_model(key: str) -> None:
+    """Load a model by cache key and run one test inference through it."""
+    if key == "language_detection":
+        _predict_language([_WARMUP_SAMPLE])
+    elif key == "normalizer":
+        _normalize_text(_WARMUP_SAMPLE)
+    elif key == "spelling":
+        _correct_text(_WARMUP_SAMPLE)
+    elif key == "paraphrase":
+        _paraphrase_texts([_WARMUP_SAMPLE])
+    elif key.startswith("translation_") and key.count("_") == 2:
+        _, source, target = key.split("_")
+        _translate_texts(source, target, [_WARMUP_SAMPLE])
+    else:
+        raise ValueError(f"Unknown model key for warm-up: {key}")
+
+
+async def warm_up(model_keys: list[str]) -> dict[str, float]:
+    """Warm the given models one at a time and return seconds spent on each.
+
+    With the process executor each model is warmed in every worker process,
+    so readiness means no worker is left cold.
+    """
+    executor = get_inference_executor()
+    timings = {}
+    for key in model_keys:
+        start = time.perf_counter()
+        await executor.run_on_all_workers(warm_up_model, key)
+        timings[key] = time.perf_counter() - start
+        logger.info(f"Warmed up {key} in {timings[key]:.2f}s")
+    return timings
 
 
-# Define available tools
 @app.list_tools()
 async def list_tools() -> list[Tool]:
     """List all available Malay language processing tools."""
-    return [
-        Tool(
-            name="detect_language",
-            description="Detect the language of the given text. Identifies Malay, English, and other languages.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "text": {
-                        "type": "string",
-                        "description": "The text to analyze for language detection",
-                    }
-                },
-                "required": ["text"],
-            },
-        ),
-        Tool(
-            name="normalize_malay",
-            description="Normalize Malay text by fixing common informal writing patterns, abbreviations, and colloquialisms to standard Malay.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "text": {
-                        "type": "string",
-                        "description": "The Malay text to normalize",
-                    }
-                },
-                "required": ["text"],
-            },
-        ),
-        Tool(
-            name="correct_spelling",
-            description="Correct spelling errors in Malay text using advanced transformer models.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "text": {
-                        "type": "string",
-                        "description": "The Malay text with potential spelling errors",
-                    }
-                },
-                "required": ["text"],
-            },
-        ),
-        Tool(
-            name="apply_glossary",
-            description="Look up Malay terms in a standard glossary and provide definitions, translations, and usage examples.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "term": {
-                        "type": "string",
-                        "description": "The Malay term to look up in the glossary",
-                    }
-                },
-                "required": ["term"],
-            },
-        ),
-        Tool(
-            name="rewrite_style",
-            description="Rewrite Malay text in a different style while preserving meaning. Uses paraphrasing to generate alternative expressions.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "text": {
-                        "type": "string",
-                        "description": "The Malay text to rewrite",
-                    },
-                    "style": {
-                        "type": "string",
-                        "description": "Target style (e.g., 'formal', 'casual', 'simplified')",
-                        "enum": ["formal", "casual", "simplified"],
-                        "default": "formal",
-                    },
-                },
-                "required": ["text"],
-            },
-        ),
-        Tool(
-            name="translate",
-            description="Translate text between Malay and English (bidirectional).",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "text": {
-                        "type": "string",
-                        "description": "The text to translate",
-                    },
-                    "source_lang": {
-                        "type": "string",
-                        "description": "Source language code (ms=Malay, en=English)",
-                        "enum": ["ms", "en"],
-                        "default": "ms",
-                    },
-                    "target_lang": {
-                        "type": "string",
-                        "description": "Target language code (ms=Malay, en=English)",
-                        "enum": ["ms", "en"],
-                        "default": "en",
-                    },
-                },
-                "required": ["text"],
-            },
-        ),
-        Tool(
-            name="term_lookup",
-            description="Look up linguistic information about a Malay term, including part of speech, etymology, and related terms.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "term": {
-                        "type": "string",
-                        "description": "The Malay term to look up",
-                    }
-                },
-                "required": ["term"],
-            },
-        ),
-    ]
+    return tools.list_tools()
+
+
+def _progress_listener():
+    """Return a sentence listener sending MCP progress notifications, if the client asked for them."""
+    try:
+        context = app.request_context
+    except LookupError:
+        return None
+    token = context.meta.progressToken if context.meta else None
+    if token is None:
+        return None
+
+    async def notify(index: int, total: int, text: str) -> None:
+        await context.session.send_progress_notification(
+            token, index + 1, total=total, message=text, related_request_id=context.request_id
+        )
+
+    return notify
 
 
 @app.call_tool()
-async def call_tool(name: str, arguments: Any) -> list[TextContent]:
-    """Handle tool execution requests."""
+async def call_tool(name: str, arguments: Any):
+    """Handle tool execution requests.
+
+    Successful calls return the formatted text together with the payload, which
+    MCP clients receive as structuredContent. When the request carries a
+    progress token, long inputs report each finished sentence as a progress
+    notification before the result arrives. A call shed by admission control
+    is a tool error whose structuredContent holds the reason and retry_after.
+    """
     try:
-        if name == "detect_language":
-            return await detect_language(arguments.get("text", ""))
-        elif name == "normalize_malay":
-            return await normalize_malay(arguments.get("text", ""))
-        elif name == "correct_spelling":
-            return await correct_spelling(arguments.get("text", ""))
-        elif name == "apply_glossary":
-            return await apply_glossary(arguments.get("term", ""))
-        elif name == "rewrite_style":
-            return await rewrite_style(
-                arguments.get("text", ""),
-                arguments.get("style", "formal")
-            )
-        elif name == "translate":
-            return await translate(
-                arguments.get("text", ""),
-                arguments.get("source_lang", "ms"),
-                arguments.get("target_lang", "en")
-            )
-        elif name == "term_lookup":
-            return await term_lookup(arguments.get("term", ""))
-        else:
-            raise ValueError(f"Unknown tool: {name}")
+        spec = tools.get(name)
+        with stream_sentences(_progress_listener()):
+            data = await spec.run(arguments)
+        if "error" in data:
+            return spec.render(data)
+        return spec.render(data), data
+    except ToolOverloadedError as e:
+        logger.warning(f"Rejected tool {name}: {e}")
+        return CallToolResult(
+            content=[TextContent(type="text", text=f"Error: {e}")],
+            structuredContent=e.to_dict(),
+            isError=True,
+        )
     except Exception as e:
         logger.error(f"Error executing tool {name}: {e}", exc_info=True)
         return [TextContent(type="text", text=f"Error: {str(e)}")]
 
 
-async def detect_language(text: str) -> list[TextContent]:
+def _text_schema(description: str, name: str = "text", **extra: dict) -> dict:
+    """Input schema with one required string argument plus optional extras."""
+    return {
+        "type": "object",
+        "properties": {name: {"type": "string", "description": description}, **extra},
+        "required": [name],
+    }
+
+
+def _format_detect_language(data: dict) -> str:
+    return f"""Language Detection Result:
+Language: {data['label']}
+Confidence: {data['score']:.2%}
+
+Input text: {data['text']}"""
+
+
+@tools.tool(
+    "detect_language",
+    "Detect the language of the given text. Identifies Malay, English, and other languages.",
+    _text_schema("The text to analyze for language detection"),
+    formatter=_format_detect_language,
+)
+async def detect_language(text: str) -> dict:
     """Detect the language of the given text."""
     if not text.strip():
-        return [TextContent(type="text", text="Error: Empty or whitespace-only text provided")]
+        return {"error": "Error: Empty or whitespace-only text provided"}
     
     try:
-        model = get_language_detection_model()
-        result = model.predict([text])[0]
-        
-        response = f"""Language Detection Result:
-Language: {result['label']}
-Confidence: {result['score']:.2%}
-
-Input text: {text}"""
-        
-        return [TextContent(type="text", text=response)]
+        result = await run_batched("language_detection", _predict_language, text)
+        return {"text": text, "label": result["label"], "score": float(result["score"])}
     except Exception as e:
         logger.error(f"Language detection error: {e}")
-        return [TextContent(type="text", text=f"Error detecting language: {str(e)}")]
+        return {"error": f"Error detecting language: {str(e)}"}
+
+
+def _format_normalize_malay(data: dict) -> str:
+    return f"""Text Normalization Result:
 
+Original: {data['text']}
 
-async def normalize_malay(text: str) -> list[TextContent]:
+Normalized: {data['normalized']}"""
+
+
+@tools.tool(
+    "normalize_malay",
+    "Normalize Malay text by fixing common informal writing patterns, abbreviations, and colloquialisms to standard Malay.",
+    _text_schema("The Malay text to normalize"),
+    formatter=_format_normalize_malay,
+    cache="persistent",
+)
+async def normalize_malay(text: str) -> dict:
     """Normalize Malay text to standard form."""
     if not text.strip():
-        return [TextContent(type="text", text="Error: Empty or whitespace-only text provided")]
+        return {"error": "Error: Empty or whitespace-only text provided"}
     
     try:
-        normalizer = get_normalizer_model()
-        normalized = normalizer.normalize(text)
-        
-        response = f"""Text Normalization Result:
-
-Original: {text}
-
-Normalized: {normalized}"""
-        
-        return [TextContent(type="text", text=response)]
+        # Common slang and abbreviations are expanded by rules; the model only
+        # sees text that still has unresolved tokens after that.
+        rules = get_rule_normalizer()
+        if rules is not None:
+            expanded, resolved = rules.normalize(text)
+            if resolved:
+                return {"text": text, "normalized": expanded, "path": "rules"}
+            text_for_model = expanded
+        else:
+            text_for_model = text
+        normalized = await run_batched("normalizer", _normalize_texts, text_for_model)
+        return {"text": text, "normalized": normalized, "path": "model"}
     except Exception as e:
         logger.error(f"Normalization error: {e}")
-        return [TextContent(type="text", text=f"Error normalizing text: {str(e)}")]
+        return {"error": f"Error normalizing text: {str(e)}"}
+
+
+def _format_correct_spelling(data: dict) -> str:
+    return f"""Spelling Correction Result:
+
+Original: {data['text']}
 
+Corrected: {data['corrected']}"""
 
-async def correct_spelling(text: str) -> list[TextContent]:
+
+@tools.tool(
+    "correct_spelling",
+    "Correct spelling errors in Malay text using advanced transformer models.",
+    _text_schema("The Malay text with potential spelling errors"),
+    formatter=_format_correct_spelling,
+    cache="persistent",
+)
+async def correct_spelling(text: str) -> dict:
     """Correct spelling errors in Malay text."""
     if not text.strip():
-        return [TextContent(type="text", text="Error: Empty or whitespace-only text provided")]
+        return {"error": "Error: Empty or whitespace-only text provided"}
     
     try:
-        corrector = get_spelling_corrector()
-        corrected = corrector.correct(text)
-        
-        response = f"""Spelling Correction Result:
-
-Original: {text}
-
-Corrected: {corrected}"""
-        
-        return [TextContent(type="text", text=response)]
+        # Long texts are corrected sentence by sentence (see chunking.py).
+        corrected = await run_chunked(
+            "correct_spelling", text, functools.partial(run_batched, "spelling", _correct_texts)
+        )
+        return {"text": text, "corrected": corrected}
     except Exception as e:
         logger.error(f"Spelling correction error: {e}")
-        return [TextContent(type="text", text=f"Error correcting spelling: {str(e)}")]
+        return {"error": f"Error correcting spelling: {str(e)}"}
 
 
-async def apply_glossary(term: str) -> list[TextContent]:
-    """Look up a term in the Malay glossary."""
-    if not term.strip():
-        return [TextContent(type="text", text="Error: Empty or whitespace-only term provided")]
-    
-    try:
-        # Use Malaya's built-in dictionary/vocabulary lookup if available
-        # For now, we'll provide a basic lookup using translation and definition
-        translator = get_translation_model("ms", "en")
-        translation = translator.translate([term])[0]
-        
-        response = f"""Glossary Lookup: {term}
+def _format_apply_glossary(data: dict) -> str:
+    if data["source"] == "model":
+        return f"""Glossary Lookup: {data['term']}
 
-Translation (EN): {translation}
+Translation (EN): {data['translation']}
 
 Note: This is a basic translation. For comprehensive glossary entries with definitions, 
 etymology, and usage examples, consider integrating with Dewan Bahasa dan Pustaka's 
 official dictionary API or similar resources."""
-        
-        return [TextContent(type="text", text=response)]
+    lines = [f"Glossary Lookup: {data['term']}", ""]
+    if data["match"] == "lemma":
+        lines.append(f"Root word: {data['headword']}")
+    lines.append(f"Translation (EN): {data['translation']}")
+    if data.get("definition"):
+        lines.append(f"Definition: {data['definition']}")
+    if data.get("related"):
+        lines.append(f"Related terms: {', '.join(data['related'])}")
+    return "\n".join(lines)
+
+
+@tools.tool(
+    "apply_glossary",
+    "Look up Malay terms in a standard glossary and provide definitions, translations, and usage examples.",
+    _text_schema("The Malay term to look up in the glossary", name="term"),
+    formatter=_format_apply_glossary,
+    text_argument="term",
+)
+async def apply_glossary(term: str) -> dict:
+    """Look up a term in the Malay glossary."""
+    if not term.strip():
+        return {"error": "Error: Empty or whitespace-only term provided"}
+    
+    try:
+        # The local glossary answers in microseconds; only misses go to the model.
+        glossary = get_glossary()
+        entry = glossary.lookup(term) if glossary is not None else None
+        if entry is not None:
+            related = [
+                related["term"] for related in glossary.prefix(entry["term"], limit=6)
+                if related["term"] != entry["term"]
+            ][:5]
+            data = {
+                "term": term,
+                "headword": entry["term"],
+                "translation": entry["translation"],
+                "source": "glossary",
+                "match": entry["match"],
+                "related": related,
+            }
+            if "definition" in entry:
+                data["definition"] = entry["definition"]
+            return data
+        translation = await _translate_one(term, "ms", "en")
+        return {"term": term, "translation": translation, "source": "model"}
     except Exception as e:
         logger.error(f"Glossary lookup error: {e}")
-        return [TextContent(type="text", text=f"Error looking up term: {str(e)}")]
+        return {"error": f"Error looking up term: {str(e)}"}
 
 
-async def rewrite_style(text: str, style: str = "formal") -> list[TextContent]:
-    """Rewrite text in a different style."""
-    if not text.strip():
-        return [TextContent(type="text", text="Error: Empty or whitespace-only text provided")]
-    
-    try:
-        paraphraser = get_paraphrase_model()
-        paraphrased = paraphraser.paraphrase([text])[0]
-        
-        response = f"""Style Rewrite Result (Target: {style}):
+def _format_rewrite_style(data: dict) -> str:
+    return f"""Style Rewrite Result (Target: {data['style']}):
 
-Original: {text}
+Original: {data['text']}
 
-Rewritten: {paraphrased}
+Rewritten: {data['rewritten']}
 
 Note: The paraphrase model generates alternative expressions. For specific style 
 transformations (formal/casual), consider fine-tuning or prompt engineering."""
-        
-        return [TextContent(type="text", text=response)]
-    except Exception as e:
-        logger.error(f"Style rewrite error: {e}")
-        return [TextContent(type="text", text=f"Error rewriting text: {str(e)}")]
 
 
-async def translate(text: str, source_lang: str = "ms", target_lang: str = "en") -> list[TextContent]:
+@tools.tool(
+    "rewrite_style",
+    "Rewrite Malay text in a different style while preserving meaning. Uses paraphrasing to generate alternative expressions.",
+    _text_schema(
+        "The Malay text to rewrite",
+        style={
+            "type": "string",
+            "description": "Target style (e.g., 'formal', 'casual', 'simplified')",
+            "enum": ["formal", "casual", "simplified"],
+            "default": "formal",
+        },
+    ),
+    formatter=_format_rewrite_style,
+)
+async def rewrite_style(text: str, style: str = "formal") -> dict:
+    """Rewrite text in a different style."""
+    if not text.strip():
+        return {"error": "Error: Empty or whitespace-only text provided"}
+    
+    try:
+        paraphrased = await run_chunked(
+            "rewrite_style", text, functools.partial(run_batched, "paraphrase", _paraphrase_texts)
+        )
+        return {"text": text, "style": style, "rewritten": paraphrased}
+    except Exception as e:
+        logger.error(f"Style rewrite error: {e}")
+        return {"error": f"Error rewriting text: {str(e)}"}
+
+
+LANGUAGE_NAMES = {"ms": "Malay", "en": "English"}
+
+
+def _format_translate(data: dict) -> str:
+    return f"""Translation Result:
+
+Source ({LANGUAGE_NAMES[data['source_lang']]}): {data['text']}
+
+Translation ({LANGUAGE_NAMES[data['target_lang']]}): {data['translation']}"""
+
+
+@tools.tool(
+    "translate",
+    "Translate text between Malay and English (bidirectional).",
+    _text_schema(
+        "The text to translate",
+        source_lang={
+            "type": "string",
+            "description": "Source language code (ms=Malay, en=English)",
+            "enum": ["ms", "en"],
+            "default": "ms",
+        },
+        target_lang={
+            "type": "string",
+            "description": "Target language code (ms=Malay, en=English)",
+            "enum": ["ms", "en"],
+            "default": "en",
+        },
+    ),
+    formatter=_format_translate,
+    cache="persistent",
+)
+async def translate(text: str, source_lang: str = "ms", target_lang: str = "en") -> dict:
     """Translate text between Malay and English."""
     if not text.strip():
-        return [TextContent(type="text", text="Error: Empty or whitespace-only text provided")]
+        return {"error": "Error: Empty or whitespace-only text provided"}
     
     if source_lang == target_lang:
-        return [TextContent(type="text", text="Error: Source and target languages must be different")]
+        return {"error": "Error: Source and target languages must be different"}
     
     try:
-        translator = get_translation_model(source_lang, target_lang)
-        translated = translator.translate([text])[0]
-        
-        lang_names = {"ms": "Malay", "en": "English"}
-        response = f"""Translation Result:
-
-Source ({lang_names[source_lang]}): {text}
-
-Translation ({lang_names[target_lang]}): {translated}"""
-        
-        return [TextContent(type="text", text=response)]
+        translated = await run_chunked(
+            "translate",
+            text,
+            functools.partial(_translate_one, source=source_lang, target=target_lang),
+            key=(source_lang, target_lang),
+        )
+        return {
+            "text": text,
+            "source_lang": source_lang,
+            "target_lang": target_lang,
+            "translation": translated,
+        }
     except Exception as e:
         logger.error(f"Translation error: {e}")
-        return [TextContent(type="text", text=f"Error translating text: {str(e)}")]
+        return {"error": f"Error translating text: {str(e)}"}
 
 
-async def term_lookup(term: str) -> list[TextContent]:
-    """Look up detailed linguistic information about a Malay term."""
-    if not term.strip():
-        return [TextContent(type="text", text="Error: Empty or whitespace-only term provided")]
-    
+async def _timed(timings: dict, step: str, awaitable):
+    """Await a step and record how long it took under timings[step]."""
+    start = time.perf_counter()
     try:
-        # Combine multiple analysis approaches
-        translator = get_translation_model("ms", "en")
-        translation = translator.translate([term])[0]
-        
-        # Try to detect if it's actually Malay
-        detector = get_language_detection_model()
-        lang_info = detector.predict([term])[0]
-        
-        response = f"""Term Lookup: {term}
-
-Language: {lang_info['label']} (confidence: {lang_info['score']:.2%})
-Translation: {translation}
+        return await awaitable
+    finally:
+        timings[step] = time.perf_counter() - start
+
+
+def _format_term_lookup(data: dict) -> str:
+    suggestion = ""
+    if "headword" in data:
+        suggestion = f"Did you mean: {data['headword']} (edit distance {data['distance']})\n"
+    elif "suggestion" in data:
+        suggestion = (f"Similar word: {data['suggestion']} (edit distance {data['distance']}), "
+                      f"translated as written\n")
+    return f"""Term Lookup: {data['term']}
+{suggestion}
+Language: {data['label']} (confidence: {data['score']:.2%})
+Translation: {data['translation']}
 
 Note: For comprehensive linguistic analysis including part of speech, etymology, 
 and morphological information, consider integrating with specialized Malay linguistic 
 databases or NLP pipelines."""
-        
-        return [TextContent(type="text", text=response)]
+
+
+@tools.tool(
+    "term_lookup",
+    "Look up linguistic information about a Malay term, including part of speech, etymology, and related terms.",
+    _text_schema("The Malay term to look up", name="term"),
+    formatter=_format_term_lookup,
+    text_argument="term",
+)
+async def term_lookup(term: str) -> dict:
+    """Look up detailed linguistic information about a Malay term."""
+    if not term.strip():
+        return {"error": "Error: Empty or whitespace-only term provided"}
+    
+    try:
+        timings = {}
+        start = time.perf_counter()
+        # A single word one edit from a vocabulary headword is looked up as
+        # that headword; a farther match is only suggested, since it is as
+        # likely to be an inflected form ("rumahku") as a typo.
+        headword = suggestion = None
+        if len(term.split()) == 1:
+            index = await _timed(timings, "fuzzy_match", asyncio.to_thread(get_fuzzy_index))
+            match = index.best(term) if index is not None else None
+            if match is not None and 0 < match["distance"] <= CORRECTION_MAX_DISTANCE:
+                headword = match
+            elif match is not None and match["distance"] > 0:
+                suggestion = match
+        query = headword["word"] if headword else term
+
+        # The translation and the language check are independent, so run them
+        # concurrently through the translate and detect_language handlers, whose
+        # result caches answer repeated terms without a model call. They are
+        # steps of this request, not tool calls of their own.
+        translation, lang_info = await asyncio.gather(
+            _timed(timings, "translation", tools.run_nested("translate", {"text": query})),
+            _timed(timings, "language_detection",
+                   tools.run_nested("detect_language", {"text": query})),
+        )
+        timings["total"] = time.perf_counter() - start
+        logger.debug(
+            f"term_lookup timings for {term!r}: "
+            + ", ".join(f"{step}={seconds * 1000:.1f}ms" for step, seconds in timings.items())
+        )
+        for part in (translation, lang_info):
+            if "error" in part:
+                return {"error": f"Error looking up term: {part['error']}"}
+        data = {
+            "term": term,
+            "label": lang_info["label"],
+            "score": lang_info["score"],
+            "translation": translation["translation"],
+        }
+        if headword:
+            data.update(headword=headword["word"], distance=headword["distance"])
+        elif suggestion:
+            data.update(suggestion=suggestion["word"], distance=suggestion["distance"])
+        return data
     except Exception as e:
         logger.error(f"Term lookup error: {e}")
-        return [TextContent(type="text", text=f"Error looking up term: {str(e)}")]
+        return {"error": f"Error looking up term: {str(e)}"}
+
+
+# Interpreter start-up plus every import up to here, measured from process start so the
+# imports stay at the top of the module.
+_startup = _seconds_since_process_start()
+if _startup is not None:
+    _import_timings["server"] = _startup
 
 
 async def main():
     """Run the MCP server on stdio."""
     logger.info("Starting MalayLanguage MCP server on stdio...")
+    if "server" in _import_timings:
+        logger.info(f"Server modules imported {_import_timings['server']:.2f}s after start")
     async with stdio_server() as (read_stream, write_stream):
         await app.run(read_stream, write_stream, app.create_initialization_options())
 
 
 if __name__ == "__main__":
-    import asyncio
     asyncio.run(main())
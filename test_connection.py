@@ -3,12 +3,44 @@
 Simple test script to verify MalayLanguage MCP server connection.
 Usage: python test_connection.py <server_url>
 Example: python test_connection.py https://your-app.railway.app
+
+With --load it becomes a load generator: a pool of keep-alive connections
+replays a corpus against POST /tools/execute while the number of concurrent
+clients ramps up (1, 2, 4, ... by default), each stage for --stage-seconds.
+The ramp stops at the saturation point, the first stage where throughput
+grows less than --min-gain over the best stage so far, errors exceed
+--max-error-rate or p99 latency passes --slo-p99-ms.
+
+The corpus is synthetic Malay text (see workload.py), a text file with one
+input per line sent to each --tools tool in turn, or a recorded JSONL file
+of {"name": ..., "arguments": ...} requests (the /tools/batch item format)
+replayed as is.
+
+--baseline compares the run with an earlier --output report and exits with
+status 1 when peak throughput, a stage's throughput or its p95/p99 latency
+regressed by more than --tolerance.
+
+Load examples:
+    python test_connection.py http://localhost:8000 --load -o baseline.json
+    python test_connection.py http://localhost:8000 --load --tools translate rewrite_style \\
+        --max-concurrency 64 --stage-seconds 20 --baseline baseline.json --tolerance 0.1
 """
 
+import argparse
+import asyncio
+import datetime
+import itertools
 import sys
+import time
 import urllib.request
 import json
 
+from workload import (
+    compare_results, load_corpus, summarize_latencies, synthetic_corpus, tool_arguments,
+)
+
+DEFAULT_TOOLS = ["detect_language", "normalize_malay", "translate"]
+
 def test_health(base_url):
     """Test the health check endpoint."""
     print(f"\n🔍 Testing health check at {base_url}/health...")
@@ -84,14 +116,217 @@ def print_config(base_url):
         }
     }, indent=2))
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python test_connection.py <server_url>")
-        print("Example: python test_connection.py https://your-app.railway.app")
-        print("         python test_connection.py http://localhost:8000")
-        sys.exit(1)
-    
-    base_url = sys.argv[1].rstrip('/')
+def load_requests(tools, corpus=None, seed=0):
+    """Return the (tool, arguments) pairs to replay, in order."""
+    if corpus and corpus.endswith((".jsonl", ".ndjson")):
+        with open(corpus, encoding="utf-8") as f:
+            items = [json.loads(line) for line in f if line.strip()]
+        return [(item["name"], item.get("arguments", {})) for item in items]
+    texts = load_corpus(corpus) if corpus else synthetic_corpus(seed=seed)
+    return [(tool, tool_arguments(tool, text)) for text in texts for tool in tools]
+
+def ramp_levels(start, maximum, factor=2.0):
+    """Concurrency levels from start to maximum, multiplied by factor each stage."""
+    levels = []
+    level = max(start, 1)
+    while level <= maximum:
+        levels.append(level)
+        level = max(int(level * factor), level + 1)
+    return levels
+
+async def run_stage(client, requests, concurrency, seconds):
+    """Send requests from concurrency clients for seconds and summarize the stage.
+
+    requests is shared across stages, so a long ramp keeps walking the corpus.
+    Every non-200 response counts as an error; 429 and 503 are also counted as
+    rejected (shed by the server's admission control).
+    """
+    import httpx
+
+    latencies = []
+    statuses = {}
+    deadline = time.perf_counter() + seconds
+
+    async def client_loop():
+        while time.perf_counter() < deadline:
+            name, arguments = next(requests)
+            start = time.perf_counter()
+            try:
+                response = await client.post(
+                    "/tools/execute", json={"name": name, "arguments": arguments}
+                )
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    ok = statuses.get("200", 0)
+    return {
+        "transport": "http",
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(latencies) - ok,
+        "error_rate": round((len(latencies) - ok) / len(latencies), 4) if latencies else 0.0,
+        "rejected": statuses.get("429", 0) + statuses.get("503", 0),
+        "statuses": statuses,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(ok / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": summarize_latencies(latencies),
+    }
+
+def saturation_reason(stages, min_gain=0.1, max_error_rate=0.01, slo_p99_ms=0.0):
+    """Why the last stage is past the saturation point, or None while it still scales."""
+    stage = stages[-1]
+    if stage["error_rate"] > max_error_rate:
+        return f"error rate {stage['error_rate']:.1%} above {max_error_rate:.1%}"
+    if slo_p99_ms and stage["latency_ms"]["p99"] > slo_p99_ms:
+        return f"p99 {stage['latency_ms']['p99']:.0f}ms above the {slo_p99_ms:.0f}ms SLO"
+    best = max((s["throughput_rps"] for s in stages[:-1]), default=None)
+    if best is not None and stage["throughput_rps"] < best * (1 + min_gain):
+        return f"throughput grew less than {min_gain:.0%} over {best} req/s"
+    return None
+
+def saturation_point(stages, reason):
+    """The stage that served the most before saturating (the best healthy stage)."""
+    healthy = stages[:-1] if reason and not reason.startswith("throughput") else stages
+    if not healthy:
+        return None
+    best = max(healthy, key=lambda s: s["throughput_rps"])
+    return {"concurrency": best["concurrency"], "throughput_rps": best["throughput_rps"],
+            "p99_ms": best["latency_ms"]["p99"], "reason": reason}
+
+async def run_load(base_url, requests, levels, stage_seconds, warmup=0, min_gain=0.1,
+                   max_error_rate=0.01, slo_p99_ms=0.0, stop_at_saturation=True, timeout=60.0):
+    """Ramp through the concurrency levels and return the stages and saturation point."""
+    # Only --load needs httpx; the connection checks use urllib.
+    import httpx
+
+    cycle = itertools.cycle(requests)
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    stages = []
+    reason = None
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        # Unmeasured requests, one at a time, so models are loaded before the ramp.
+        for name, arguments in itertools.islice(itertools.cycle(requests), warmup):
+            await client.post("/tools/execute", json={"name": name, "arguments": arguments})
+        for level in levels:
+            stage = await run_stage(client, cycle, level, stage_seconds)
+            stage["tool"] = "+".join(sorted({name for name, _ in requests}))
+            stages.append(stage)
+            latency = stage["latency_ms"]
+            print(f"   c={level:<4} {stage['throughput_rps']:>9.1f} req/s  "
+                  f"p50 {latency['p50']:>8.1f}ms  p95 {latency['p95']:>8.1f}ms  "
+                  f"p99 {latency['p99']:>8.1f}ms  "
+                  f"errors {stage['errors']} (rejected {stage['rejected']})")
+            reason = saturation_reason(stages, min_gain, max_error_rate, slo_p99_ms)
+            if reason and stop_at_saturation:
+                break
+    return {"stages": stages, "saturation": saturation_point(stages, reason)}
+
+def compare_to_baseline(baseline, report, tolerance=0.15):
+    """Regressions of report against baseline: per-stage results and peak throughput."""
+    regressions = compare_results(
+        {"results": baseline["stages"]}, {"results": report["stages"]}, tolerance
+    )
+    def peak(r):
+        return max((s["throughput_rps"] for s in r["stages"]), default=0.0)
+
+    if peak(report) < peak(baseline) * (1 - tolerance):
+        regressions.append(f"peak throughput {peak(baseline)} -> {peak(report)} req/s")
+    return regressions
+
+def run_load_test(args):
+    """Run the --load mode and return the exit status."""
+    tools = args.tools or DEFAULT_TOOLS
+    requests = load_requests(tools, args.corpus, args.seed)
+    levels = ramp_levels(args.start_concurrency, args.max_concurrency, args.step_factor)
+    if not requests or not levels:
+        print("❌ Nothing to send: check --corpus and the concurrency range")
+        return 2
+    print(f"\n🔍 Load test against {args.url}/tools/execute: {len(requests)} corpus requests, "
+          f"concurrency {levels[0]} to {levels[-1]}, {args.stage_seconds:g}s per stage")
+    if not test_health(args.url):
+        return 1
+    warmup = len(tools) if args.warmup is None else args.warmup
+    result = asyncio.run(run_load(
+        args.url, requests, levels, args.stage_seconds, warmup=warmup,
+        min_gain=args.min_gain, max_error_rate=args.max_error_rate, slo_p99_ms=args.slo_p99_ms,
+        stop_at_saturation=not args.full_ramp, timeout=args.timeout,
+    ))
+    report = {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "url": args.url,
+        "corpus": args.corpus or f"synthetic (seed {args.seed})",
+        "tools": tools,
+        "stage_seconds": args.stage_seconds,
+        **result,
+    }
+    saturation = report["saturation"]
+    if saturation and saturation["reason"]:
+        print(f"\n📈 Saturation at concurrency {saturation['concurrency']}: "
+              f"{saturation['throughput_rps']} req/s, p99 {saturation['p99_ms']}ms "
+              f"({saturation['reason']})")
+    elif saturation:
+        print(f"\n📈 Still scaling at concurrency {saturation['concurrency']}: "
+              f"{saturation['throughput_rps']} req/s")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"   Report written to {args.output}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare_to_baseline(json.load(f), report, args.tolerance)
+        for regression in regressions:
+            print(f"❌ Regression: {regression}")
+        if regressions:
+            return 1
+        print(f"✅ No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Check a MalayLanguage MCP server, or load test it with --load."
+    )
+    parser.add_argument("url", help="Server URL, e.g. http://localhost:8000")
+    parser.add_argument("--load", action="store_true",
+                        help="Run the load test instead of the connection checks")
+    parser.add_argument("--tools", nargs="+",
+                        help=f"Tools called with text corpora (default: {' '.join(DEFAULT_TOOLS)})")
+    parser.add_argument("--corpus",
+                        help="Text file (one input per line) or recorded JSONL requests")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic corpus")
+    parser.add_argument("--start-concurrency", type=int, default=1)
+    parser.add_argument("--max-concurrency", type=int, default=64)
+    parser.add_argument("--step-factor", type=float, default=2.0,
+                        help="Concurrency multiplier per stage")
+    parser.add_argument("--stage-seconds", type=float, default=10.0)
+    parser.add_argument("--warmup", type=int,
+                        help="Unmeasured requests before the ramp (default: one per tool)")
+    parser.add_argument("--min-gain", type=float, default=0.1,
+                        help="Smallest throughput gain for a stage to count as still scaling")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--slo-p99-ms", type=float, default=0.0,
+                        help="p99 latency that counts as saturated")
+    parser.add_argument("--full-ramp", action="store_true",
+                        help="Keep ramping past the saturation point")
+    parser.add_argument("--timeout", type=float, default=60.0,
+                        help="Per-request timeout in seconds")
+    parser.add_argument("-o", "--output", help="Write the load report as JSON")
+    parser.add_argument("--baseline", help="Earlier load report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression")
+    args = parser.parse_args(argv)
+    args.url = args.url.rstrip('/')
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.load:
+        sys.exit(run_load_test(args))
+    base_url = args.url
     
     print("=" * 60)
     print("MalayLanguage MCP Server Connection Test")
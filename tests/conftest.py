@@ -0,0 +1,52 @@
+"""
+Shared fixtures for the MalayLanguage MCP Server tests
+"""
+from unittest.mock import patch
+
+import pytest
+
+
+class MockModel:
+    """Mock model for testing."""
+
+    def predict(self, texts):
+        """Mock predict method."""
+        return [{"label": "malay", "score": 0.95} for _ in texts]
+
+    def normalize(self, text):
+        """Mock normalize method."""
+        return text.lower()
+
+    def correct(self, text):
+        """Mock correct method."""
+        return text.replace("saya", "Saya")
+
+    def translate(self, texts):
+        """Mock translate method."""
+        return [f"translated: {text}" for text in texts]
+
+    def paraphrase(self, texts):
+        """Mock paraphrase method."""
+        return [f"paraphrased: {text}" for text in texts]
+
+
+@pytest.fixture
+def mock_models():
+    """Patch every model loader; each returns the same MockModel.
+
+    Yields the loader mocks by model kind, so a test can count loads or swap
+    in its own model with mock_models["translation"].return_value.
+    """
+    model = MockModel()
+    with patch("server.get_language_detection_model", return_value=model) as lang_mock, \
+         patch("server.get_normalizer_model", return_value=model) as norm_mock, \
+         patch("server.get_spelling_corrector", return_value=model) as spell_mock, \
+         patch("server.get_translation_model", return_value=model) as trans_mock, \
+         patch("server.get_paraphrase_model", return_value=model) as para_mock:
+        yield {
+            "language": lang_mock,
+            "normalizer": norm_mock,
+            "spelling": spell_mock,
+            "translation": trans_mock,
+            "paraphrase": para_mock,
+        }
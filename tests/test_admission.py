@@ -0,0 +1,259 @@
+"""
+Tests for admission control and load shedding
+"""
+import asyncio
+import json
+import sys
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+
+sys.modules.setdefault('malaya', MagicMock())
+
+import admission
+import http_server
+import server
+from admission import (
+    AdmissionController, ToolOverloadedError, in_admitted_batch, parse_priorities,
+)
+from cache import clear_caches
+from metrics import ADMISSION_REJECTED, TOOL_CALLS, reset_metrics
+from tests.conftest import MockModel
+
+
+@pytest.fixture
+def controller():
+    """Install a one-slot controller for the test, then restore the default."""
+    clear_caches()
+    reset_metrics()
+    small = AdmissionController(max_active=1, max_queue=1, max_wait_ms=50, reserved=0)
+    admission.set_admission_controller(small)
+    yield small
+    admission.set_admission_controller(AdmissionController())
+    clear_caches()
+
+
+async def hold_slot(controller, tool="translate"):
+    """Take a slot in a background task; set the returned event to give it back."""
+    held, release = asyncio.Event(), asyncio.Event()
+
+    async def holder():
+        async with controller.admit(tool):
+            held.set()
+            await release.wait()
+
+    task = asyncio.create_task(holder())
+    await held.wait()
+    return release, task
+
+
+def test_parse_priorities():
+    """Test the ADMISSION_PRIORITIES format and the defaults it overrides."""
+    assert parse_priorities(" translate=0, rewrite_style=3 ,") == {
+        "translate": 0, "rewrite_style": 3,
+    }
+    with pytest.raises(ValueError):
+        parse_priorities("translate")
+    controller = AdmissionController(priorities={"translate": 0})
+    assert controller.priority("translate") == 0
+    assert controller.priority("detect_language") == 0
+    assert controller.priority("rewrite_style") == 2
+    assert controller.priority("unknown") == 1
+
+
+def test_from_env(monkeypatch):
+    """Test the ADMISSION_* settings, including 0 to disable."""
+    monkeypatch.setenv("ADMISSION_MAX_ACTIVE", "16")
+    monkeypatch.setenv("ADMISSION_MAX_WAIT_MS", "250")
+    monkeypatch.setenv("ADMISSION_PRIORITIES", "term_lookup=2")
+    controller = AdmissionController.from_env()
+    assert (controller.max_active, controller.reserved, controller.max_wait) == (16, 2, 0.25)
+    assert controller.priority("term_lookup") == 2
+    monkeypatch.setenv("ADMISSION_MAX_ACTIVE", "0")
+    assert AdmissionController.from_env() is None
+
+
+@pytest.mark.asyncio
+async def test_freed_slots_go_to_cheaper_tools_first():
+    """Test that waiting detect_language calls start before earlier rewrite_style calls."""
+    controller = AdmissionController(max_active=1, reserved=0)
+    release, holder = await hold_slot(controller)
+    order = []
+
+    async def call(tool):
+        async with controller.admit(tool):
+            order.append(tool)
+            await asyncio.sleep(0)
+
+    calls = []
+    for tool in ["rewrite_style", "translate", "detect_language", "rewrite_style"]:
+        calls.append(asyncio.create_task(call(tool)))
+        await asyncio.sleep(0)
+    assert controller.stats()["queued"] == {"rewrite_style": 2, "translate": 1,
+                                            "detect_language": 1}
+    release.set()
+    await asyncio.gather(holder, *calls)
+    assert order == ["detect_language", "translate", "rewrite_style", "rewrite_style"]
+    assert controller.stats()["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_reserved_slots_admit_only_priority_zero():
+    """Test that cheap tools still start when expensive ones hold the shared slots."""
+    controller = AdmissionController(max_active=2, max_wait_ms=20, reserved=1)
+    release, holder = await hold_slot(controller, "rewrite_style")
+    with pytest.raises(ToolOverloadedError):
+        async with controller.admit("translate"):
+            pass
+    async with controller.admit("detect_language") as waited:
+        assert waited == 0.0
+    release.set()
+    await holder
+
+
+@pytest.mark.asyncio
+async def test_full_queue_and_long_waits_are_shed():
+    """Test the 429 and 503 rejections, their Retry-After and slot accounting."""
+    controller = AdmissionController(max_active=1, max_queue=1, max_wait_ms=30, reserved=0)
+    release, holder = await hold_slot(controller)
+    waiter = asyncio.create_task(controller.admit("translate").__aenter__())
+    await asyncio.sleep(0)
+
+    with pytest.raises(ToolOverloadedError) as full:
+        async with controller.admit("translate"):
+            pass
+    assert (full.value.reason, full.value.status_code) == ("queue_full", 429)
+    assert full.value.retry_after >= 1
+
+    with pytest.raises(ToolOverloadedError) as timed_out:
+        await waiter
+    assert (timed_out.value.reason, timed_out.value.status_code) == ("wait_timeout", 503)
+    assert controller.stats()["tools"]["translate"] == {
+        "admitted": 1, "queued": 1, "rejected": 1, "timed_out": 1,
+    }
+    release.set()
+    await holder
+    assert controller.stats()["active"] == 0 and controller.stats()["queued"] == {}
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_gives_up_its_place():
+    """Test that a caller cancelled while waiting neither leaks nor blocks a slot."""
+    controller = AdmissionController(max_active=1, reserved=0)
+    release, holder = await hold_slot(controller)
+    waiter = asyncio.create_task(controller.admit("translate").__aenter__())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    release.set()
+    await holder
+    async with controller.admit("translate"):
+        assert controller.stats()["active"] == 1
+    assert controller.stats()["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_nested_tool_calls_use_the_callers_slot(controller):
+    """Test that term_lookup's inner translate call does not queue behind itself."""
+    controller.max_queue = 0
+    with patch("server.get_translation_model", return_value=MockModel()), \
+         patch("server.get_language_detection_model", return_value=MockModel()):
+        data = await server.tools.run("term_lookup", {"term": "buku"})
+    assert "error" not in data
+    assert controller.stats()["tools"]["term_lookup"]["admitted"] == 1
+    assert "translate" not in controller.stats()["tools"]
+
+
+@pytest.mark.asyncio
+async def test_tools_execute_returns_retry_after(controller):
+    """Test /tools/execute answers 429 and 503 with Retry-After when saturated."""
+    controller.max_wait = 0.2
+    transport = httpx.ASGITransport(app=http_server.http_app)
+    body = {"name": "translate", "arguments": {"text": "Hai", "target_lang": "en"}}
+    release, holder = await hold_slot(controller)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        queued = asyncio.create_task(client.post("/tools/execute", json=body))
+        await asyncio.sleep(0.01)
+        full = await client.post("/tools/execute", json=body)
+        timed_out = await queued
+    release.set()
+    await holder
+
+    assert full.status_code == 429 and int(full.headers["Retry-After"]) >= 1
+    assert full.json()["reason"] == "queue_full"
+    assert timed_out.status_code == 503 and "Retry-After" in timed_out.headers
+    assert timed_out.json()["reason"] == "wait_timeout"
+    assert TOOL_CALLS.value("translate", "rejected") == 2
+    assert ADMISSION_REJECTED.value("translate", "queue_full") == 1
+
+
+@pytest.mark.asyncio
+async def test_mcp_call_returns_tool_error(controller):
+    """Test that a shed MCP call is an isError result with the retry hint."""
+    controller.max_queue = 0
+    release, holder = await hold_slot(controller)
+    result = await server.call_tool("translate", {"text": "Hai"})
+    release.set()
+    await holder
+    assert result.isError is True
+    assert result.structuredContent["reason"] == "queue_full"
+    assert result.structuredContent["retry_after"] >= 1
+    assert result.content[0].text.startswith("Error: translate is overloaded")
+
+
+@pytest.mark.asyncio
+async def test_batches_are_shed_once_and_their_items_wait():
+    """Test that a batch is capped to the free slots and its items are never shed."""
+    controller = AdmissionController(max_active=4, max_queue=0, max_wait_ms=10, reserved=1)
+    release, holder = await hold_slot(controller)
+    assert await controller.admit_batch("translate", 256) == 2
+    assert await controller.admit_batch("detect_language", 256) == 3
+    assert await controller.admit_batch("translate", 1) == 1
+    assert controller.stats()["active"] == 1
+
+    more = [await hold_slot(controller) for _ in range(2)]
+    with pytest.raises(ToolOverloadedError):
+        await controller.admit_batch("translate", 256)
+
+    async def item():
+        with in_admitted_batch():
+            async with controller.admit("translate"):
+                pass
+
+    waiting = asyncio.create_task(item())
+    await asyncio.sleep(0.05)
+    assert not waiting.done()
+    release.set()
+    await asyncio.gather(holder, waiting)
+    for other_release, other in more:
+        other_release.set()
+        await other
+    assert controller.stats()["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_batch_and_stream_larger_than_the_slots_finish(controller):
+    """Test that /tools/batch and /tools/stream with more items than slots shed none of them."""
+    transport = httpx.ASGITransport(app=http_server.http_app)
+    texts = [f"Hai {i}" for i in range(10)]
+    with patch("server.get_translation_model", return_value=MockModel()):
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            batch = await client.post("/tools/batch", json={"name": "translate", "texts": texts})
+            stream = await client.post(
+                "/tools/stream?tool=translate", content="\n".join(texts).encode(),
+                headers={"Content-Type": "text/plain"},
+            )
+            release, holder = await hold_slot(controller)
+            controller.max_queue = 0
+            shed = await client.post("/tools/batch", json={"name": "translate", "texts": texts})
+            release.set()
+            await holder
+
+    assert batch.status_code == 200
+    assert batch.json()["count"] == 10 and batch.json()["errors"] == 0
+    records = [json.loads(line) for line in stream.text.splitlines()]
+    assert len(records) == 10 and not any("error" in record for record in records)
+    assert shed.status_code == 429 and "Retry-After" in shed.headers
+    assert ADMISSION_REJECTED.value("translate", "queue_full") == 1
@@ -0,0 +1,99 @@
+"""
+Tests for the offline batch processor
+"""
+import io
+import json
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+sys.modules.setdefault('malaya', MagicMock())
+
+import batch_cli
+
+
+def records(output: io.StringIO) -> list[dict]:
+    return [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_read_inputs_formats():
+    """Test reading text, CSV and JSONL inputs with record numbers."""
+    text = io.StringIO("satu\n\ndua\r\n")
+    assert list(batch_cli.read_inputs(text, "text")) == [(1, "satu"), (3, "dua")]
+
+    rows = io.StringIO("id,ayat\n1,Selamat pagi\n2,\n3,Terima kasih\n")
+    assert list(batch_cli.read_inputs(rows, "csv", "ayat")) == [
+        (1, "Selamat pagi"), (3, "Terima kasih")
+    ]
+
+    lines = io.StringIO('"satu"\n{"text": "dua"}\n')
+    assert list(batch_cli.read_inputs(lines, "jsonl")) == [(1, "satu"), (2, "dua")]
+
+    with pytest.raises(ValueError):
+        list(batch_cli.read_inputs(io.StringIO("a\n"), "csv", "text"))
+
+
+def test_guess_format():
+    """Test picking the input format from the file extension."""
+    assert batch_cli.guess_format("data.CSV") == "csv"
+    assert batch_cli.guess_format("data.ndjson") == "jsonl"
+    assert batch_cli.guess_format("corpus.txt") == "text"
+
+
+def test_process_writes_results_in_order(mock_models):
+    """Test that results stream out in input order with throughput stats."""
+    output = io.StringIO()
+    inputs = [(i, f"teks {i}") for i in range(1, 8)]
+    stats = batch_cli.process("translate", inputs, output, batch_size=3, report_interval=0)
+    written = records(output)
+    assert [r["line"] for r in written] == list(range(1, 8))
+    assert written[0]["result"] == "translated: teks 1"
+    assert stats["items"] == 7
+    assert stats["batches"] == 3
+    assert stats["errors"] == 0
+
+
+def test_process_detect_language_structured(mock_models):
+    """Test that language detection writes the label and score."""
+    output = io.StringIO()
+    batch_cli.process("detect_language", [(1, "Selamat pagi")], output)
+    assert records(output)[0]["result"] == {"label": "malay", "score": 0.95}
+
+
+def test_failing_input_only_fails_its_record(mock_models):
+    """Test that a bad input in a batch does not fail its neighbours."""
+
+    def picky_normalize(text):
+        if text == "bad":
+            raise RuntimeError("model failed")
+        return text.lower()
+
+    mock_models["normalizer"].return_value.normalize = picky_normalize
+    output = io.StringIO()
+    with patch("batch_cli.get_rule_normalizer", return_value=None):
+        stats = batch_cli.process("normalize_malay", [(1, "A"), (2, "bad"), (3, "C")], output)
+    written = records(output)
+    assert written[0]["result"] == "a"
+    assert "model failed" in written[1]["error"]
+    assert written[2]["result"] == "c"
+    assert stats["errors"] == 1
+
+
+def test_main_reads_file_and_writes_output(mock_models, tmp_path):
+    """Test the command line end to end on a CSV file."""
+    source = tmp_path / "input.csv"
+    source.write_text("text\nSaya suka\nsaya makan\n", encoding="utf-8")
+    target = tmp_path / "output.jsonl"
+    status = batch_cli.main([
+        "correct_spelling", str(source), "-o", str(target), "--workers", "1", "--no-preload"
+    ])
+    assert status == 0
+    written = [json.loads(line) for line in target.read_text(encoding="utf-8").splitlines()]
+    assert [r["result"] for r in written] == ["Saya suka", "Saya makan"]
+
+
+def test_process_rejects_same_language():
+    """Test that translating into the source language is refused up front."""
+    with pytest.raises(ValueError):
+        batch_cli.process("translate", [], io.StringIO(), source_lang="ms", target_lang="ms")
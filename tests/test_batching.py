@@ -0,0 +1,93 @@
+"""
+Tests for dynamic micro-batching
+"""
+import asyncio
+
+import pytest
+
+from batching import MicroBatcher
+from model_registry import ModelLoadError
+
+
+class RecordingRunner:
+    """Runner that calls the batch function inline and records batch sizes."""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    async def __call__(self, model_key, func, items):
+        self.batch_sizes.append(len(items))
+        return func(items)
+
+
+def upper_batch(texts):
+    return [text.upper() for text in texts]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_are_coalesced():
+    """Test that concurrent submissions share one batched call."""
+    runner = RecordingRunner()
+    batcher = MicroBatcher("test", upper_batch, max_batch_size=8, max_wait_ms=20, runner=runner)
+    results = await asyncio.gather(*(batcher.submit(f"text {i}") for i in range(5)))
+    assert results == [f"TEXT {i}" for i in range(5)]
+    assert runner.batch_sizes == [5]
+    assert batcher.stats()["average_batch"] == 5
+
+
+@pytest.mark.asyncio
+async def test_full_batch_flushes_immediately():
+    """Test that reaching max_batch_size splits work into several batches."""
+    runner = RecordingRunner()
+    batcher = MicroBatcher("test", upper_batch, max_batch_size=2, max_wait_ms=1000, runner=runner)
+    results = await asyncio.wait_for(
+        asyncio.gather(*(batcher.submit(str(i)) for i in range(4))), timeout=0.5
+    )
+    assert results == ["0", "1", "2", "3"]
+    assert runner.batch_sizes == [2, 2]
+
+
+@pytest.mark.asyncio
+async def test_failing_input_does_not_fail_its_batch():
+    """Test that only the caller with the bad input sees the error."""
+
+    def picky_batch(texts):
+        if "bad" in texts:
+            raise RuntimeError("model failed")
+        return [text.upper() for text in texts]
+
+    runner = RecordingRunner()
+    batcher = MicroBatcher("test", picky_batch, max_batch_size=8, max_wait_ms=20, runner=runner)
+    results = await asyncio.gather(
+        *(batcher.submit(text) for text in ["a", "b", "bad", "c"]), return_exceptions=True
+    )
+    assert results[:2] == ["A", "B"]
+    assert isinstance(results[2], RuntimeError)
+    assert results[3] == "C"
+    assert runner.batch_sizes[0] == 4
+    assert batcher.stats()["splits"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_failed_model_load_fails_the_batch_without_bisecting():
+    """Test that a loader error is not retried for every half of the batch."""
+
+    def unloadable(texts):
+        raise ModelLoadError("Could not load test: download failed")
+
+    runner = RecordingRunner()
+    batcher = MicroBatcher("test", unloadable, max_batch_size=8, max_wait_ms=20, runner=runner)
+    results = await asyncio.gather(
+        *(batcher.submit(text) for text in "abcd"), return_exceptions=True
+    )
+    assert all(isinstance(result, ModelLoadError) for result in results)
+    assert runner.batch_sizes == [4]
+    assert batcher.stats()["splits"] == 0
+
+
+@pytest.mark.asyncio
+async def test_result_count_mismatch_is_an_error():
+    """Test that a model returning the wrong number of results fails the batch."""
+    batcher = MicroBatcher("test", lambda texts: [], runner=RecordingRunner())
+    with pytest.raises(RuntimeError):
+        await batcher.submit("a")
@@ -0,0 +1,130 @@
+"""
+Tests for the benchmark suite and its workload helpers
+"""
+import json
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.modules.setdefault('malaya', MagicMock())
+
+import benchmark
+from benchmark import FakeLatency, fake_malaya, run_scenario
+from cache import clear_caches, set_cache_enabled
+from workload import (
+    compare_results, percentile, summarize_latencies, synthetic_corpus, tool_arguments,
+)
+
+NO_DELAY = FakeLatency(call_ms=0, item_ms=0, char_ms=0, load_ms=0)
+
+
+@pytest.fixture
+def no_cache():
+    """Send every request to the (fake) model."""
+    clear_caches()
+    set_cache_enabled("detect_language", False)
+    set_cache_enabled("translate", False)
+    yield
+    set_cache_enabled("detect_language", True)
+    set_cache_enabled("translate", True)
+    clear_caches()
+
+
+def test_percentiles_and_summary():
+    """Test nearest-rank percentiles and the millisecond summary."""
+    values = [float(n) for n in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile(values, 100) == 100.0
+    assert percentile([0.5], 95) == 0.5
+    assert percentile([], 50) == 0.0
+    assert summarize_latencies([0.001, 0.002, 0.003, 0.004]) == {
+        "p50": 2.0, "p95": 4.0, "p99": 4.0, "mean": 2.5, "max": 4.0,
+    }
+
+
+def test_corpus_and_arguments_are_reproducible():
+    """Test that the synthetic corpus depends only on the seed."""
+    assert synthetic_corpus(50, seed=1) == synthetic_corpus(50, seed=1)
+    assert synthetic_corpus(50, seed=1) != synthetic_corpus(50, seed=2)
+    assert tool_arguments("term_lookup", "Saya membaca buku.") == {"term": "membaca"}
+    assert tool_arguments("translate", "Hai")["target_lang"] == "en"
+
+
+def test_fake_backend_replaces_and_restores_malaya():
+    """Test that server loaders build fake models with the configured latency."""
+    import server
+
+    original = sys.modules["malaya"]
+    latency = FakeLatency(call_ms=10, item_ms=1, char_ms=0.5, load_ms=0)
+    assert latency.seconds(["abcd", "ef"]) == pytest.approx((10 + 2 + 3) / 1000)
+    with fake_malaya(latency):
+        model = server.get_translation_model("ms", "en")
+        assert model.translate(["Hai"]) == ["[en] Hai"]
+        assert server.get_language_detection_model().predict(["Hai"])[0]["label"] == "malay"
+    assert sys.modules["malaya"] is original
+    assert "translation_ms_en" not in server._model_cache
+
+
+@pytest.mark.asyncio
+async def test_direct_scenario_reports_latency_and_throughput(no_cache):
+    """Test one in-process scenario against the fake backend."""
+    texts = synthetic_corpus(20)
+    with fake_malaya(FakeLatency(call_ms=5, item_ms=0, char_ms=0, load_ms=0)):
+        result = await run_scenario(benchmark.call_direct, "translate", texts, 4, 12, warmup=1)
+    assert result["requests"] == 12 and result["errors"] == 0
+    assert result["latency_ms"]["p50"] >= 5
+    assert result["throughput_rps"] > 0
+
+
+@pytest.mark.asyncio
+async def test_http_and_sse_transports(no_cache):
+    """Test /tools/execute and MCP over /sse against a server in this process."""
+    with fake_malaya(NO_DELAY):
+        results = await benchmark.run_benchmarks(
+            ["http", "sse"], ["detect_language"], [2], 4, synthetic_corpus(10), warmup=1
+        )
+    assert [(r["transport"], r["requests"], r["errors"]) for r in results] == [
+        ("http", 4, 0), ("sse", 4, 0),
+    ]
+    assert all(r["rss_mb"] > 0 for r in results)
+
+
+def test_compare_results_flags_regressions():
+    """Test the regression check on throughput, tail latency and errors."""
+
+    def run(rps, p95, p99, errors=0):
+        return {"results": [{
+            "transport": "direct", "tool": "translate", "concurrency": 8,
+            "throughput_rps": rps, "latency_ms": {"p95": p95, "p99": p99}, "errors": errors,
+        }]}
+
+    baseline = run(100, 50, 80)
+    assert compare_results(baseline, run(95, 55, 85), tolerance=0.15) == []
+    regressions = compare_results(baseline, run(80, 70, 80, errors=2), tolerance=0.15)
+    assert regressions == [
+        "direct/translate/8: throughput 100 -> 80 req/s",
+        "direct/translate/8: p95 latency 50 -> 70 ms",
+        "direct/translate/8: errors 0 -> 2",
+    ]
+    assert compare_results({"results": []}, baseline) == []
+
+
+def test_main_writes_json_and_gates_on_baseline(tmp_path, no_cache, monkeypatch):
+    """Test the command line: JSON output, then a comparison that fails."""
+    monkeypatch.setenv("RESULT_CACHE_SIZE", "1024")
+    output = tmp_path / "results.json"
+    args = ["--transport", "direct", "--tools", "detect_language", "--concurrency", "2",
+            "--requests", "4", "--warmup", "1", "--fake-call-ms", "1", "--fake-load-ms", "0",
+            "-o", str(output)]
+    assert benchmark.main(args) == 0
+    report = json.loads(output.read_text(encoding="utf-8"))
+    assert report["backend"] == "fake" and report["fake_latency"]["call_ms"] == 1
+    assert [r["tool"] for r in report["results"]] == ["detect_language"]
+
+    report["results"][0]["throughput_rps"] *= 1000
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(report), encoding="utf-8")
+    assert benchmark.main(args + ["--compare", str(baseline)]) == 1
+    assert benchmark.main(["--url", "http://localhost:1", "--transport", "direct"]) == 2
@@ -0,0 +1,157 @@
+"""
+Tests for the tool result cache
+"""
+import pytest
+from mcp.types import TextContent
+
+from cache import (
+    PersistentCache,
+    ResultCache,
+    cached_tool,
+    clear_caches,
+    get_tool_cache,
+    set_cache_enabled,
+    set_persistent_cache,
+)
+
+
+class FakeClock:
+    """Manually advanced clock for TTL tests."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction():
+    """Test that the least recently used entry is evicted first."""
+    cache = ResultCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry():
+    """Test that entries expire after the TTL."""
+    clock = FakeClock()
+    cache = ResultCache(max_size=4, ttl=10, clock=clock)
+    cache.set("a", 1)
+    clock.now = 5
+    assert cache.get("a") == 1
+    clock.now = 11
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_hit_miss_counters():
+    """Test hit and miss accounting."""
+    cache = ResultCache(max_size=4)
+    cache.get("a")
+    cache.set("a", 1)
+    cache.get("a")
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_cached_tool_applies_defaults_and_can_be_disabled():
+    """Test that equivalent calls share an entry and disabling bypasses the cache."""
+    calls = []
+
+    @cached_tool("echo_test")
+    async def echo(text, style="formal"):
+        calls.append(text)
+        return [text, style]
+
+    try:
+        assert await echo("teks") == ["teks", "formal"]
+        assert await echo("teks", style="formal") == ["teks", "formal"]
+        assert calls == ["teks"]
+
+        set_cache_enabled("echo_test", False)
+        await echo("teks")
+        assert calls == ["teks", "teks"]
+        assert get_tool_cache("echo_test") is None
+    finally:
+        set_cache_enabled("echo_test", True)
+        clear_caches()
+
+
+def test_persistent_cache_is_shared_between_instances(tmp_path):
+    """Test that a second connection (another worker) sees stored results."""
+    path = str(tmp_path / "results.sqlite3")
+    writer = PersistentCache(path)
+    writer.set(("translate", "Selamat pagi", "ms", "en"), ["Good morning"])
+    reader = PersistentCache(path)
+    assert reader.get(("translate", "Selamat pagi", "ms", "en")) == ["Good morning"]
+    assert reader.get(("translate", "Selamat malam", "ms", "en")) is None
+    assert reader.stats()["hits"] == 1
+
+
+def test_persistent_cache_compaction(tmp_path):
+    """Test that compaction trims the oldest entries below the size cap."""
+    cache = PersistentCache(str(tmp_path / "results.sqlite3"), max_entries=10, compact_every=5)
+    for i in range(15):
+        cache.set(("key", i), i)
+    assert len(cache) <= 10
+    assert cache.get(("key", 14)) == 14
+    assert cache.get(("key", 0)) is None
+    assert cache.stats()["compactions"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_persistent_tier_survives_memory_clear(tmp_path):
+    """Test that results are served from disk after the memory cache is dropped."""
+    calls = []
+
+    @cached_tool("persistent_test", persistent=True)
+    async def echo(text):
+        calls.append(text)
+        return [TextContent(type="text", text=f"echo: {text}")]
+
+    set_persistent_cache(PersistentCache(str(tmp_path / "results.sqlite3")))
+    try:
+        await echo("teks")
+        clear_caches()
+        result = await echo("teks")
+    finally:
+        set_persistent_cache(None)
+        clear_caches()
+    assert result[0].text == "echo: teks"
+    assert calls == ["teks"]
+
+
+@pytest.mark.asyncio
+async def test_cached_payloads_round_trip(tmp_path):
+    """Test that structured payload dicts are cached in memory and on disk."""
+    calls = []
+
+    @cached_tool("payload_test", persistent=True)
+    async def label(text):
+        calls.append(text)
+        if not text:
+            return {"error": "Error: empty"}
+        return {"text": text, "label": "malay"}
+
+    set_persistent_cache(PersistentCache(str(tmp_path / "results.sqlite3")))
+    try:
+        first = await label("teks")
+        first["label"] = "changed"
+        assert (await label("teks"))["label"] == "malay"
+        clear_caches()
+        assert await label("teks") == {"text": "teks", "label": "malay"}
+        await label("")
+        await label("")
+    finally:
+        set_persistent_cache(None)
+        clear_caches()
+    assert calls == ["teks", "", ""]
@@ -0,0 +1,157 @@
+"""
+Tests for sentence chunking of long inputs
+"""
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+sys.modules.setdefault('malaya', MagicMock())
+
+import server
+from batching import batch_stats
+from cache import cache_stats, clear_caches, set_cache_enabled
+from chunking import join_sentences, run_chunked, split_sentences, stream_sentences
+from tests.conftest import MockModel
+
+DOCUMENT = (
+    "Dr. Ali tiba di pejabat pada pukul lapan pagi.  Dia membuka komputer!\n\n"
+    "Mesyuarat bermula pada jam sembilan. \"Semua hadir?\" tanya pengerusi.\n"
+    "Mesyuarat bermula pada jam sembilan.\n"
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches():
+    """Start every test with empty result caches."""
+    clear_caches()
+    yield
+    clear_caches()
+
+
+def test_split_sentences_round_trips_whitespace():
+    """Test that splitting and joining gives back the original text."""
+    text = "  " + DOCUMENT + "  "
+    sentences, separators = split_sentences(text)
+    assert sentences == [
+        "Dr. Ali tiba di pejabat pada pukul lapan pagi.",
+        "Dia membuka komputer!",
+        "Mesyuarat bermula pada jam sembilan.",
+        "\"Semua hadir?\" tanya pengerusi.",
+        "Mesyuarat bermula pada jam sembilan.",
+    ]
+    assert separators == ["  ", "  ", "\n\n", " ", "\n", "\n  "]
+    assert join_sentences(sentences, separators) == text
+
+
+def test_split_sentences_keeps_abbreviations_and_initials():
+    """Test that abbreviations, initials and lower-case continuations do not split."""
+    sentences, _ = split_sentences("Rumah di No. 5 Jln. Ampang milik A. Rahman dll. dan lain-lain.")
+    assert len(sentences) == 1
+    sentences, _ = split_sentences("Harga naik 5.5 peratus... tetapi jualan stabil. Baik.")
+    assert sentences == ["Harga naik 5.5 peratus... tetapi jualan stabil.", "Baik."]
+
+
+@pytest.mark.asyncio
+async def test_short_texts_are_not_chunked():
+    """Test that texts under the threshold go to the model whole."""
+    calls = []
+
+    async def run_one(text):
+        calls.append(text)
+        return text.upper()
+
+    assert await run_chunked("tool", "Satu. Dua.", run_one) == "SATU. DUA."
+    assert calls == ["Satu. Dua."]
+
+
+@pytest.mark.asyncio
+async def test_long_texts_run_per_sentence_with_cache(monkeypatch):
+    """Test per-sentence calls, de-duplication, caching and reassembly."""
+    monkeypatch.setenv("SENTENCE_CHUNK_MIN_CHARS", "50")
+    calls = []
+
+    async def run_one(text):
+        calls.append(text)
+        return f"<{text}> "
+
+    result = await run_chunked("tool", DOCUMENT, run_one, key=("ms", "en"))
+    assert result == (
+        "<Dr. Ali tiba di pejabat pada pukul lapan pagi.>  <Dia membuka komputer!>\n\n"
+        "<Mesyuarat bermula pada jam sembilan.> <\"Semua hadir?\" tanya pengerusi.>\n"
+        "<Mesyuarat bermula pada jam sembilan.>\n"
+    )
+    assert len(calls) == 4
+
+    assert await run_chunked("tool", DOCUMENT, run_one, key=("ms", "en")) == result
+    assert len(calls) == 4
+    assert cache_stats()["tool/sentences"]["hits"] == 4
+
+    await run_chunked("tool", DOCUMENT, run_one, key=("en", "ms"))
+    assert len(calls) == 8
+
+
+@pytest.mark.asyncio
+async def test_sentence_cache_follows_tool_cache_setting(monkeypatch):
+    """Test that a tool with caching disabled gets no sentence cache either."""
+    monkeypatch.setenv("SENTENCE_CHUNK_MIN_CHARS", "50")
+    calls = []
+
+    async def run_one(text):
+        calls.append(text)
+        return text
+
+    set_cache_enabled("nocache", False)
+    try:
+        await run_chunked("nocache", DOCUMENT, run_one)
+        await run_chunked("nocache", DOCUMENT, run_one)
+    finally:
+        set_cache_enabled("nocache", True)
+    assert len(calls) == 8
+    assert "nocache/sentences" not in cache_stats()
+
+
+@pytest.mark.asyncio
+async def test_translate_batches_sentences_of_long_documents(monkeypatch):
+    """Test that a long translate request becomes one batched model call."""
+    monkeypatch.setenv("SENTENCE_CHUNK_MIN_CHARS", "50")
+    model = MockModel()
+    model.translate = MagicMock(side_effect=MockModel().translate)
+    with patch("server.get_translation_model", return_value=model):
+        result = await server.tools.run("translate", {"text": DOCUMENT, "target_lang": "en"})
+    assert result["translation"].startswith(
+        "translated: Dr. Ali tiba di pejabat pada pukul lapan pagi.  translated: Dia membuka"
+    )
+    assert result["translation"].count("\n") == DOCUMENT.count("\n")
+    model.translate.assert_called_once()
+    assert len(model.translate.call_args.args[0]) == 4
+    assert batch_stats()["translation_ms_en"]["largest_batch"] >= 4
+
+
+@pytest.mark.asyncio
+async def test_stream_sentences_reports_pieces_in_order(monkeypatch):
+    """Test that a listener gets every sentence in order, first one on its own."""
+    monkeypatch.setenv("SENTENCE_CHUNK_MIN_CHARS", "50")
+    text = "  " + " ".join(f"Ayat nombor {n}." for n in range(7)) + "\n"
+    calls = []
+
+    async def run_one(sentence):
+        calls.append(sentence)
+        return sentence.upper()
+
+    received = []
+
+    async def listener(index, total, piece):
+        received.append((index, total, piece, len(calls)))
+
+    with stream_sentences(listener):
+        result = await run_chunked("tool", text, run_one)
+    assert "".join(piece for _, _, piece, _ in received) == result == text.upper()
+    assert [index for index, *_ in received] == list(range(7))
+    assert {total for _, total, _, _ in received} == {7}
+    # Windows of 1, 2 and 4 sentences: the first piece is sent after one model call.
+    assert [calls for *_, calls in received] == [1, 3, 3, 7, 7, 7, 7]
+
+    received.clear()
+    result = await run_chunked("tool", text, run_one)
+    assert received == []
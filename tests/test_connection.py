@@ -0,0 +1,149 @@
+"""
+Tests for the load generator in test_connection.py
+"""
+import json
+import os
+import subprocess
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.modules.setdefault('malaya', MagicMock())
+
+import test_connection
+from benchmark import FakeLatency, fake_malaya, local_server
+from cache import clear_caches
+from test_connection import (
+    compare_to_baseline, load_requests, ramp_levels, run_load, saturation_point,
+    saturation_reason,
+)
+
+
+def stage(concurrency, rps, p99=50.0, error_rate=0.0):
+    return {
+        "transport": "http", "tool": "translate", "concurrency": concurrency,
+        "throughput_rps": rps, "error_rate": error_rate, "errors": 0,
+        "latency_ms": {"p50": p99 / 2, "p95": p99, "p99": p99},
+    }
+
+
+def test_ramp_levels():
+    """Test geometric ramps, including factors too small to reach the next integer."""
+    assert ramp_levels(1, 64) == [1, 2, 4, 8, 16, 32, 64]
+    assert ramp_levels(4, 20, 2) == [4, 8, 16]
+    assert ramp_levels(1, 3, 1.2) == [1, 2, 3]
+    assert ramp_levels(8, 4) == []
+
+
+def test_load_requests_from_synthetic_text_and_recorded_corpora(tmp_path):
+    """Test the three corpus kinds the load generator replays."""
+    synthetic = load_requests(["detect_language", "term_lookup"])
+    assert [name for name, _ in synthetic[:4]] == [
+        "detect_language", "term_lookup", "detect_language", "term_lookup",
+    ]
+    assert "text" in synthetic[0][1] and "term" in synthetic[1][1]
+
+    texts = tmp_path / "texts.txt"
+    texts.write_text("Saya suka makan.\n\nDia pergi kerja.\n", encoding="utf-8")
+    assert load_requests(["translate"], str(texts)) == [
+        ("translate", {"text": "Saya suka makan.", "source_lang": "ms", "target_lang": "en"}),
+        ("translate", {"text": "Dia pergi kerja.", "source_lang": "ms", "target_lang": "en"}),
+    ]
+
+    recorded = tmp_path / "traffic.jsonl"
+    recorded.write_text(
+        json.dumps({"name": "rewrite_style", "arguments": {"text": "Hai", "style": "casual"}})
+        + "\n" + json.dumps({"name": "detect_language", "arguments": {"text": "Hello"}}) + "\n",
+        encoding="utf-8",
+    )
+    assert load_requests(["translate"], str(recorded)) == [
+        ("rewrite_style", {"text": "Hai", "style": "casual"}),
+        ("detect_language", {"text": "Hello"}),
+    ]
+
+
+def test_saturation_detection():
+    """Test the knee on throughput, error rate and the latency SLO."""
+    scaling = [stage(1, 10), stage(2, 19), stage(4, 36)]
+    assert saturation_reason(scaling) is None
+    assert saturation_point(scaling, None)["concurrency"] == 4
+
+    flat = scaling + [stage(8, 38)]
+    reason = saturation_reason(flat)
+    assert reason.startswith("throughput grew less than 10%")
+    assert saturation_point(flat, reason)["concurrency"] == 8
+
+    failing = scaling + [stage(8, 70, error_rate=0.2)]
+    reason = saturation_reason(failing)
+    assert reason.startswith("error rate 20.0%")
+    assert saturation_point(failing, reason)["concurrency"] == 4
+
+    slow = scaling + [stage(8, 70, p99=900.0)]
+    assert saturation_reason(slow) is None
+    assert saturation_reason(slow, slo_p99_ms=500).startswith("p99 900ms")
+
+
+def test_compare_to_baseline():
+    """Test per-stage and peak-throughput regressions."""
+    baseline = {"stages": [stage(1, 10), stage(2, 20), stage(4, 40)]}
+    assert compare_to_baseline(baseline, {"stages": [stage(1, 10), stage(2, 19)]}) == [
+        "peak throughput 40 -> 19 req/s",
+    ]
+    slower = {"stages": [stage(1, 10), stage(2, 20, p99=80.0), stage(4, 41)]}
+    assert compare_to_baseline(baseline, slower, tolerance=0.15) == [
+        "http/translate/2: p95 latency 50.0 -> 80.0 ms",
+        "http/translate/2: p99 latency 50.0 -> 80.0 ms",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_run_load_against_a_local_server():
+    """Test a short ramp through /tools/execute with pooled connections."""
+    clear_caches()
+    requests = load_requests(["detect_language", "translate"])
+    with fake_malaya(FakeLatency(call_ms=2, item_ms=0, char_ms=0, load_ms=0)):
+        async with local_server() as url:
+            result = await run_load(url, requests, [1, 2], 0.2, warmup=2, min_gain=-1.0)
+    clear_caches()
+    stages = result["stages"]
+    assert [s["concurrency"] for s in stages] == [1, 2]
+    for s in stages:
+        assert s["requests"] > 0 and s["errors"] == 0 and s["statuses"] == {"200": s["requests"]}
+        assert s["tool"] == "detect_language+translate"
+    assert result["saturation"]["concurrency"] in (1, 2)
+
+
+def test_load_mode_writes_report_and_gates(tmp_path, monkeypatch):
+    """Test --load end to end with the ramp stubbed: report, baseline and exit status."""
+    stages = [stage(1, 10), stage(2, 20)]
+
+    async def fake_run_load(url, requests, levels, seconds, **kwargs):
+        assert levels == [1, 2] and seconds == 0.5
+        return {"stages": stages, "saturation": saturation_point(stages, None)}
+
+    monkeypatch.setattr(test_connection, "run_load", fake_run_load)
+    monkeypatch.setattr(test_connection, "test_health", lambda url: True)
+    report = tmp_path / "report.json"
+    args = ["http://localhost:8000/", "--load", "--max-concurrency", "2",
+            "--stage-seconds", "0.5", "-o", str(report)]
+    with pytest.raises(SystemExit) as exit_info:
+        test_connection.main(args)
+    assert exit_info.value.code == 0
+    written = json.loads(report.read_text(encoding="utf-8"))
+    assert written["url"] == "http://localhost:8000" and written["stages"] == stages
+
+    written["stages"][1]["throughput_rps"] = 40
+    report.write_text(json.dumps(written), encoding="utf-8")
+    with pytest.raises(SystemExit) as exit_info:
+        test_connection.main(args[:-2] + ["--baseline", str(report)])
+    assert exit_info.value.code == 1
+
+
+def test_connection_check_does_not_import_the_server():
+    """Test that test_connection.py runs against a remote server without server or httpx."""
+    code = ("import sys, test_connection; "
+            "print(sorted({'server', 'benchmark', 'httpx'} & set(sys.modules)))")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            check=True, cwd=os.path.dirname(os.path.dirname(__file__)))
+    assert result.stdout.strip() == "[]"
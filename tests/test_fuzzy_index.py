@@ -0,0 +1,125 @@
+"""
+Tests for the fuzzy term index
+"""
+import json
+import os
+import random
+import sys
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.modules.setdefault('malaya', MagicMock())
+
+import fuzzy_index
+import glossary
+from fuzzy_index import FuzzyIndex, edit_distance, read_vocabulary
+
+VOCABULARY = {"makan": 50, "makanan": 20, "minum": 30, "mandi": 10, "rumah": 40, "tidak": 90}
+
+
+@pytest.fixture
+def fresh_fuzzy_index(monkeypatch):
+    """Reset the shared index so get_fuzzy_index reads the environment again."""
+    monkeypatch.setattr(fuzzy_index, "_fuzzy_index", None)
+    monkeypatch.setattr(fuzzy_index, "_fuzzy_index_checked", False)
+    yield
+    fuzzy_index.set_fuzzy_index(None)
+
+
+def test_edit_distance():
+    """Test optimal string alignment distance with a cut-off."""
+    assert edit_distance("makan", "makan", 2) == 0
+    assert edit_distance("mkan", "makan", 2) == 1
+    assert edit_distance("amkan", "makan", 2) == 1
+    assert edit_distance("rmuah", "rumah", 2) == 1
+    assert edit_distance("abc", "xyz", 2) == 3
+    assert edit_distance("a", "abcdef", 2) == 3
+
+
+def test_lookup_finds_nearest_words():
+    """Test that typos resolve to the closest, most frequent headwords."""
+    index = FuzzyIndex(VOCABULARY)
+    assert index.best("makna")["word"] == "makan"
+    assert index.best("Rumh") == {"word": "rumah", "distance": 1, "count": 40}
+    assert index.best("mkan")["word"] == "makan"
+    assert index.best("makan")["distance"] == 0
+    assert index.best("xyzzy") is None
+    assert [m["word"] for m in index.lookup("makan", max_distance=2, limit=3)] == ["makan"]
+    assert [m["word"] for m in index.lookup("makanx")][:2] == ["makan", "makanan"]
+
+
+def test_accepted_distance_grows_with_term_length():
+    """Test that short words are not matched to unrelated words a few edits away."""
+    index = FuzzyIndex({"itu": 1, "rumah": 1, "tidak": 1, "sekolah": 1})
+    assert fuzzy_index.allowed_distance("ini", 2) == 0
+    assert fuzzy_index.allowed_distance("rumh", 2) == 1
+    assert fuzzy_index.allowed_distance("rumahku", 2) == 2
+    assert index.best("ini") is None
+    assert index.best("tdk") is None
+    assert index.best("tidk")["distance"] == 1
+    assert index.best("rumahku") == {"word": "rumah", "distance": 2, "count": 1}
+    assert [m["word"] for m in index.lookup("ini")] == ["itu"]
+
+
+def test_saved_index_is_json(tmp_path):
+    """Test that the saved index is plain JSON and a foreign file is ignored."""
+    path = tmp_path / "fuzzy.json"
+    FuzzyIndex(VOCABULARY).save(str(path))
+    assert json.loads(path.read_text(encoding="utf-8"))["words"]["makan"] == 50
+    path.write_bytes(b"\x80\x04not json")
+    assert FuzzyIndex.load(str(path)) is None
+
+
+def test_lookup_is_sub_millisecond():
+    """Test lookup speed over a vocabulary of synthetic words."""
+    rng = random.Random(0)
+    words = {"".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(5, 12))): 1
+             for _ in range(20000)}
+    queries = [word[:2] + word[3:] for word in list(words)[:200]]
+    index = FuzzyIndex(words)
+    start = time.perf_counter()
+    for query in queries:
+        assert index.best(query) is not None
+    assert (time.perf_counter() - start) / len(queries) < 0.001
+
+
+def test_save_and_load_round_trip(tmp_path):
+    """Test that a saved index loads only for the source it was built from."""
+    path = str(tmp_path / "fuzzy.json")
+    FuzzyIndex(VOCABULARY).save(path, source=("vocab.txt", 1))
+    loaded = FuzzyIndex.load(path, source=("vocab.txt", 1))
+    assert loaded.best("minm")["word"] == "minum"
+    assert FuzzyIndex.load(path, source=("vocab.txt", 2)) is None
+    assert FuzzyIndex.load(str(tmp_path / "missing.json")) is None
+
+
+def test_shared_index_is_built_once_and_reused(tmp_path, monkeypatch, fresh_fuzzy_index):
+    """Test that the shared index is saved and reloaded instead of rebuilt."""
+    vocabulary = tmp_path / "vocab.txt"
+    vocabulary.write_text("makan\t5\nminum\n", encoding="utf-8")
+    saved = tmp_path / "fuzzy.json"
+    monkeypatch.setenv("FUZZY_VOCABULARY_PATH", str(vocabulary))
+    monkeypatch.setenv("FUZZY_INDEX_PATH", str(saved))
+    assert read_vocabulary(str(vocabulary)) == {"makan": 5, "minum": 1}
+
+    assert fuzzy_index.get_fuzzy_index().best("makn")["word"] == "makan"
+    assert os.path.exists(saved)
+
+    monkeypatch.setattr(fuzzy_index, "_fuzzy_index_checked", False)
+    monkeypatch.setattr(FuzzyIndex, "__init__", MagicMock(side_effect=AssertionError("rebuilt")))
+    assert fuzzy_index.get_fuzzy_index().best("minm")["word"] == "minum"
+
+
+def test_vocabulary_defaults_to_glossary(tmp_path, monkeypatch, fresh_fuzzy_index):
+    """Test that glossary headwords are used when no vocabulary is configured."""
+    path = str(tmp_path / "glossary.idx")
+    glossary.build_index([{"term": "sekolah", "translation": "school"}], path)
+    monkeypatch.delenv("FUZZY_VOCABULARY_PATH", raising=False)
+    monkeypatch.setenv("FUZZY_INDEX_PATH", str(tmp_path / "fuzzy.json"))
+    glossary.set_glossary(glossary.GlossaryIndex(path))
+    try:
+        assert fuzzy_index.get_fuzzy_index().best("skolah")["word"] == "sekolah"
+    finally:
+        glossary.set_glossary(None)
@@ -0,0 +1,132 @@
+"""
+Tests for the glossary index
+"""
+import sys
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.modules.setdefault('malaya', MagicMock())
+
+import glossary
+from glossary import GlossaryIndex, build_index, read_term_list, root_candidates
+
+TERMS = [
+    {"term": "makan", "translation": "eat", "definition": "memasukkan makanan ke dalam mulut"},
+    {"term": "makanan", "translation": "food"},
+    {"term": "makmal", "translation": "laboratory"},
+    {"term": "tulis", "translation": "write"},
+    {"term": "Rumah", "translation": "house"},
+    {"term": "minum", "translation": "drink"},
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = str(tmp_path / "glossary.idx")
+    build_index(TERMS, path)
+    index = GlossaryIndex(path)
+    yield index
+    index.close()
+
+
+def test_exact_lookup_is_case_insensitive(index):
+    """Test exact matches, including upper-case headwords and misses."""
+    assert len(index) == len(TERMS)
+    assert index.exact("makan")["definition"].startswith("memasukkan")
+    assert index.exact("RUMAH") == {"term": "Rumah", "translation": "house"}
+    assert index.exact("maka") is None
+    assert index.exact("zzz") is None
+
+
+def test_lemma_lookup_strips_affixes(index):
+    """Test that affixed words resolve to their root entries."""
+    assert index.lookup("makanan")["match"] == "exact"
+    assert index.lookup("dimakan") == dict(TERMS[0], match="lemma")
+    assert index.lookup("menulis")["term"] == "tulis"
+    assert index.lookup("minumlah")["translation"] == "drink"
+    assert index.lookup("terbang") is None
+
+
+def test_prefix_lookup(index):
+    """Test listing headwords that share a prefix, in order."""
+    assert [e["term"] for e in index.prefix("mak")] == ["makan", "makanan", "makmal"]
+    assert [e["term"] for e in index.prefix("mak", limit=1)] == ["makan"]
+    assert index.prefix("x") == []
+
+
+def test_root_candidates():
+    """Test root word candidates for common Malay affixes."""
+    assert root_candidates("Makanan")[:2] == ["makanan", "makan"]
+    assert "sapu" in root_candidates("menyapu")
+    assert "pukul" in root_candidates("memukul")
+    assert root_candidates("membaca")[1] == "baca"
+    assert root_candidates("mengecat")[1] == "cat"
+
+
+def test_lemma_follows_nasal_prefix_rules(tmp_path):
+    """Test that me-/mem- are told apart by the root's first letter."""
+    path = str(tmp_path / "nasal.idx")
+    build_index([
+        {"term": "akan", "translation": "will"},
+        {"term": "makan", "translation": "eat"},
+        {"term": "pasak", "translation": "peg"},
+        {"term": "masak", "translation": "cook"},
+        {"term": "pukul", "translation": "hit"},
+    ], path)
+    index = GlossaryIndex(path)
+    try:
+        assert index.lookup("memakan")["term"] == "makan"
+        assert index.lookup("memasak")["term"] == "masak"
+        assert index.lookup("memukul")["term"] == "pukul"
+        assert index.lookup("pemakan")["term"] == "makan"
+    finally:
+        index.close()
+
+
+def test_lookup_is_fast(tmp_path):
+    """Test that lookups in a large index stay in the microsecond range."""
+    path = str(tmp_path / "large.idx")
+    build_index(({"term": f"istilah{i}", "translation": f"term {i}"} for i in range(50000)), path)
+    index = GlossaryIndex(path)
+    try:
+        start = time.perf_counter()
+        for i in range(1000):
+            assert index.exact(f"istilah{i * 7}") is not None
+        assert (time.perf_counter() - start) / 1000 < 0.001
+    finally:
+        index.close()
+
+
+def test_build_command(tmp_path):
+    """Test building an index from a TSV term list on the command line."""
+    terms = tmp_path / "terms.tsv"
+    terms.write_text("term\ttranslation\tdefinition\nbuku\tbook\tlembaran bercetak\n",
+                     encoding="utf-8")
+    output = tmp_path / "out.idx"
+    assert glossary.main(["build", str(terms), "-o", str(output)]) == 0
+    index = GlossaryIndex(str(output))
+    try:
+        assert index.exact("buku")["translation"] == "book"
+    finally:
+        index.close()
+
+    bad = tmp_path / "bad.csv"
+    bad.write_text("word\nbuku\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        read_term_list(str(bad))
+
+
+def test_missing_or_invalid_index_disables_glossary(tmp_path, monkeypatch):
+    """Test that the shared glossary is None without a usable index file."""
+    monkeypatch.setenv("GLOSSARY_PATH", str(tmp_path / "missing.idx"))
+    monkeypatch.setattr(glossary, "_glossary_checked", False)
+    monkeypatch.setattr(glossary, "_glossary", None)
+    assert glossary.get_glossary() is None
+
+    invalid = tmp_path / "invalid.idx"
+    invalid.write_bytes(b"not an index at all")
+    monkeypatch.setenv("GLOSSARY_PATH", str(invalid))
+    monkeypatch.setattr(glossary, "_glossary_checked", False)
+    assert glossary.get_glossary() is None
@@ -0,0 +1,291 @@
+"""
+Tests for the MalayLanguage HTTP server
+"""
+import asyncio
+import json
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Mock malaya module before importing the server
+sys.modules.setdefault('malaya', MagicMock())
+
+from starlette.testclient import TestClient
+
+import http_server
+from cache import clear_caches
+
+
+@pytest.fixture
+def client():
+    """HTTP test client without running the startup warm-up."""
+    clear_caches()
+    yield TestClient(http_server.http_app)
+    clear_caches()
+
+
+def test_health(client):
+    """Test that liveness does not depend on models."""
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json()["status"] == "healthy"
+
+
+@pytest.mark.asyncio
+async def test_ready_after_warmup(client, mock_models):
+    """Test that /ready returns 503 until warm-up has run a test inference."""
+    http_server._readiness.update(ready=False, models=["language_detection"], warmed={})
+    assert client.get("/ready").status_code == 503
+
+    await http_server.run_warmup(["language_detection", "translation_ms_en"])
+
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert set(response.json()["warmed"]) == {"language_detection", "translation_ms_en"}
+
+
+@pytest.mark.asyncio
+async def test_warmup_rejects_unknown_model(client):
+    """Test that an unknown warm-up key is reported instead of marking ready."""
+    with patch("http_server.asyncio.sleep", side_effect=RuntimeError("stop")):
+        with pytest.raises(RuntimeError, match="stop"):
+            await http_server.run_warmup(["no_such_model"], retry_delay=0)
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert "Unknown model key" in response.json()["error"]
+
+
+def test_models_endpoint(client):
+    """Test that /models reports loaded models and the memory budget."""
+    body = client.get("/models").json()
+    assert "models" in body
+    assert "loaded_mb" in body
+
+
+def test_execute_unknown_tool(client):
+    """Test that /tools/execute rejects unknown tools."""
+    response = client.post("/tools/execute", json={"name": "no_such_tool", "arguments": {}})
+    assert response.status_code == 400
+
+
+def test_batch_items_in_order_with_per_item_errors(client, mock_models):
+    """Test that a mixed batch returns ordered results and isolates failures."""
+    response = client.post("/tools/batch", json={"items": [
+        {"name": "translate", "arguments": {"text": "Selamat pagi"}},
+        {"name": "no_such_tool", "arguments": {}},
+        {"name": "apply_glossary", "arguments": {"term": "makan"}},
+        {"name": "detect_language", "arguments": {"text": ""}},
+    ]})
+    assert response.status_code == 200
+    body = response.json()
+    results = body["results"]
+    assert [r["index"] for r in results] == [0, 1, 2, 3]
+    assert "translated: Selamat pagi" in results[0]["result"][0]["text"]
+    assert results[1]["error"] == "Unknown tool: no_such_tool"
+    assert "Glossary Lookup: makan" in results[2]["result"][0]["text"]
+    assert "Empty or whitespace-only" in results[3]["error"]
+    assert body["errors"] == 2
+
+
+def test_batch_texts_use_batched_model_calls(client, mock_models):
+    """Test that one tool over many texts reaches the model in batches."""
+    batch_sizes = []
+    model = mock_models["language"].return_value
+    original = model.predict
+
+    def recording_predict(texts):
+        batch_sizes.append(len(texts))
+        return original(texts)
+
+    model.predict = recording_predict
+    texts = [f"teks {i}" for i in range(10)]
+    response = client.post("/tools/batch", json={"name": "detect_language", "texts": texts})
+    results = response.json()["results"]
+    assert len(results) == 10
+    assert all("Language: malay" in r["result"][0]["text"] for r in results)
+    assert max(batch_sizes) > 1
+
+
+def test_batch_rejects_oversized_and_malformed_bodies(client, monkeypatch):
+    """Test batch size limits and body validation."""
+    monkeypatch.setenv("BATCH_MAX_ITEMS", "2")
+    response = client.post("/tools/batch", json={"name": "translate", "texts": ["a", "b", "c"]})
+    assert response.status_code == 413
+    assert client.post("/tools/batch", json={"texts": ["a"]}).status_code == 400
+    assert client.post("/tools/batch", json={"items": "a"}).status_code == 400
+
+
+@pytest.mark.parametrize("path", ["/tools/batch", "/tools/execute"])
+@pytest.mark.parametrize("body", [b"[1, 2]", b'"text"', b"3", b"null"])
+def test_non_object_bodies_are_rejected(client, path, body):
+    """Test that a JSON body that is not an object is a 400, not a 500."""
+    response = client.post(path, content=body, headers={"Content-Type": "application/json"})
+    assert response.status_code == 400
+    assert "JSON object" in response.json()["error"]
+
+
+def test_execute_rejects_invalid_json_and_arguments(client):
+    """Test that broken JSON and non-object arguments are client errors."""
+    response = client.post("/tools/execute", content=b"{not json",
+                           headers={"Content-Type": "application/json"})
+    assert response.status_code == 400
+    response = client.post("/tools/execute", json={"name": "translate", "arguments": ["x"]})
+    assert response.status_code == 400
+
+
+def test_stream_text_lines(client, mock_models):
+    """Test streaming a plain-text corpus through a tool as NDJSON."""
+    body = "Saya SUKA Makanan\n\nsy x tau\n"
+    with patch("server.get_rule_normalizer", return_value=None):
+        response = client.post(
+            "/tools/stream?tool=normalize_malay",
+            content=body.encode(),
+            headers={"Content-Type": "text/plain"},
+        )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["line"] for r in records] == [1, 3]
+    assert "Normalized: saya suka makanan" in records[0]["result"][0]["text"]
+
+
+def test_stream_ndjson_arguments_and_errors(client, mock_models):
+    """Test NDJSON input with fixed query arguments and per-line errors."""
+    lines = [
+        json.dumps("Hello"),
+        json.dumps({"text": "Good morning", "target_lang": "ms"}),
+        "not json",
+        json.dumps({"text": "Hello", "source_lang": "ms"}),
+    ]
+    response = client.post(
+        "/tools/stream?tool=translate&source_lang=en&target_lang=ms",
+        content="\n".join(lines).encode(),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["line"] for r in records] == [1, 2, 3, 4]
+    assert "translated: Hello" in records[0]["result"][0]["text"]
+    assert "Translation (Malay)" in records[1]["result"][0]["text"]
+    assert "error" in records[2]
+    assert "Source and target languages must be different" in records[3]["error"]
+
+
+def test_stream_requires_known_tool(client):
+    """Test that the stream endpoint validates the tool before reading the body."""
+    assert client.post("/tools/stream", content=b"a").status_code == 400
+    assert client.post("/tools/stream?tool=nope", content=b"a").status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_idle_eviction_runs_without_traffic():
+    """Test that the background loop evicts idle models on its own."""
+    calls = []
+    with patch("http_server.evict_idle_models", side_effect=lambda: calls.append(1) or []):
+        task = asyncio.create_task(http_server.run_idle_eviction(0.01))
+        await asyncio.sleep(0.05)
+        task.cancel()
+    assert len(calls) >= 2
+
+
+def test_http_worker_count(monkeypatch):
+    """Test worker count parsing from HTTP_WORKERS and WEB_CONCURRENCY."""
+    monkeypatch.delenv("HTTP_WORKERS", raising=False)
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    assert http_server.http_worker_count() == 1
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    assert http_server.http_worker_count() == 3
+    monkeypatch.setenv("HTTP_WORKERS", "4")
+    assert http_server.http_worker_count() == 4
+    monkeypatch.setenv("HTTP_WORKERS", "0")
+    monkeypatch.delenv("WEB_CONCURRENCY")
+    assert http_server.http_worker_count() == 1
+
+
+def test_parse_smaps_rollup():
+    """Test memory figures parsed from a sample smaps_rollup."""
+    sample = """00400000-7ffd5a1f2000 ---p 00000000 00:00 0                          [rollup]
+Rss:              512000 kB
+Pss:              204800 kB
+Shared_Clean:     409600 kB
+Shared_Dirty:       1024 kB
+Private_Clean:      2048 kB
+Private_Dirty:     99328 kB
+Swap:                  0 kB
+""".splitlines()
+    assert http_server.parse_smaps_rollup(sample) == {
+        "rss_mb": 500.0,
+        "pss_mb": 200.0,
+        "shared_mb": 401.0,
+        "private_mb": 99.0,
+    }
+
+
+def test_restart_delay_backs_off():
+    """Test exponential restart backoff for workers that keep crashing."""
+    delays = [http_server.restart_delay(streak) for streak in range(9)]
+    assert delays[:5] == [0.0, 1.0, 2.0, 4.0, 8.0]
+    assert delays[-1] == 60.0
+
+
+def test_execute_json_format_returns_payload(client, mock_models):
+    """Test that format=json returns the structured payload instead of text."""
+    response = client.post("/tools/execute", json={
+        "name": "detect_language", "arguments": {"text": "Selamat pagi"}, "format": "json",
+    })
+    assert response.status_code == 200
+    assert response.json()["result"] == {"text": "Selamat pagi", "label": "malay", "score": 0.95}
+
+    response = client.post("/tools/execute?format=json", json={
+        "name": "translate", "arguments": {"text": ""},
+    })
+    assert "Empty" in response.json()["result"]["error"]
+
+    response = client.post("/tools/execute", json={"name": "translate", "format": "xml"})
+    assert response.status_code == 400
+
+
+def test_batch_and_stream_json_format(client, mock_models):
+    """Test structured payloads from the batch and stream endpoints."""
+    response = client.post("/tools/batch", json={
+        "name": "translate", "texts": ["Selamat pagi", ""], "format": "json",
+    })
+    results = response.json()["results"]
+    assert results[0]["result"]["translation"] == "translated: Selamat pagi"
+    assert "Empty" in results[1]["error"]
+
+    with patch("server.get_rule_normalizer", return_value=None):
+        response = client.post(
+            "/tools/stream?tool=normalize_malay&format=json",
+            content=b"SY X TAU\n",
+            headers={"Content-Type": "text/plain"},
+        )
+    record = json.loads(response.text.splitlines()[0])
+    assert record == {
+        "line": 1, "result": {"text": "SY X TAU", "normalized": "sy x tau", "path": "model"},
+    }
+
+
+def test_execute_stream_sends_sentences_then_result(client, mock_models, monkeypatch):
+    """Test incremental NDJSON output for a long translate request."""
+    monkeypatch.setenv("SENTENCE_CHUNK_MIN_CHARS", "20")
+    text = "Selamat pagi semua. Apa khabar?\nSaya sihat."
+    response = client.post("/tools/execute", json={
+        "name": "translate", "arguments": {"text": text}, "stream": True, "format": "json",
+    })
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["index"] for r in records[:-1]] == [0, 1, 2]
+    pieces = "".join(r["text"] for r in records[:-1])
+    assert pieces == records[-1]["result"]["translation"]
+    assert pieces.startswith("translated: Selamat pagi semua. translated: Apa khabar?\n")
+
+    response = client.post("/tools/execute?stream=1", json={
+        "name": "detect_language", "arguments": {"text": "Selamat pagi"},
+    })
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert len(records) == 1 and "Language: malay" in records[0]["result"][0]["text"]
+
+    response = client.post("/tools/execute", json={"name": "nope", "stream": True})
+    assert response.status_code == 400
@@ -0,0 +1,139 @@
+"""
+Tests for the inference executor
+"""
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from inference import InferenceExecutor, parse_model_limits
+from metrics import MODEL_INFERENCE, reset_metrics
+
+
+def test_parse_model_limits():
+    """Test parsing per-model concurrency limits."""
+    assert parse_model_limits("paraphrase=1, translation_ms_en=2,") == {
+        "paraphrase": 1,
+        "translation_ms_en": 2,
+    }
+    assert parse_model_limits("") == {}
+
+
+def test_parse_model_limits_invalid():
+    """Test that malformed limits are rejected."""
+    with pytest.raises(ValueError):
+        parse_model_limits("paraphrase")
+    with pytest.raises(ValueError):
+        parse_model_limits("paraphrase=0")
+
+
+def test_from_env(monkeypatch):
+    """Test building the executor from environment variables."""
+    monkeypatch.setenv("INFERENCE_EXECUTOR", "process")
+    monkeypatch.setenv("INFERENCE_MAX_WORKERS", "3")
+    monkeypatch.setenv("MODEL_CONCURRENCY", "paraphrase=1")
+    executor = InferenceExecutor.from_env()
+    assert executor.kind == "process"
+    assert executor.max_workers == 3
+    assert executor.limit_for("paraphrase") == 1
+    assert executor.limit_for("language_detection") == 1
+
+
+def test_default_limit_leaves_workers_for_other_models():
+    """Test that one model cannot take every pool worker by default."""
+    assert InferenceExecutor(max_workers=8).limit_for("paraphrase") == 4
+    assert InferenceExecutor(max_workers=1).limit_for("paraphrase") == 1
+
+
+def test_unknown_executor_kind():
+    """Test that an unknown executor kind is rejected."""
+    with pytest.raises(ValueError):
+        InferenceExecutor(kind="gpu")
+
+
+@pytest.mark.asyncio
+async def test_event_loop_stays_responsive():
+    """Test that a blocking model call does not stall the event loop."""
+    executor = InferenceExecutor(max_workers=2)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    task = asyncio.create_task(ticker())
+    try:
+        assert await executor.run("slow", time.sleep, 0.2) is None
+    finally:
+        task.cancel()
+        executor.shutdown()
+    assert ticks >= 5
+
+
+@pytest.mark.asyncio
+async def test_per_model_concurrency_limit():
+    """Test that calls for one model never exceed its concurrency limit."""
+    executor = InferenceExecutor(max_workers=4, model_concurrency={"paraphrase": 1})
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+
+    def work():
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.02)
+        with lock:
+            active -= 1
+
+    try:
+        await asyncio.gather(*(executor.run("paraphrase", work) for _ in range(4)))
+    finally:
+        executor.shutdown()
+    assert peak == 1
+
+
+@pytest.mark.asyncio
+async def test_model_calls_are_timed_per_model():
+    """Test that each call's model time is observed under its model key."""
+    reset_metrics()
+    executor = InferenceExecutor(max_workers=2)
+    try:
+        await executor.run("paraphrase", time.sleep, 0.01)
+        await executor.run("translation_ms_en", time.sleep, 0)
+        await executor.run("translation_ms_en", time.sleep, 0)
+    finally:
+        executor.shutdown()
+    assert MODEL_INFERENCE.count("paraphrase") == 1
+    assert MODEL_INFERENCE.count("translation_ms_en") == 2
+    assert 'malaya_model_inference_seconds_bucket{model="paraphrase",le="0.01"} 0' in (
+        MODEL_INFERENCE.render()
+    )
+
+
+@pytest.mark.asyncio
+async def test_run_on_all_workers_reaches_every_process():
+    """Test that process-mode warm-up runs in each worker process."""
+    executor = InferenceExecutor(kind="process", max_workers=2)
+    try:
+        pids = await executor.run_on_all_workers(os.getpid)
+        assert len(set(pids)) == 2
+        assert os.getpid() not in pids
+        assert await executor.run("test", os.getpid) in pids
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_run_on_all_workers_with_threads_runs_once():
+    """Test that thread mode runs the call once in this process."""
+    executor = InferenceExecutor(max_workers=2)
+    try:
+        assert await executor.run_on_all_workers(os.getpid) == [os.getpid()]
+    finally:
+        executor.shutdown()
@@ -0,0 +1,125 @@
+"""
+Tests for Prometheus metrics
+"""
+import asyncio
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+sys.modules.setdefault('malaya', MagicMock())
+
+from starlette.testclient import TestClient
+
+import http_server
+import metrics
+from batching import MicroBatcher
+from cache import clear_caches
+from metrics import Counter, Histogram, Sampled, collect_phases, current_phases, render_metrics
+from tests.conftest import MockModel
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    """Start every test with empty counters and caches."""
+    metrics.reset_metrics()
+    clear_caches()
+    yield
+    metrics.reset_metrics()
+    clear_caches()
+
+
+def test_counter_and_histogram_exposition():
+    """Test the Prometheus text format for counters and cumulative histograms."""
+    counter = Counter("requests_total", "Requests.", ("tool",))
+    counter.inc("translate")
+    counter.inc("translate", amount=2)
+    counter.inc('say "hi"\n')
+    histogram = Histogram("latency_seconds", "Latency.", ("tool",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "translate")
+    gauge = Sampled("loaded", "Loaded.", ("model",), lambda: [(("paraphrase",), 1)])
+
+    text = render_metrics([counter, histogram, gauge])
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{tool="translate"} 3' in text
+    assert 'requests_total{tool="say \\"hi\\"\\n"} 1' in text
+    assert 'latency_seconds_bucket{tool="translate",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{tool="translate",le="1.0"} 3' in text
+    assert 'latency_seconds_bucket{tool="translate",le="+Inf"} 4' in text
+    assert 'latency_seconds_sum{tool="translate"} 3.65' in text
+    assert 'latency_seconds_count{tool="translate"} 4' in text
+    assert "# TYPE loaded gauge\n" in text and 'loaded{model="paraphrase"} 1' in text
+
+
+def test_collect_phases_merges_into_enclosing_collection():
+    """Test nested phase collections and batch-local ones."""
+    assert current_phases() is None
+    with collect_phases() as outer:
+        with collect_phases() as inner:
+            metrics.add_phases(current_phases(), {"inference": 0.5})
+        with collect_phases(merge=False):
+            metrics.add_phases(current_phases(), {"inference": 9.0})
+        metrics.add_phases(current_phases(), {"queue": 0.25})
+    assert inner == {"inference": 0.5}
+    assert outer == {"inference": 0.5, "queue": 0.25}
+
+
+@pytest.mark.asyncio
+async def test_batcher_credits_batch_timings_to_each_request():
+    """Test that every request in a batch gets the queue wait and the model time."""
+
+    async def runner(model_key, func, items):
+        metrics.add_phases(current_phases(), {"inference": 0.2, "load": 0.1})
+        return func(items)
+
+    batcher = MicroBatcher("echo", lambda items: items, max_batch_size=2, runner=runner)
+
+    async def request(item):
+        with collect_phases() as phases:
+            await batcher.submit(item)
+        return phases
+
+    first, second = await asyncio.gather(request("a"), request("b"))
+    for phases in (first, second):
+        assert phases["inference"] == 0.2 and phases["load"] == 0.1
+        assert phases["queue"] >= 0
+    assert metrics.BATCH_SIZE.count("echo") == 1
+
+
+def test_metrics_endpoint_reports_tools_models_and_requests():
+    """Test /metrics after a few tool calls through the HTTP server."""
+    model = MockModel()
+    with patch("server.get_translation_model", return_value=model):
+        client = TestClient(http_server.http_app)
+        client.post("/tools/execute", json={"name": "translate", "arguments": {"text": "Hai"}})
+        client.post("/tools/execute", json={"name": "translate", "arguments": {"text": "Hai"}})
+        client.post("/tools/execute", json={"name": "translate", "arguments": {"text": ""}})
+        client.get("/nope")
+        response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert 'malaya_tool_calls_total{tool="translate",status="ok"} 2' in text
+    assert 'malaya_tool_calls_total{tool="translate",status="error"} 1' in text
+    assert 'malaya_tool_latency_seconds_count{tool="translate"} 3' in text
+    for phase in ("queue", "load", "inference", "format"):
+        assert f'malaya_tool_phase_seconds_count{{tool="translate",phase="{phase}"}}' in text
+    assert 'malaya_batch_size_count{model="translation_ms_en"} 1' in text
+    assert 'malaya_cache_hits_total{cache="translate"} 1' in text
+    assert 'malaya_http_requests_total{method="POST",route="/tools/execute",status="200"} 3' in text
+    assert 'malaya_http_requests_total{method="GET",route="other",status="404"} 1' in text
+    assert "# TYPE malaya_event_loop_lag_seconds histogram" in text
+
+
+@pytest.mark.asyncio
+async def test_nested_tool_steps_count_as_one_request(mock_models):
+    """Test that term_lookup's translate and detect_language steps are not tool calls."""
+    import server
+
+    data = await server.tools.run("term_lookup", {"term": "buku"})
+    assert "error" not in data
+    assert metrics.TOOL_CALLS.value("term_lookup", "ok") == 1
+    assert metrics.TOOL_CALLS.value("translate", "ok") == 0
+    assert metrics.TOOL_CALLS.value("detect_language", "ok") == 0
+    assert metrics.TOOL_PHASES.count("term_lookup", "inference") == 1
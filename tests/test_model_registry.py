@@ -0,0 +1,120 @@
+"""
+Tests for the model registry
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from model_registry import ModelRegistry
+
+
+def test_concurrent_callers_share_one_load():
+    """Test that simultaneous first requests trigger a single load."""
+    registry = ModelRegistry()
+    loads = []
+
+    def loader():
+        loads.append(threading.current_thread().name)
+        time.sleep(0.05)
+        return object()
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        models = list(pool.map(lambda _: registry.get_or_load("paraphrase", loader), range(4)))
+
+    assert len(loads) == 1
+    assert all(model is models[0] for model in models)
+    stats = registry.stats()["paraphrase"]
+    assert stats["loads"] == 1
+    assert stats["waits"] == 3
+    assert stats["last_load_seconds"] >= 0.05
+    assert stats["loaded"]
+
+
+def test_failed_load_reaches_waiters_and_is_retried():
+    """Test that a load failure is raised to every caller without being cached."""
+    registry = ModelRegistry()
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing_loader():
+        started.set()
+        release.wait()
+        raise RuntimeError("download failed")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        owner = pool.submit(registry.get_or_load, "spelling", failing_loader)
+        started.wait()
+        waiter = pool.submit(registry.get_or_load, "spelling", failing_loader)
+        while registry.stats()["spelling"]["waits"] < 1:
+            time.sleep(0.001)
+        release.set()
+        for future in (owner, waiter):
+            with pytest.raises(RuntimeError, match="download failed"):
+                future.result()
+
+    assert "spelling" not in registry
+    assert registry.get_or_load("spelling", lambda: "model") == "model"
+    assert registry.stats()["spelling"]["failures"] == 1
+
+
+class FakeClock:
+    """Manually advanced clock for last-use tests."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class SizedModel:
+    """Model stand-in exposing torch-like parameters of a fixed size."""
+
+    class Parameter:
+        def __init__(self, nbytes):
+            self.nbytes = nbytes
+
+        def numel(self):
+            return self.nbytes
+
+        def element_size(self):
+            return 1
+
+    def __init__(self, megabytes):
+        self._parameters = [self.Parameter(megabytes * 1024 * 1024)]
+
+    def parameters(self):
+        return iter(self._parameters)
+
+
+def test_least_recently_used_model_is_evicted_over_budget():
+    """Test that loading past the budget evicts the least recently used model."""
+    clock = FakeClock()
+    registry = ModelRegistry(memory_budget_mb=250, clock=clock)
+    registry.get_or_load("language_detection", lambda: SizedModel(100))
+    clock.now += 1
+    registry.get_or_load("translation_ms_en", lambda: SizedModel(100))
+    clock.now += 1
+    registry.get_or_load("language_detection", lambda: SizedModel(100))
+    clock.now += 1
+    registry.get_or_load("paraphrase", lambda: SizedModel(100))
+
+    assert sorted(registry.keys()) == ["language_detection", "paraphrase"]
+    assert registry.stats()["translation_ms_en"]["evictions"] == 1
+    summary = registry.summary()
+    assert summary["loaded_mb"] == 200
+    assert [m["key"] for m in summary["models"]] == ["paraphrase", "language_detection"]
+
+
+def test_idle_models_are_evicted():
+    """Test that models unused past the idle timeout are dropped."""
+    clock = FakeClock()
+    registry = ModelRegistry(idle_timeout=60, clock=clock)
+    registry.get_or_load("spelling", lambda: SizedModel(1))
+    clock.now += 30
+    assert registry.evict_idle() == []
+    clock.now += 31
+    assert registry.evict_idle() == ["spelling"]
+    assert "spelling" not in registry
@@ -0,0 +1,116 @@
+"""
+Tests for the rule-based normalize_malay fast path
+"""
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+sys.modules.setdefault('malaya', MagicMock())
+
+import normalize_rules
+import server
+from cache import clear_caches
+from normalize_rules import DEFAULT_LEXICON, RuleNormalizer, read_lexicon
+from tests.conftest import MockModel
+
+VOCABULARY = {
+    "bola", "budak", "duit", "ke", "main", "makan", "pergi", "saya", "sudah", "tahu",
+    "tahun", "terima", "kasih", "tiada", "tidak", "bagus", "tak", "tik",
+}
+
+
+@pytest.fixture
+def rules():
+    """Install a fresh rule normalizer so counters start at zero."""
+    normalizer = RuleNormalizer(DEFAULT_LEXICON, VOCABULARY)
+    normalize_rules.set_rule_normalizer(normalizer)
+    clear_caches()
+    yield normalizer
+    normalize_rules.set_rule_normalizer(RuleNormalizer(DEFAULT_LEXICON))
+    clear_caches()
+
+
+def test_expands_lexicon_entries_and_keeps_case():
+    """Test slang expansion, capitalization and longest-match replacement."""
+    normalizer = RuleNormalizer(DEFAULT_LEXICON, VOCABULARY)
+    assert normalizer.normalize("sy x tau") == ("saya tidak tahu", True)
+    assert normalizer.normalize("Sy takde duit") == ("Saya tiada duit", True)
+    assert normalizer.normalize("SY dah makan, tq!") == ("SAYA sudah makan, terima kasih!", True)
+    assert normalizer.normalize("tak-tik") == ("tak-tik", True)
+
+
+def test_expands_reduplication():
+    """Test that "word2" is written out as a reduplicated word."""
+    normalizer = RuleNormalizer(DEFAULT_LEXICON, VOCABULARY)
+    assert normalizer.normalize("budak2 main bola") == ("budak-budak main bola", True)
+    assert normalizer.normalize("tahun 2020") == ("tahun 2020", True)
+
+
+def test_escalates_unresolved_tokens():
+    """Test that tokens the rules cannot explain are left for the model."""
+    normalizer = RuleNormalizer(DEFAULT_LEXICON, VOCABULARY)
+    assert normalizer.normalize("sy nk g3 sana") == ("saya hendak g3 sana", False)
+    assert normalizer.normalize("bestttt sgt") == ("bestttt sangat", False)
+    assert normalizer.normalize("jln kaki") == ("jln kaki", False)
+    assert normalizer.normalize("pergi ke KL") == ("pergi ke KL", True)
+    assert normalizer.normalize("Dr Ali") == ("Dr Ali", False)
+
+    with_vocabulary = RuleNormalizer(DEFAULT_LEXICON, vocabulary={"saya", "makan"})
+    assert with_vocabulary.normalize("sy makan")[1]
+    assert not with_vocabulary.normalize("sy mkn nasik")[1]
+    assert with_vocabulary.stats() == {
+        "fast_path": 1, "model_path": 1, "replacements": 3,
+        "fast_path_ratio": 0.5, "lexicon_size": len(DEFAULT_LEXICON),
+    }
+
+
+def test_without_vocabulary_every_text_goes_to_the_model():
+    """Test that informal words that look standard are expanded but not trusted."""
+    normalizer = RuleNormalizer(DEFAULT_LEXICON)
+    assert normalizer.normalize("sy x tau nk g mane") == ("saya tidak tahu hendak g mane", False)
+    assert normalizer.normalize("pastu kite gi makan")[1] is False
+    assert normalizer.normalize("saya tidak tahu") == ("saya tidak tahu", False)
+    assert normalizer.stats()["fast_path"] == 0
+
+
+def test_lexicon_file_overrides_defaults(tmp_path, monkeypatch):
+    """Test that NORMALIZE_LEXICON_PATH entries extend and override the built-ins."""
+    path = tmp_path / "lexicon.tsv"
+    path.write_text("# informal\tstandard\nx\ttak\nbest\tbagus\n", encoding="utf-8")
+    assert read_lexicon(str(path)) == {"x": "tak", "best": "bagus"}
+
+    vocabulary = tmp_path / "vocabulary.txt"
+    vocabulary.write_text("tak\nbagus\n", encoding="utf-8")
+    monkeypatch.setenv("NORMALIZE_LEXICON_PATH", str(path))
+    monkeypatch.setenv("NORMALIZE_VOCABULARY_PATH", str(vocabulary))
+    monkeypatch.setattr(normalize_rules, "_rule_normalizer_checked", False)
+    normalizer = normalize_rules.get_rule_normalizer()
+    assert normalizer.normalize("x best") == ("tak bagus", True)
+
+    path.write_text("broken line\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        read_lexicon(str(path))
+
+    monkeypatch.setenv("NORMALIZE_FAST_PATH", "0")
+    monkeypatch.setattr(normalize_rules, "_rule_normalizer_checked", False)
+    assert normalize_rules.get_rule_normalizer() is None
+    assert normalize_rules.normalize_stats() == {}
+    normalize_rules.set_rule_normalizer(RuleNormalizer(DEFAULT_LEXICON))
+
+
+@pytest.mark.asyncio
+async def test_normalize_malay_uses_model_only_when_needed(rules):
+    """Test that resolved texts skip the neural normalizer and the rest reach it."""
+    model = MockModel()
+    model.normalize = MagicMock(side_effect=lambda text: f"model: {text}")
+    with patch("server.get_normalizer_model", return_value=model):
+        result = await server.tools.run("normalize_malay", {"text": "sy x tau"})
+        assert result == {"text": "sy x tau", "normalized": "saya tidak tahu", "path": "rules"}
+        model.normalize.assert_not_called()
+
+        result = await server.tools.run("normalize_malay", {"text": "sy xtau lgsg"})
+        assert result["path"] == "model"
+        model.normalize.assert_called_once_with("saya xtau lgsg")
+    assert rules.stats()["fast_path"] == 1
+    assert rules.stats()["model_path"] == 1
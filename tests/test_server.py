@@ -1,6 +1,10 @@
 """
 Tests for MalayLanguage MCP Server
 """
+import asyncio
+import os
+import subprocess
+import threading
 import pytest
 import sys
 from unittest.mock import Mock, patch, AsyncMock, MagicMock
@@ -13,6 +17,8 @@ sys.modules['malaya.spelling_correction'] = MagicMock()
 sys.modules['malaya.translation'] = MagicMock()
 sys.modules['malaya.paraphrase'] = MagicMock()
 
+from cache import clear_caches, set_cache_enabled
+from tests.conftest import MockModel
 from server import (
     detect_language,
     normalize_malay,
@@ -24,53 +30,12 @@ from server import (
 )
 
 
-class MockModel:
-    """Mock model for testing."""
-    
-    def predict(self, texts):
-        """Mock predict method."""
-        return [{"label": "malay", "score": 0.95} for _ in texts]
-    
-    def normalize(self, text):
-        """Mock normalize method."""
-        return text.lower()
-    
-    def correct(self, text):
-        """Mock correct method."""
-        return text.replace("saya", "Saya")
-    
-    def translate(self, texts):
-        """Mock translate method."""
-        return [f"translated: {text}" for text in texts]
-    
-    def paraphrase(self, texts):
-        """Mock paraphrase method."""
-        return [f"paraphrased: {text}" for text in texts]
-
-
-@pytest.fixture
-def mock_models():
-    """Fixture to mock all model loading functions."""
-    with patch("server.get_language_detection_model") as lang_mock, \
-         patch("server.get_normalizer_model") as norm_mock, \
-         patch("server.get_spelling_corrector") as spell_mock, \
-         patch("server.get_translation_model") as trans_mock, \
-         patch("server.get_paraphrase_model") as para_mock:
-        
-        mock_model = MockModel()
-        lang_mock.return_value = mock_model
-        norm_mock.return_value = mock_model
-        spell_mock.return_value = mock_model
-        trans_mock.return_value = mock_model
-        para_mock.return_value = mock_model
-        
-        yield {
-            "language": lang_mock,
-            "normalizer": norm_mock,
-            "spelling": spell_mock,
-            "translation": trans_mock,
-            "paraphrase": para_mock,
-        }
+@pytest.fixture(autouse=True)
+def fresh_result_cache():
+    """Start every test with an empty result cache."""
+    clear_caches()
+    yield
+    clear_caches()
 
 
 @pytest.mark.asyncio
@@ -141,6 +106,29 @@ async def test_apply_glossary_empty():
     assert "Error: Empty or whitespace-only term" in result[0].text
 
 
+@pytest.mark.asyncio
+async def test_apply_glossary_answers_from_index(mock_models, tmp_path):
+    """Test that glossary hits skip the model and misses fall back to it."""
+    import glossary
+
+    path = str(tmp_path / "glossary.idx")
+    glossary.build_index([
+        {"term": "makan", "translation": "eat", "definition": "memasukkan makanan ke mulut"},
+        {"term": "makanan", "translation": "food"},
+    ], path)
+    glossary.set_glossary(glossary.GlossaryIndex(path))
+    try:
+        hit = await apply_glossary("dimakan")
+        miss = await apply_glossary("rumah")
+    finally:
+        glossary.set_glossary(None)
+    assert "Root word: makan" in hit[0].text
+    assert "Translation (EN): eat" in hit[0].text
+    assert "Related terms: makanan" in hit[0].text
+    assert "translated: rumah" in miss[0].text
+    assert mock_models["translation"].call_count == 1
+
+
 @pytest.mark.asyncio
 async def test_rewrite_style(mock_models):
     """Test style rewriting."""
@@ -199,3 +187,158 @@ async def test_term_lookup_empty():
     result = await term_lookup("")
     assert len(result) == 1
     assert "Error: Empty or whitespace-only term" in result[0].text
+
+
+@pytest.mark.asyncio
+async def test_term_lookup_runs_steps_concurrently(mock_models, caplog):
+    """Test that term_lookup translates and detects at the same time."""
+    from inference import InferenceExecutor
+
+    both_started = threading.Barrier(2, timeout=2)
+
+    class OverlapModel(MockModel):
+        def predict(self, texts):
+            both_started.wait()
+            return super().predict(texts)
+
+        def translate(self, texts):
+            both_started.wait()
+            return super().translate(texts)
+
+    mock_models["language"].return_value = OverlapModel()
+    mock_models["translation"].return_value = OverlapModel()
+    executor = InferenceExecutor(max_workers=4)
+    with patch("inference._executor", executor), caplog.at_level("DEBUG", "malaylanguage-mcp"):
+        try:
+            result = await term_lookup("makan")
+        finally:
+            executor.shutdown()
+    assert "Translation: translated: makan" in result[0].text
+    assert "term_lookup timings for 'makan'" in caplog.text
+    assert "language_detection=" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_term_lookup_corrects_typos_before_translating(mock_models):
+    """Test that a misspelled term is translated as its nearest headword."""
+    import fuzzy_index
+
+    vocabulary = {"makan": 1, "minum": 1, "itu": 1, "rumah": 1}
+    fuzzy_index.set_fuzzy_index(fuzzy_index.FuzzyIndex(vocabulary))
+    try:
+        typo = await term_lookup("mkan")
+        exact = await term_lookup("minum")
+        short = await term_lookup("ini")
+        inflected = await term_lookup("rumahku")
+    finally:
+        fuzzy_index.set_fuzzy_index(None)
+    assert "Did you mean: makan (edit distance 1)" in typo[0].text
+    assert "Translation: translated: makan" in typo[0].text
+    assert "Did you mean" not in exact[0].text
+    assert "Translation: translated: ini" in short[0].text
+    assert "Similar word: rumah (edit distance 2)" in inflected[0].text
+    assert "Translation: translated: rumahku" in inflected[0].text
+
+
+@pytest.mark.asyncio
+async def test_term_lookup_reuses_tool_caches(mock_models):
+    """Test that term_lookup answers from the translate and detect caches."""
+    await translate("makan")
+    await detect_language("makan")
+    result = await term_lookup("makan")
+    assert "Language: malay" in result[0].text
+    assert mock_models["translation"].call_count == 1
+    assert mock_models["language"].call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_detections_share_a_batch(mock_models):
+    """Test that concurrent tool calls reach the model as one batch."""
+    calls = []
+
+    class BatchRecordingModel(MockModel):
+        def predict(self, texts):
+            calls.append(len(texts))
+            return super().predict(texts)
+
+    mock_models["language"].return_value = BatchRecordingModel()
+    results = await asyncio.gather(*(detect_language(f"teks {i}") for i in range(4)))
+    assert all("Language: malay" in r[0].text for r in results)
+    assert calls == [4]
+
+
+@pytest.mark.asyncio
+async def test_translate_result_is_cached(mock_models):
+    """Test that repeating a translation does not call the model again."""
+    first = await translate("Selamat pagi")
+    second = await translate("Selamat pagi", "ms", "en")
+    assert first[0].text == second[0].text
+    assert mock_models["translation"].call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_errors_are_not_cached(mock_models):
+    """Test that a failed call is retried instead of served from cache."""
+    mock_models["translation"].side_effect = [RuntimeError("load failed"), MockModel()]
+    first = await translate("Selamat pagi")
+    second = await translate("Selamat pagi")
+    assert "Error translating text" in first[0].text
+    assert "Translation (English):" in second[0].text
+
+
+@pytest.mark.asyncio
+async def test_cache_can_be_disabled_per_tool(mock_models):
+    """Test that a disabled tool always reaches the model."""
+    set_cache_enabled("detect_language", False)
+    try:
+        await detect_language("Ini adalah teks Melayu")
+        await detect_language("Ini adalah teks Melayu")
+    finally:
+        set_cache_enabled("detect_language", True)
+    assert mock_models["language"].call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_call_tool_sends_sentence_progress(mock_models, monkeypatch):
+    """Test that MCP calls with a progress token get one notification per sentence."""
+    from types import SimpleNamespace
+    from mcp.server.lowlevel.server import request_ctx
+    import server
+
+    monkeypatch.setenv("SENTENCE_CHUNK_MIN_CHARS", "10")
+    session = SimpleNamespace(send_progress_notification=AsyncMock())
+    context = SimpleNamespace(
+        meta=SimpleNamespace(progressToken="tok"), session=session, request_id=7
+    )
+    token = request_ctx.set(context)
+    try:
+        content, data = await server.call_tool("rewrite_style", {"text": "Ayat satu. Ayat dua."})
+    finally:
+        request_ctx.reset(token)
+    calls = session.send_progress_notification.await_args_list
+    assert [call.args[:2] for call in calls] == [("tok", 1), ("tok", 2)]
+    assert calls[0].kwargs["message"] == "paraphrased: Ayat satu. "
+    assert calls[1].kwargs == {"total": 2, "message": "paraphrased: Ayat dua.", "related_request_id": 7}
+    assert data["rewritten"] == "paraphrased: Ayat satu. paraphrased: Ayat dua."
+
+
+def test_server_import_does_not_import_malaya():
+    """Test that importing the server leaves malaya for the model loaders."""
+    code = "import sys, server; assert 'malaya' not in sys.modules"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", code], cwd=root, check=True)
+
+
+def test_model_loader_uses_malaya_submodule():
+    """Test that a loader builds its model from the lazily imported submodule."""
+    import server
+
+    transformer = sys.modules["malaya.paraphrase"].transformer
+    transformer.reset_mock()
+    server._model_cache.pop("paraphrase")
+    try:
+        server.get_paraphrase_model()
+        server.get_paraphrase_model()
+    finally:
+        server._model_cache.pop("paraphrase")
+    transformer.assert_called_once_with()
@@ -0,0 +1,113 @@
+"""
+Tests for the shared tool registry
+"""
+import asyncio
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.modules.setdefault('malaya', MagicMock())
+
+import server
+from tool_registry import (
+    ToolRegistry, ToolSpec, ToolTimeoutError, UnknownToolError, parse_tool_timeouts,
+)
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "text": {"type": "string"},
+        "style": {"type": "string", "default": "formal"},
+    },
+    "required": ["text"],
+}
+
+
+async def echo(text: str, style: str = "formal") -> dict:
+    if not text:
+        return {"error": "Error: no text"}
+    return {"text": text, "style": style}
+
+
+def format_echo(data: dict) -> str:
+    return f"{data['style']}: {data['text']}"
+
+
+def test_parse_tool_timeouts():
+    """Test parsing per-tool time limits."""
+    assert parse_tool_timeouts("rewrite_style=30, translate=2.5,") == {
+        "rewrite_style": 30.0,
+        "translate": 2.5,
+    }
+    with pytest.raises(ValueError):
+        parse_tool_timeouts("translate")
+    with pytest.raises(ValueError):
+        parse_tool_timeouts("translate=0")
+
+
+def test_extract_arguments_applies_schema_defaults():
+    """Test that missing arguments take schema defaults or an empty string."""
+    spec = ToolSpec("echo", "Echo", SCHEMA, echo)
+    assert spec.extract_arguments({"text": "hai", "extra": 1}) == {"text": "hai", "style": "formal"}
+    assert spec.extract_arguments(None) == {"text": "", "style": "formal"}
+
+
+@pytest.mark.asyncio
+async def test_registry_dispatch_and_unknown_tool():
+    """Test dispatching by name and rejecting unknown tools."""
+    registry = ToolRegistry()
+    echo_text = registry.tool("echo", "Echo", SCHEMA, formatter=format_echo, cache=None)(echo)
+    result = await registry.call("echo", {"text": "hai", "style": "casual"})
+    assert result[0].text == "casual: hai"
+    assert (await echo_text("hai"))[0].text == "formal: hai"
+    assert await registry.run("echo", {"text": "hai"}) == {"text": "hai", "style": "formal"}
+    assert (await registry.call("echo", {}))[0].text == "Error: no text"
+    assert [tool.name for tool in registry.list_tools()] == ["echo"]
+    with pytest.raises(UnknownToolError):
+        await registry.call("nope", {})
+    with pytest.raises(ValueError):
+        registry.register(ToolSpec("echo", "Echo", SCHEMA, echo))
+
+
+@pytest.mark.asyncio
+async def test_registry_applies_configured_timeout():
+    """Test that TOOL_TIMEOUTS limits are applied at registration."""
+
+    async def slow(text: str, style: str) -> dict:
+        await asyncio.sleep(1)
+        return {}
+
+    registry = ToolRegistry(timeouts={"slow": 0.01})
+    registry.tool("slow", "Slow", SCHEMA, cache=None)(slow)
+    assert registry.get("slow").timeout == 0.01
+    with pytest.raises(ToolTimeoutError):
+        await registry.call("slow", {"text": "x", "style": "y"})
+
+
+def test_server_tools_share_one_registry():
+    """Test that every server tool is registered with its policies."""
+    assert server.tools.names() == [
+        "detect_language", "normalize_malay", "correct_spelling", "apply_glossary",
+        "rewrite_style", "translate", "term_lookup",
+    ]
+    assert server.tools.get("term_lookup").text_argument == "term"
+    assert server.tools.get("translate").cache == "persistent"
+
+
+@pytest.mark.asyncio
+async def test_call_tool_returns_structured_content(mock_models):
+    """Test that MCP calls carry the payload next to the formatted text."""
+    content, structured = await server.call_tool("detect_language", {"text": "Selamat pagi"})
+    assert "Language: malay" in content[0].text
+    assert structured == {"text": "Selamat pagi", "label": "malay", "score": 0.95}
+
+    result = await server.call_tool("translate", {"text": ""})
+    assert result[0].text.startswith("Error: Empty")
+
+
+@pytest.mark.asyncio
+async def test_call_tool_reports_unknown_tool():
+    """Test that the MCP handler turns dispatch errors into error text."""
+    result = await server.call_tool("nope", {})
+    assert result[0].text == "Error: Unknown tool: nope"
@@ -0,0 +1,187 @@
+"""
+Tests for tracing spans and the slow-request profiler
+"""
+import os
+import sys
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+sys.modules.setdefault('malaya', MagicMock())
+
+from starlette.testclient import TestClient
+
+import http_server
+import server
+import tracing
+from cache import clear_caches
+from tests.conftest import MockModel
+from tracing import NOOP_SPAN, InMemoryExporter, SamplingProfiler, Tracer
+
+
+@pytest.fixture
+def exporter():
+    """Trace into an in-memory exporter for the duration of the test."""
+    memory = InMemoryExporter()
+    tracing.set_tracer(Tracer([memory]))
+    clear_caches()
+    yield memory
+    tracing.set_tracer(Tracer())
+    clear_caches()
+
+
+def test_spans_nest_and_record_errors():
+    """Test parent/child ids, attributes, links and error status."""
+    memory = InMemoryExporter()
+    tracer = Tracer([memory])
+    with tracer.span("outer", tool="translate") as outer:
+        with tracer.span("inner") as inner:
+            inner.set_attribute("items", 3)
+        with tracer.span("batch", root=True, links=[tracer.current(), None]) as batch:
+            pass
+    with pytest.raises(RuntimeError):
+        with tracer.span("failing"):
+            raise RuntimeError("boom")
+
+    failing, outer_dict, batch_dict, inner_dict = memory.spans()
+    assert inner_dict["parent_id"] == outer.span_id
+    assert inner_dict["trace_id"] == outer.trace_id
+    assert inner_dict["attributes"] == {"items": 3}
+    assert outer_dict["parent_id"] is None and outer_dict["attributes"] == {"tool": "translate"}
+    assert batch_dict["trace_id"] != outer.trace_id and batch.parent_id is None
+    assert batch_dict["links"] == [{"trace_id": outer.trace_id, "span_id": outer.span_id}]
+    assert failing["status"] == "error" and failing["attributes"]["error"] == "RuntimeError: boom"
+    assert [s["name"] for s in memory.spans(limit=1, name="in")] == ["inner"]
+
+
+def test_tracing_off_is_a_noop(monkeypatch):
+    """Test that the default tracer records nothing and yields the no-op span."""
+    monkeypatch.delenv("TRACING", raising=False)
+    monkeypatch.delenv("PROFILE_SLOW_MS", raising=False)
+    tracer = tracing.tracer_from_env()
+    assert not tracer.enabled
+    with tracer.span("tool translate") as span:
+        assert span is NOOP_SPAN
+        assert tracer.current() is None
+    assert tracer.memory_exporter() is None
+
+    monkeypatch.setenv("TRACING", "bogus")
+    with pytest.raises(ValueError):
+        tracing.tracer_from_env()
+
+
+@pytest.mark.asyncio
+async def test_tool_call_spans_cover_batch_and_inference(exporter):
+    """Test the spans of a translate call: tool, batch (linked), inference and format."""
+    with patch("server.get_translation_model", return_value=MockModel()):
+        data = await server.tools.run("translate", {"text": "Hai", "target_lang": "en"})
+        server.tools.get("translate").render(data)
+
+    spans = {span["name"]: span for span in exporter.spans()}
+    tool = spans["tool translate"]
+    batch = spans["batch translation_ms_en"]
+    inference = spans["inference translation_ms_en"]
+    assert tool["attributes"] == {"tool": "translate", "status": "ok"}
+    assert batch["parent_id"] is None and batch["attributes"]["batch_size"] == 1
+    assert batch["links"] == [{"trace_id": tool["trace_id"], "span_id": tool["span_id"]}]
+    assert inference["parent_id"] == batch["span_id"]
+    assert {"queue_seconds", "load_seconds", "inference_seconds"} <= set(inference["attributes"])
+    assert spans["format translate"]["parent_id"] is None
+
+
+def test_profiler_dumps_slow_root_spans(tmp_path):
+    """Test that a root span over the threshold writes the stacks sampled during it."""
+    profiler = SamplingProfiler(str(tmp_path))
+    tracer = Tracer(profiler=profiler, slow_threshold=0)
+    profiler.start = lambda: None  # sample by hand instead of on a timer
+
+    def busy_model_call():
+        profiler.sample()
+
+    with tracer.span("tool translate"):
+        busy_model_call()
+        with tracer.span("inference translation_ms_en"):
+            busy_model_call()
+    (path,) = tmp_path.iterdir()
+    assert path.name.endswith(".folded") and "tool_translate" in path.name
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in lines) >= 2
+    assert any(line.startswith(threading.current_thread().name + ";") for line in lines)
+    assert any("busy_model_call (test_tracing.py:" in line for line in lines)
+    assert profiler.dumps == 1
+
+    slow_only = Tracer(profiler=profiler, slow_threshold=60_000)
+    with slow_only.span("tool detect_language"):
+        profiler.sample()
+    assert profiler.dumps == 1
+
+
+def test_profiler_keeps_only_samples_open_requests_need(tmp_path):
+    """Test that repeated stacks are interned and samples before open requests are dropped."""
+    profiler = SamplingProfiler(str(tmp_path), max_stacks=1)
+    tracer = Tracer(profiler=profiler, slow_threshold=60_000)
+    profiler.start = lambda: None
+    for _ in range(3):
+        profiler.sample()
+    assert len(profiler._samples) == 1
+
+    with tracer.span("tool translate"):
+        for _ in range(3):
+            profiler.sample()
+        assert len(profiler._samples) == 3
+        stacks = set(profiler._stacks.values())
+        assert len(stacks) == len(profiler._stacks)  # identical stacks share an id
+    profiler.sample()
+    assert len(profiler._samples) == 1
+    assert len(profiler._stacks) == len(profiler._samples[0][1])
+
+
+@pytest.mark.asyncio
+async def test_profiler_writes_from_a_worker_thread(tmp_path):
+    """Test that a slow span finishing on the event loop is dumped off the loop."""
+    profiler = SamplingProfiler(str(tmp_path))
+    tracer = Tracer(profiler=profiler, slow_threshold=0)
+    profiler.start = lambda: None
+    writers = []
+    dump = profiler.dump
+
+    def record_thread(span):
+        writers.append(threading.current_thread())
+        return dump(span)
+
+    profiler.dump = record_thread
+    with tracer.span("tool translate"):
+        profiler.sample()
+    assert profiler.dumps == 0
+    await tracer.flush()
+    assert profiler.dumps == 1 and writers[0] is not threading.main_thread()
+    assert profiler._open == {}
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_profiler_thread_samples_in_the_background(tmp_path):
+    """Test the sampling thread starts with the first span and stops cleanly."""
+    profiler = SamplingProfiler(str(tmp_path), interval=0.001)
+    tracer = Tracer(profiler=profiler, slow_threshold=0)
+    with tracer.span("tool rewrite_style"):
+        time.sleep(0.05)
+    profiler.stop()
+    assert profiler.dumps == 1
+    assert not any(t.name == "malaya-profiler" for t in threading.enumerate())
+    assert os.listdir(tmp_path)
+
+
+def test_traces_endpoint(exporter):
+    """Test GET /traces with the memory exporter and with tracing off."""
+    client = TestClient(http_server.http_app)
+    with patch("server.get_translation_model", return_value=MockModel()):
+        client.post("/tools/execute", json={"name": "translate", "arguments": {"text": "Hai"}})
+    body = client.get("/traces", params={"name": "tool", "limit": 5}).json()
+    assert body["enabled"] is True
+    assert [span["name"] for span in body["spans"]] == ["tool translate"]
+    assert client.get("/traces", params={"limit": "x"}).status_code == 400
+
+    tracing.set_tracer(Tracer())
+    assert client.get("/traces").json() == {"enabled": False, "spans": []}
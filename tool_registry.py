@@ -0,0 +1,251 @@
+"""
+Tool registry for MalayLanguage MCP Server
+
+Every tool is described once: its handler, input schema, the argument that
+carries its input text, its cache policy and its time limit. The MCP transport (list_tools/call_tool) and the
+HTTP endpoints all dispatch through the registry, so a per-tool setting
+applies to every transport.
+
+Handlers return a structured payload dict (an "error" key marks a failure)
+and each tool has a formatter that renders the payload as the human-readable
+text. Clients that want the fields get the payload as is, so they never have
+to parse the text back apart.
+
+Calls that miss the cache run inside an admission slot (see admission.py), so
+a saturated server sheds them with ToolOverloadedError instead of queueing
+without bound.
+
+Configuration:
+    TOOL_TIMEOUTS   per-tool time limits in seconds, e.g. "rewrite_style=30,translate=10"
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Iterator, Optional
+
+from mcp.types import TextContent, Tool
+
+from admission import ToolOverloadedError, admitted
+from cache import cached_tool
+from metrics import TOOL_PHASES, collect_phases, record_tool_call
+from tracing import span
+
+logger = logging.getLogger("malaylanguage-tools")
+
+CACHE_POLICIES = (None, "memory", "persistent")
+
+
+class UnknownToolError(ValueError):
+    """Raised when a request names a tool that does not exist."""
+
+
+class ToolTimeoutError(TimeoutError):
+    """Raised when a tool call runs past its time limit."""
+
+
+def parse_tool_timeouts(spec: str) -> dict[str, float]:
+    """Parse a "tool=seconds,tool=seconds" string into per-tool time limits."""
+    timeouts = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid tool timeout '{item}', expected tool=seconds")
+        seconds = float(value)
+        if seconds <= 0:
+            raise ValueError(f"Timeout for '{name.strip()}' must be positive")
+        timeouts[name.strip()] = seconds
+    return timeouts
+
+
+class ToolSpec:
+    """Everything the transports need to know about one tool."""
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        input_schema: dict,
+        handler: Callable[..., Awaitable[dict]],
+        formatter: Callable[[dict], str] = str,
+        text_argument: str = "text",
+        cache: Optional[str] = "memory",
+        timeout: Optional[float] = None,
+    ):
+        if cache not in CACHE_POLICIES:
+            raise ValueError(f"Unknown cache policy: {cache} (expected one of {CACHE_POLICIES})")
+        self.name = name
+        self.description = description
+        self.input_schema = input_schema
+        self.handler = handler
+        self.formatter = formatter
+        self.text_argument = text_argument
+        self.cache = cache
+        self.timeout = timeout
+
+    def extract_arguments(self, arguments: Any) -> dict:
+        """Map request arguments onto handler keyword arguments.
+
+        Every schema property is passed; missing ones take the schema default,
+        or an empty string so the handler reports the missing input itself.
+        """
+        arguments = arguments if isinstance(arguments, dict) else {}
+        return {
+            name: arguments.get(name, prop.get("default", ""))
+            for name, prop in self.input_schema.get("properties", {}).items()
+        }
+
+    def to_tool(self) -> Tool:
+        """Describe this tool for MCP list_tools."""
+        return Tool(name=self.name, description=self.description, inputSchema=self.input_schema)
+
+    async def run(self, arguments: Any) -> dict:
+        """Run the handler on the request arguments, within the time limit.
+
+        The call's outcome, latency and model phase timings go to metrics.py,
+        and the call is traced as a "tool <name>" span (see tracing.py).
+        """
+        start = time.perf_counter()
+        status = "error"
+        with span(f"tool {self.name}", tool=self.name) as tool_span, collect_phases() as phases:
+            try:
+                data = await self._run(arguments)
+                status = "error" if "error" in data else "ok"
+                return data
+            except ToolTimeoutError:
+                status = "timeout"
+                raise
+            except ToolOverloadedError:
+                status = "rejected"
+                raise
+            finally:
+                tool_span.set_attribute("status", status)
+                record_tool_call(self.name, status, time.perf_counter() - start, phases)
+
+    async def run_nested(self, arguments: Any) -> dict:
+        """Run the handler as a step of another tool's call.
+
+        The cache, admission and time limit apply as in run(), but the call is
+        not counted or traced as a tool call of its own: its model time is part
+        of the calling tool's request.
+        """
+        return await self._run(arguments)
+
+    async def _run(self, arguments: Any) -> dict:
+        call = self.handler(**self.extract_arguments(arguments))
+        if not self.timeout:
+            return await call
+        try:
+            return await asyncio.wait_for(call, self.timeout)
+        except asyncio.TimeoutError:
+            raise ToolTimeoutError(f"{self.name} timed out after {self.timeout:g}s") from None
+
+    def render(self, data: dict) -> list[TextContent]:
+        """Format a payload as the tool's text response."""
+        start = time.perf_counter()
+        with span(f"format {self.name}", tool=self.name):
+            text = data["error"] if "error" in data else self.formatter(data)
+        TOOL_PHASES.observe(time.perf_counter() - start, self.name, "format")
+        return [TextContent(type="text", text=text)]
+
+    async def call(self, arguments: Any) -> list[TextContent]:
+        """Run the tool and return its text response."""
+        return self.render(await self.run(arguments))
+
+
+class ToolRegistry:
+    """Ordered collection of ToolSpecs shared by every transport."""
+
+    def __init__(self, timeouts: Optional[dict[str, float]] = None):
+        self.timeouts = dict(timeouts or {})
+        self._tools: dict[str, ToolSpec] = {}
+
+    @classmethod
+    def from_env(cls) -> "ToolRegistry":
+        """Build a registry with per-tool time limits from TOOL_TIMEOUTS."""
+        return cls(timeouts=parse_tool_timeouts(os.environ.get("TOOL_TIMEOUTS", "")))
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools
+
+    def __iter__(self) -> Iterator[ToolSpec]:
+        return iter(self._tools.values())
+
+    def __len__(self) -> int:
+        return len(self._tools)
+
+    def names(self) -> list[str]:
+        """Return tool names in registration order."""
+        return list(self._tools)
+
+    def register(self, spec: ToolSpec) -> ToolSpec:
+        """Add a tool, applying any configured time limit."""
+        if spec.name in self._tools:
+            raise ValueError(f"Tool already registered: {spec.name}")
+        if spec.name in self.timeouts:
+            spec.timeout = self.timeouts[spec.name]
+        self._tools[spec.name] = spec
+        return spec
+
+    def tool(
+        self,
+        name: str,
+        description: str,
+        input_schema: dict,
+        formatter: Callable[[dict], str] = str,
+        text_argument: str = "text",
+        cache: Optional[str] = "memory",
+        timeout: Optional[float] = None,
+    ):
+        """Register the decorated async function, which returns a payload, as a tool.
+
+        The function runs under admission control and is wrapped in the result
+        cache according to `cache`, so cache hits never wait for a slot. The
+        decorator returns a function with the same arguments that answers with
+        the formatted text, so direct calls behave like MCP tool calls.
+        """
+
+        def decorator(func):
+            handler = admitted(name)(func)
+            if cache is not None:
+                handler = cached_tool(name, persistent=cache == "persistent")(handler)
+            spec = self.register(ToolSpec(
+                name, description, input_schema, handler, formatter=formatter,
+                text_argument=text_argument, cache=cache, timeout=timeout,
+            ))
+
+            @functools.wraps(func)
+            async def text_tool(*args, **kwargs) -> list[TextContent]:
+                return spec.render(await spec.handler(*args, **kwargs))
+
+            return text_tool
+
+        return decorator
+
+    def get(self, name: str) -> ToolSpec:
+        """Return the spec for a tool name, raising UnknownToolError if there is none."""
+        spec = self._tools.get(name)
+        if spec is None:
+            raise UnknownToolError(f"Unknown tool: {name}")
+        return spec
+
+    def list_tools(self) -> list[Tool]:
+        """Return the MCP Tool descriptions in registration order."""
+        return [spec.to_tool() for spec in self._tools.values()]
+
+    async def call(self, name: str, arguments: Any) -> list[TextContent]:
+        """Dispatch a tool call by name and return its text response."""
+        return await self.get(name).call(arguments)
+
+    async def run(self, name: str, arguments: Any) -> dict:
+        """Dispatch a tool call by name and return its structured payload."""
+        return await self.get(name).run(arguments)
+
+    async def run_nested(self, name: str, arguments: Any) -> dict:
+        """Run a tool from inside another tool, without counting it as a request."""
+        return await self.get(name).run_nested(arguments)
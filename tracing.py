@@ -0,0 +1,447 @@
+"""
+Tracing and slow-request profiling for MalayLanguage MCP Server
+
+Spans are opened around every tool call, micro-batch, inference call, model
+lookup (the get_* loaders) and response formatting, so a slow translate can be
+broken down into model loading, the forward pass and formatting. Spans follow
+the OpenTelemetry model (trace and span ids, parent, attributes, links) and go
+to one of these exporters:
+
+    memory   keep the most recent spans in process; GET /traces on the HTTP server lists them
+    log      log every finished span as one JSON line
+    otel     hand spans to the OpenTelemetry API (requires opentelemetry-api and an SDK
+             configured by the host, e.g. with opentelemetry-instrument)
+
+A micro-batch serves several requests, so its span is a root span linked to
+the span of every request in it. In thread mode inference spans and the
+loader spans inside them share the request's trace; process-pool workers are
+not traced.
+
+With PROFILE_SLOW_MS set, a sampling profiler records the stacks of every
+thread every PROFILE_INTERVAL_MS. When a request (a root span) takes longer
+than the threshold, the samples taken during it are written to PROFILE_DIR in
+collapsed-stack format ("frame;frame;frame count" per line), which
+flamegraph.pl, speedscope and similar tools render as a flame graph. Samples
+cover every thread, so concurrent requests show up in each other's profiles.
+Each sample keeps counts of interned stack ids, samples older than the oldest
+request still open are dropped, and profiles are written from a worker thread
+so a slow request's dump does not stall the event loop.
+
+Configuration:
+    TRACING               off (default), memory, log or otel
+    TRACE_BUFFER_SIZE     spans kept by the memory exporter (default 2048)
+    PROFILE_SLOW_MS       profile requests slower than this many milliseconds (default 0, off)
+    PROFILE_INTERVAL_MS   sampling interval (default 5)
+    PROFILE_DIR           where profiles are written (default $MALAYA_CACHE/profiles)
+"""
+
+import asyncio
+import collections
+import contextlib
+import contextvars
+import functools
+import itertools
+import json
+import logging
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+from typing import Any, Iterable, Iterator, Optional
+
+logger = logging.getLogger("malaylanguage-tracing")
+
+TRACING_MODES = ("off", "memory", "log", "otel")
+DEFAULT_BUFFER_SIZE = 2048
+DEFAULT_PROFILE_INTERVAL_MS = 5.0
+
+
+class Span:
+    """One timed operation, with OpenTelemetry-style ids, attributes and links."""
+
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns",
+        "attributes", "links", "status", "thread",
+    )
+
+    def __init__(self, name: str, parent: Optional["Span"] = None,
+                 attributes: Optional[dict] = None, links: Iterable["Span"] = ()):
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = dict(attributes or {})
+        self.links = [(link.trace_id, link.span_id) for link in links]
+        self.status = "ok"
+        self.thread = threading.current_thread().name
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def duration(self) -> float:
+        """Seconds from start to end (or to now while the span is open)."""
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round(self.duration * 1000, 3),
+            "attributes": self.attributes,
+            "links": [{"trace_id": t, "span_id": s} for t, s in self.links],
+            "status": self.status,
+            "thread": self.thread,
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span when tracing is off."""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class InMemoryExporter:
+    """Keeps the most recent finished spans."""
+
+    def __init__(self, max_spans: int = DEFAULT_BUFFER_SIZE):
+        self._spans: collections.deque = collections.deque(maxlen=max_spans)
+
+    def export(self, span: Span) -> None:
+        self._spans.append(span)
+
+    def spans(self, limit: Optional[int] = None, name: Optional[str] = None) -> list[dict]:
+        """Return finished spans, newest first, optionally filtered by name prefix."""
+        spans = [s for s in reversed(self._spans) if name is None or s.name.startswith(name)]
+        return [span.to_dict() for span in spans[:limit]]
+
+    def clear(self) -> None:
+        self._spans.clear()
+
+
+class LogExporter:
+    """Logs every finished span as a JSON line."""
+
+    def export(self, span: Span) -> None:
+        logger.info(json.dumps(span.to_dict(), ensure_ascii=False, default=str))
+
+
+class SamplingProfiler:
+    """Samples every thread's stack on a timer and writes collapsed stacks for slow requests."""
+
+    def __init__(self, directory: str, interval: float = DEFAULT_PROFILE_INTERVAL_MS / 1000,
+                 max_samples: int = 200_000, max_stacks: int = 50_000):
+        self.directory = directory
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.dumps = 0
+        # (time, {stack id: threads with that stack}) per tick, oldest first.
+        self._samples: collections.deque = collections.deque(maxlen=max_samples)
+        self._stack_ids: dict[tuple, int] = {}
+        self._stacks: dict[int, str] = {}
+        self._ids = itertools.count()
+        # Start times of the root spans still open (or being dumped), by span id.
+        self._open: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        """Start sampling in this process (again after a fork, which drops the thread)."""
+        if self._thread is None or self._pid != os.getpid():
+            self._stop = threading.Event()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="malaya-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample(skip=own)
+
+    def track(self, span: Span) -> None:
+        """Keep the samples taken since span started until release(span)."""
+        with self._lock:
+            self._open[span.span_id] = span.start_ns
+
+    def release(self, span: Span) -> None:
+        with self._lock:
+            self._open.pop(span.span_id, None)
+
+    def _intern(self, key: tuple) -> int:
+        thread, *frames = key
+        labels = [thread]
+        for code, line in reversed(frames):
+            labels.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{line})")
+        stack_id = next(self._ids)
+        self._stacks[stack_id] = ";".join(labels)
+        self._stack_ids[key] = stack_id
+        return stack_id
+
+    def sample(self, skip: Optional[int] = None) -> None:
+        """Record the current stack of every thread (except skip)."""
+        now = time.time_ns()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        counts: dict[int, int] = {}
+        for ident, frame in sys._current_frames().items():
+            if ident == skip:
+                continue
+            key = [names.get(ident, str(ident))]
+            while frame is not None:
+                key.append((frame.f_code, frame.f_lineno))
+                frame = frame.f_back
+            key = tuple(key)
+            stack_id = self._stack_ids.get(key)
+            if stack_id is None:
+                stack_id = self._intern(key)
+            counts[stack_id] = counts.get(stack_id, 0) + 1
+        self._samples.append((now, counts))
+        self._trim(now)
+
+    def _trim(self, now: int) -> None:
+        """Drop samples no open request covers and forget stacks no sample uses."""
+        with self._lock:
+            oldest = min(self._open.values(), default=now)
+        while self._samples and self._samples[0][0] < oldest:
+            self._samples.popleft()
+        if len(self._stacks) > self.max_stacks:
+            used = {stack_id for _, counts in list(self._samples) for stack_id in counts}
+            # Rebound rather than mutated, so a dump in progress keeps a consistent view.
+            self._stacks = {i: stack for i, stack in self._stacks.items() if i in used}
+            self._stack_ids = {key: i for key, i in self._stack_ids.items() if i in used}
+
+    def collapse(self, start_ns: int, end_ns: int) -> dict[str, int]:
+        """Count identical stacks sampled between start_ns and end_ns."""
+        counts: dict[int, int] = collections.Counter()
+        for at, tick in list(self._samples):
+            if start_ns <= at <= end_ns:
+                counts.update(tick)
+        stacks = self._stacks
+        return {stacks[stack_id]: count for stack_id, count in counts.items()}
+
+    def dump(self, span: Span) -> Optional[str]:
+        """Write the samples taken during span to a .folded file and return its path."""
+        counts = self.collapse(span.start_ns, span.end_ns or time.time_ns())
+        if not counts:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        label = re.sub(r"[^A-Za-z0-9_.-]+", "_", span.name)
+        path = os.path.join(
+            self.directory, f"{span.start_ns}-{label}-{span.duration * 1000:.0f}ms.folded"
+        )
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(counts.items()):
+                f.write(f"{stack} {count}\n")
+        self.dumps += 1
+        return path
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+class Tracer:
+    """Creates spans and hands finished ones to the exporters and the profiler."""
+
+    def __init__(self, exporters: Iterable = (), profiler: Optional[SamplingProfiler] = None,
+                 slow_threshold: float = 0.0):
+        self.exporters = list(exporters)
+        self.profiler = profiler
+        self.slow_threshold = slow_threshold
+        self.enabled = bool(self.exporters or profiler)
+        self._writing: set[asyncio.Task] = set()
+
+    def current(self) -> Optional[Any]:
+        """Return a reference to the current span, for linking it from another span."""
+        return _current_span.get() if self.enabled else None
+
+    @contextlib.contextmanager
+    def span(self, name: str, links: Iterable[Any] = (), root: bool = False,
+             **attributes: Any) -> Iterator[Any]:
+        """Time the block as a span named name; root=True starts a new trace."""
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+        if self.profiler is not None:
+            self.profiler.start()
+        parent = None if root else _current_span.get()
+        span = Span(name, parent, attributes, [link for link in links if link is not None])
+        if self.profiler is not None and parent is None:
+            self.profiler.track(span)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.set_attribute("error", f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            self._finish(span)
+
+    def _finish(self, span: Span) -> None:
+        for exporter in self.exporters:
+            exporter.export(span)
+        if self.profiler is None or span.parent_id is not None:
+            return
+        if span.duration * 1000 < self.slow_threshold:
+            self.profiler.release(span)
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Not on the event loop (a worker thread or a script): write it here.
+            try:
+                self._write_profile(span)
+            finally:
+                self.profiler.release(span)
+            return
+        task = loop.create_task(asyncio.to_thread(self._write_profile, span))
+        self._writing.add(task)
+        task.add_done_callback(functools.partial(self._profile_written, span))
+
+    def _write_profile(self, span: Span) -> None:
+        try:
+            path = self.profiler.dump(span)
+        except OSError as e:
+            logger.warning(f"Could not write profile for {span.name}: {e}")
+            return
+        if path:
+            logger.info(f"Slow request {span.name} took {span.duration * 1000:.0f}ms, "
+                        f"profile written to {path}")
+
+    def _profile_written(self, span: Span, task: asyncio.Task) -> None:
+        self._writing.discard(task)
+        self.profiler.release(span)
+
+    async def flush(self) -> None:
+        """Wait for the profiles still being written."""
+        if self._writing:
+            await asyncio.gather(*self._writing, return_exceptions=True)
+
+    def memory_exporter(self) -> Optional[InMemoryExporter]:
+        """Return the in-process exporter, if one is configured."""
+        return next((e for e in self.exporters if isinstance(e, InMemoryExporter)), None)
+
+
+class OpenTelemetryTracer(Tracer):
+    """Creates spans through the OpenTelemetry API instead of the built-in Span."""
+
+    def __init__(self, profiler: Optional[SamplingProfiler] = None, slow_threshold: float = 0.0):
+        from opentelemetry import trace
+
+        super().__init__(profiler=profiler, slow_threshold=slow_threshold)
+        self.enabled = True
+        self._trace = trace
+        self._tracer = trace.get_tracer("malaylanguage-mcp")
+
+    def current(self) -> Optional[Any]:
+        context = self._trace.get_current_span().get_span_context()
+        return context if context.is_valid else None
+
+    @contextlib.contextmanager
+    def span(self, name: str, links: Iterable[Any] = (), root: bool = False,
+             **attributes: Any) -> Iterator[Any]:
+        kwargs = {"attributes": attributes,
+                  "links": [self._trace.Link(link) for link in links if link is not None]}
+        is_root = root or not self._trace.get_current_span().get_span_context().is_valid
+        if self.profiler is not None:
+            self.profiler.start()
+        if root:
+            from opentelemetry import context
+
+            kwargs["context"] = context.Context()
+        # The profiler works on a built-in span's timing and name.
+        local = Span(name) if self.profiler is not None and is_root else None
+        if local is not None:
+            self.profiler.track(local)
+        try:
+            with self._tracer.start_as_current_span(name, **kwargs) as otel_span:
+                yield otel_span
+        finally:
+            if local is not None:
+                local.end_ns = time.time_ns()
+                self._finish(local)
+
+
+def default_profile_dir() -> str:
+    """Return the profile directory under MALAYA_CACHE."""
+    cache_dir = os.environ.get("MALAYA_CACHE") or os.path.join(os.path.expanduser("~"), ".malaya")
+    return os.path.join(cache_dir, "profiles")
+
+
+def tracer_from_env() -> Tracer:
+    """Build the tracer described by TRACING and the PROFILE_* variables."""
+    mode = os.environ.get("TRACING", "off").strip().lower() or "off"
+    if mode not in TRACING_MODES:
+        raise ValueError(f"Unknown TRACING mode: {mode} (expected one of {TRACING_MODES})")
+    slow_ms = float(os.environ.get("PROFILE_SLOW_MS", "0"))
+    profiler = None
+    if slow_ms > 0:
+        interval_ms = float(os.environ.get("PROFILE_INTERVAL_MS", DEFAULT_PROFILE_INTERVAL_MS))
+        profiler = SamplingProfiler(
+            os.environ.get("PROFILE_DIR") or default_profile_dir(), interval=interval_ms / 1000
+        )
+    if mode == "otel":
+        try:
+            return OpenTelemetryTracer(profiler, slow_ms)
+        except ImportError:
+            logger.warning("TRACING=otel needs opentelemetry-api; using the memory exporter")
+            mode = "memory"
+    exporters = []
+    if mode == "memory":
+        buffer_size = int(os.environ.get("TRACE_BUFFER_SIZE", DEFAULT_BUFFER_SIZE))
+        exporters.append(InMemoryExporter(buffer_size))
+    elif mode == "log":
+        exporters.append(LogExporter())
+    return Tracer(exporters, profiler, slow_ms)
+
+
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    """Get the shared tracer, configured from the environment on first use."""
+    global _tracer
+    if _tracer is None:
+        _tracer = tracer_from_env()
+    return _tracer
+
+
+def set_tracer(tracer: Optional[Tracer]) -> None:
+    """Replace the shared tracer (None re-reads the environment on next use)."""
+    global _tracer
+    if _tracer is not None and _tracer.profiler is not None:
+        _tracer.profiler.stop()
+    _tracer = tracer
+
+
+def span(name: str, links: Iterable[Any] = (), root: bool = False, **attributes: Any):
+    """Open a span on the shared tracer (a no-op when tracing is off)."""
+    return get_tracer().span(name, links=links, root=root, **attributes)
+
+
+def current_span() -> Optional[Any]:
+    """Return the current span for linking, or None when tracing is off."""
+    return get_tracer().current()
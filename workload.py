@@ -0,0 +1,113 @@
+"""
+Workload helpers shared by benchmark.py and test_connection.py
+
+The synthetic Malay corpus, the tool arguments built from it, latency
+summaries and the comparison of a run against a saved baseline. Nothing here
+imports the server, so test_connection.py can use it against a remote server
+without loading the server modules.
+"""
+
+import math
+import random
+
+DEFAULT_TOLERANCE = 0.15
+
+_SUBJECTS = ("Saya", "Kami", "Mereka", "Pelajar itu", "Kerajaan negeri", "Syarikat tersebut",
+             "Doktor", "Cikgu Aminah", "Penduduk kampung", "Pasukan bola sepak")
+_VERBS = ("membeli", "menjual", "membaca", "menulis", "membina", "membaiki", "mengumumkan",
+          "membincangkan", "menyediakan", "melawat")
+_OBJECTS = ("buku baharu", "rumah di Shah Alam", "laporan kewangan", "jambatan lama",
+            "makanan tradisional", "sekolah rendah", "projek perumahan", "kereta terpakai",
+            "pelan pembangunan", "hospital daerah")
+_ENDINGS = ("semalam", "pada hari Isnin", "minggu lepas", "dengan segera", "tahun ini",
+            "selepas mesyuarat", "bersama keluarga", "di Kuala Lumpur")
+_INFORMAL = ("sy x tau nk g mane", "budak2 tu dah blk ke", "tq sbb tlg sy td",
+             "bestttt gila mknn kat sini", "xpe la nnt sy call balik")
+
+
+def synthetic_corpus(size: int = 200, seed: int = 0) -> list[str]:
+    """Return size reproducible Malay sentences, about one in ten informal."""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(size):
+        if rng.random() < 0.1:
+            texts.append(rng.choice(_INFORMAL))
+            continue
+        text = f"{rng.choice(_SUBJECTS)} {rng.choice(_VERBS)} {rng.choice(_OBJECTS)}"
+        if rng.random() < 0.6:
+            text += f" {rng.choice(_ENDINGS)}"
+        texts.append(text + ".")
+    return texts
+
+
+def load_corpus(path: str) -> list[str]:
+    """Read one text per line, skipping blank lines."""
+    with open(path, encoding="utf-8") as f:
+        texts = [line.strip() for line in f if line.strip()]
+    if not texts:
+        raise ValueError(f"Corpus {path} has no texts")
+    return texts
+
+
+def tool_arguments(tool: str, text: str) -> dict:
+    """Build the arguments for one call of tool on a corpus text."""
+    if tool in ("apply_glossary", "term_lookup"):
+        words = [word.strip(".,!?") for word in text.split()]
+        return {"term": max(words, key=len)}
+    if tool == "translate":
+        return {"text": text, "source_lang": "ms", "target_lang": "en"}
+    if tool == "rewrite_style":
+        return {"text": text, "style": "formal"}
+    return {"text": text}
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Nearest-rank percentile of values (0 for no values)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = min(max(math.ceil(p / 100 * len(ordered)), 1), len(ordered))
+    return ordered[rank - 1]
+
+
+def summarize_latencies(seconds: list[float]) -> dict:
+    """p50/p95/p99, mean and max of latencies, in milliseconds."""
+    ms = [value * 1000 for value in seconds]
+    return {
+        "p50": round(percentile(ms, 50), 3),
+        "p95": round(percentile(ms, 95), 3),
+        "p99": round(percentile(ms, 99), 3),
+        "mean": round(sum(ms) / len(ms), 3) if ms else 0.0,
+        "max": round(max(ms), 3) if ms else 0.0,
+    }
+
+
+def scenario_key(result: dict) -> tuple:
+    return result["transport"], result["tool"], result["concurrency"]
+
+
+def compare_results(
+    baseline: dict, current: dict, tolerance: float = DEFAULT_TOLERANCE
+) -> list[str]:
+    """List scenarios whose throughput fell or p95/p99 latency rose by more than tolerance.
+
+    Scenarios missing from either run are ignored.
+    """
+    previous = {scenario_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = previous.get(scenario_key(result))
+        if before is None:
+            continue
+        name = "/".join(str(part) for part in scenario_key(result))
+        if result["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {before['throughput_rps']} -> {result['throughput_rps']} req/s"
+            )
+        for tail in ("p95", "p99"):
+            old, new = before["latency_ms"][tail], result["latency_ms"][tail]
+            if new > old * (1 + tolerance):
+                regressions.append(f"{name}: {tail} latency {old} -> {new} ms")
+        if result["errors"] > before["errors"]:
+            regressions.append(f"{name}: errors {before['errors']} -> {result['errors']}")
+    return regressions